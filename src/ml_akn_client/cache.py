@@ -0,0 +1,81 @@
+"""
+cache.py
+
+A small thread-safe least-recently-used cache whose entries expire after a time to
+live, used by CaseLawClient to keep recent results.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Generic, Hashable, TypeVar
+
+V = TypeVar("V")
+
+# default cache size and time to live
+CACHE_MAXSIZE: int = 256
+CACHE_TTL: float = 30  # 30 seconds
+
+
+class TTLCache(Generic[V]):
+    """
+    TTLCache holds up to maxsize values for ttl seconds each. When full, the least
+    recently used value is evicted. A ttl of 0 disables the cache.
+    """
+
+    maxsize: int
+    ttl: float
+
+    def __init__(
+        self,
+        maxsize: int = CACHE_MAXSIZE,
+        ttl: float = CACHE_TTL,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1")
+        if ttl < 0:
+            raise ValueError("ttl must not be negative")
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._data: OrderedDict[Hashable, tuple[float, V]] = OrderedDict()
+
+    def get(self, key: Hashable) -> V | None:
+        """
+        get returns the value for @key, or None if it is absent or has expired.
+        """
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires, value = item
+            if expires <= self._clock():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def put(self, key: Hashable, value: V) -> None:
+        """
+        put stores @value under @key, evicting the least recently used value if full.
+        """
+        if self.ttl == 0:
+            return
+        with self._lock:
+            self._data[key] = (self._clock() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        """
+        clear removes every value.
+        """
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._data)
@@ -0,0 +1,529 @@
+"""
+cli.py
+
+Command-line interface for the ml_akn_client package.
+
+Connection details are read from the environment variables used by the rest of this
+repo: ML_HOST, ML_PORT, ML_USERNAME and ML_PASSWORD. ML_HOSTS, a comma separated list
+of "host" or "host:port" entries, may be set instead of ML_HOST to balance requests
+across several MarkLogic e-nodes. The deploy command also reads ML_ADMIN_PORT and
+ML_ADMIN_DATABASE.
+
+The CLI is intended for short-lived cron and shell use, so only the standard library
+is imported at start up. The client, and with it requests, pydantic and the
+pydantic-xml models, is imported when a command first needs it. The start up cost is
+tracked against CLI_STARTUP_BUDGET by the tests.
+
+Example:
+    ml-akn-client summaries --sort-by date --output table
+    ml-akn-client summaries --collection ewca --collection uksc --limit 20
+    ml-akn-client search norwich --no-snippets --fields name,citation
+    ml-akn-client count --court EWCA-Civil
+    ml-akn-client export summaries.csv --format csv --resume
+    ml-akn-client index ~/.cache/ml-akn-index
+    ml-akn-client search norwich --local-index ~/.cache/ml-akn-index
+    ml-akn-client deploy
+    ml-akn-client cache-test
+    ml-akn-client load --stand-in --latency 5 --rate 200 --duration 60
+    ml-akn-client memory --sizes 100,10000
+"""
+
+import argparse
+import json
+import os
+import sys
+from typing import IO, TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from ml_akn_client import localindex as li
+    from ml_akn_client import ml_akn_client as cl
+
+# seconds allowed to import this module and build the parser
+CLI_STARTUP_BUDGET: float = 0.1
+
+# columns shown by table output when no fields are selected
+TABLE_COLUMNS: tuple[str, ...] = ("judgment_date", "court", "citation", "name")
+
+
+def client_from_env() -> "cl.CaseLawClient":
+    """
+    client_from_env returns a CaseLawClient configured from environment variables.
+    """
+    from ml_akn_client import ml_akn_client as cl
+    from ml_akn_client.server import marklogic as ml
+
+    hosts = os.environ.get("ML_HOSTS")
+    try:
+        http_client = ml.MarkLogicHTTPClient(
+            scheme=os.environ.get("ML_SCHEME", "http"),
+            host=os.environ.get("ML_HOST", "localhost"),
+            port=int(os.environ.get("ML_PORT", "8000")),
+            username=os.environ.get("ML_USERNAME", ""),
+            password=os.environ.get("ML_PASSWORD", ""),
+            hosts=hosts.split(",") if hosts else None,
+        )
+    except ValueError as err:
+        raise cl.ClientException(f"invalid ML_PORT: {err}") from err
+    except ml.MisconfigurationException as err:
+        raise cl.ClientException(f"HTTP client misconfiguration: {err}") from err
+    return cl.CaseLawClient(http_client)
+
+
+def open_index(path: str, collection: str) -> "li.LocalIndex":
+    """
+    open_index returns the local search index of @collection at @path.
+    """
+    from ml_akn_client import localindex as li
+    from ml_akn_client import ml_akn_client as cl
+
+    try:
+        return li.LocalIndex(path, collection)
+    except li.LocalIndexException as err:
+        raise cl.ClientException(f"could not open local index: {err}") from err
+
+
+def write_rows(
+    rows: list[dict[str, Any]],
+    output: str,
+    columns: tuple[str, ...] | None,
+    out: IO[str],
+) -> None:
+    """
+    write_rows writes @rows to @out either as NDJSON or as a plain text table of
+    @columns (TABLE_COLUMNS if None).
+    """
+    if output == "ndjson":
+        for row in rows:
+            out.write(json.dumps(row) + "\n")
+        return
+    columns = columns or TABLE_COLUMNS
+    cells = [[str(row.get(c, "")) for c in columns] for row in rows]
+    widths = [max([len(c)] + [len(r[i]) for r in cells]) for i, c in enumerate(columns)]
+    for line in [list(columns), ["-" * w for w in widths]] + cells:
+        out.write("  ".join(v.ljust(w) for v, w in zip(line, widths)).rstrip() + "\n")
+
+
+def _fields(args: argparse.Namespace) -> tuple[Any, ...] | None:
+    """
+    _fields returns the --fields projection as a tuple, or None for all fields.
+    """
+    if not args.fields:
+        return None
+    return tuple(f.strip() for f in args.fields.split(",") if f.strip())
+
+
+def cmd_summaries(args: argparse.Namespace) -> int:
+    """
+    cmd_summaries prints the summaries of every document.
+    """
+    fields = _fields(args)
+    client = client_from_env()
+    collections = args.collection or ["examples"]
+    if len(collections) > 1:
+        result = client.fan_out_summaries(
+            collections,
+            sort_by=args.sort_by,
+            sort_direction=args.sort_direction,
+            limit=args.limit or 100,
+            fields=fields,
+        )
+    else:
+        result = client.get_summaries(
+            sort_by=args.sort_by,
+            sort_direction=args.sort_direction,
+            fields=fields,
+            collection=collections[0],
+            limit=args.limit,
+        )
+    rows = [s.model_dump(mode="json", exclude_none=True) for s in result.summaries]
+    write_rows(rows, args.output, fields, sys.stdout)
+    return 0
+
+
+def cmd_search(args: argparse.Namespace) -> int:
+    """
+    cmd_search prints the summaries of documents matching a search term.
+    """
+    fields = _fields(args)
+    client = client_from_env()
+    collections = args.collection or ["examples"]
+    if len(collections) > 1:
+        result = client.fan_out_search(
+            args.query,
+            collections,
+            sort_by=args.sort_by,
+            sort_direction=args.sort_direction,
+            limit=args.limit or 100,
+            fields=fields,
+            snippets=not args.no_snippets,
+        )
+    else:
+        if args.local_index:
+            client.local_index = open_index(args.local_index, collections[0])
+            client.local_search = args.local_search
+        result = client.search(
+            args.query,
+            sort_by=args.sort_by,
+            sort_direction=args.sort_direction,
+            use_cache=not args.no_cache,
+            fields=fields,
+            snippets=not args.no_snippets,
+            per_match_tokens=args.per_match_tokens,
+            max_matches=args.max_matches,
+            max_snippet_chars=args.max_snippet_chars,
+            collection=collections[0],
+            limit=args.limit,
+        )
+    rows = []
+    for s in result.summaries:
+        row = s.model_dump(mode="json", exclude_none=True, exclude={"snippets"})
+        if not args.no_snippets:
+            row["snippets"] = [x.snippet for x in s.snippets]
+        rows.append(row)
+    write_rows(rows, args.output, fields, sys.stdout)
+    return 0
+
+
+def cmd_count(args: argparse.Namespace) -> int:
+    """
+    cmd_count prints the number of documents matching a search term and/or court.
+    """
+    result = client_from_env().count(
+        query=args.query, court=args.court, exact=args.exact, collection=args.collection
+    )
+    if args.output == "ndjson":
+        write_rows([result.model_dump()], args.output, None, sys.stdout)
+    else:
+        print(result.count if result.exact else f"~{result.count}")
+    return 0
+
+
+def cmd_export(args: argparse.Namespace) -> int:
+    """
+    cmd_export exports all summaries to a file, reporting progress on stderr.
+    """
+
+    def progress(rows: int, seconds: float) -> None:
+        rate = rows / seconds if seconds > 0 else 0.0
+        print(f"\r{rows} rows ({rate:.0f} rows/s)", end="", file=sys.stderr)
+
+    client = client_from_env()
+    result = client.export(
+        args.path,
+        format=args.format,
+        page_size=args.page_size,
+        resume=args.resume,
+        progress=None if args.quiet else progress,
+        collection=args.collection,
+    )
+    if not args.quiet:
+        print(file=sys.stderr)
+    print(
+        f"exported {result.rows} rows ({result.total_rows} total) in "
+        f"{result.seconds:.2f}s: {result.rows_per_second:.0f} rows/s",
+        file=sys.stderr,
+    )
+    return 0
+
+
+def cmd_index(args: argparse.Namespace) -> int:
+    """
+    cmd_index brings a local search index up to date with the server's summaries.
+    """
+    client = client_from_env()
+    with open_index(args.path, args.collection) as index:
+        result = client.sync_index(index, page_size=args.page_size)
+        total = len(index)
+    print(
+        f"indexed {total} documents: {result.added} added, {result.replaced} "
+        f"replaced, {result.removed} removed",
+        file=sys.stderr,
+    )
+    return 0
+
+
+def cmd_deploy(args: argparse.Namespace) -> int:
+    """
+    cmd_deploy deploys changed modules and database configuration, then runs the
+    smoke queries. It fails if any smoke query fails.
+    """
+    from ml_akn_client import deploy
+    from ml_akn_client import ml_akn_client as cl
+
+    client = client_from_env()
+    try:
+        report = deploy.deploy(
+            client.ml_client,
+            directory=args.modules_dir or deploy.MODULES_DIR,
+            admin_port=int(os.environ.get("ML_ADMIN_PORT", "8002")),
+            database=os.environ.get("ML_ADMIN_DATABASE", "Documents"),
+            force=args.force,
+            smoke=not args.no_smoke,
+            workers=args.workers,
+        )
+    except ValueError as err:
+        raise cl.ClientException(f"invalid ML_ADMIN_PORT: {err}") from err
+    except deploy.DeployException as err:
+        raise cl.ClientException(str(err)) from err
+    print(report.format())
+    return 0 if report.ok else 1
+
+
+def cmd_cache_test(args: argparse.Namespace) -> int:
+    """
+    cmd_cache_test runs the cache-lib self-test, which writes and deletes a scratch
+    document, against the server. It fails if the test fails.
+    """
+    from ml_akn_client import deploy
+    from ml_akn_client import ml_akn_client as cl
+
+    client = client_from_env()
+    try:
+        result = deploy.cache_self_test(
+            client.ml_client,
+            directory=args.modules_dir or deploy.MODULES_DIR,
+            collection=args.collection,
+        )
+    except deploy.DeployException as err:
+        raise cl.ClientException(str(err)) from err
+    status = "ok" if result.error is None else f"FAILED: {result.error}"
+    print(f"cache-test {result.seconds * 1000:8.1f} ms {status}")
+    return 0 if result.error is None else 1
+
+
+def _mix(value: str) -> dict[str, float]:
+    """
+    _mix parses a request mix such as "summaries=3,search=1".
+    """
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        try:
+            mix[name.strip()] = float(weight) if weight else 1.0
+        except ValueError as err:
+            raise argparse.ArgumentTypeError(f"invalid weight in {part!r}") from err
+    return mix
+
+
+def cmd_load(args: argparse.Namespace) -> int:
+    """
+    cmd_load runs a load test, against a local stand-in server if requested, and
+    prints the report.
+    """
+    from ml_akn_client import loadgen
+    from ml_akn_client import ml_akn_client as cl
+
+    stand_in = None
+    if args.stand_in:
+        stand_in = loadgen.StandIn(
+            latency=args.latency / 1000,
+            jitter=args.jitter / 1000,
+            failure_rate=args.failure_rate,
+            size=args.size,
+        )
+        stand_in.start()
+        client = cl.CaseLawClient(stand_in.http_client())
+    else:
+        client = client_from_env()
+    try:
+        report = loadgen.run_load(
+            client,
+            rate=args.rate,
+            duration=args.duration,
+            concurrency=args.concurrency,
+            mix=args.mix,
+            poisson=not args.uniform,
+            sample_interval=args.sample_interval,
+        )
+        print(report.format(stand_in.stats() if stand_in else None))
+    except ValueError as err:
+        raise cl.ClientException(f"invalid load test: {err}") from err
+    finally:
+        if stand_in is not None:
+            stand_in.stop()
+    return 0
+
+
+def _sizes(value: str) -> tuple[int, ...]:
+    """
+    _sizes parses comma separated payload sizes such as "10,100".
+    """
+    try:
+        sizes = tuple(int(v) for v in value.split(","))
+    except ValueError as err:
+        raise argparse.ArgumentTypeError(f"invalid sizes {value!r}") from err
+    if any(size < 1 for size in sizes):
+        raise argparse.ArgumentTypeError("sizes must be at least 1")
+    return sizes
+
+
+def cmd_memory(args: argparse.Namespace) -> int:
+    """
+    cmd_memory profiles the memory used by the deserialization path, printing the
+    report, and fails if a memory budget is exceeded.
+    """
+    from ml_akn_client import memprofile
+
+    profiles = memprofile.profile(sizes=args.sizes, hot_spots=args.hot_spots)
+    print(memprofile.format_report(profiles, hot_spots=args.hot_spots > 0))
+    violations = [v for p in profiles for v in p.violations()]
+    for violation in violations:
+        print(f"error: {violation}", file=sys.stderr)
+    return 1 if violations else 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """
+    build_parser returns the argument parser for all subcommands.
+    """
+    parser = argparse.ArgumentParser(
+        prog="ml-akn-client",
+        description="Retrieve Akoma Ntoso case law data from a MarkLogic server.",
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    # options shared by the commands listing summaries
+    listing = argparse.ArgumentParser(add_help=False)
+    listing.add_argument(
+        "--sort-by", choices=["name", "date", "court", "citation"], default="name"
+    )
+    listing.add_argument("--sort-direction", choices=["desc", "asc"], default="desc")
+    listing.add_argument(
+        "--fields",
+        help="comma separated fields from uri, name, judgment_date, court, citation",
+    )
+    listing.add_argument("--output", choices=["ndjson", "table"], default="ndjson")
+    listing.add_argument(
+        "--collection",
+        action="append",
+        help="collection to query (default: examples); repeat to merge several",
+    )
+    listing.add_argument(
+        "--limit",
+        type=int,
+        default=0,
+        help="return only the first results (default: all, or 100 when merging)",
+    )
+
+    p = sub.add_parser("summaries", parents=[listing], help="list all summaries")
+    p.set_defaults(func=cmd_summaries)
+
+    p = sub.add_parser("search", parents=[listing], help="search for a term")
+    p.add_argument("query")
+    p.add_argument("--no-snippets", action="store_true", help="skip snippets")
+    p.add_argument("--no-cache", action="store_true", help="bypass the server cache")
+    p.add_argument("--per-match-tokens", type=int, default=30)
+    p.add_argument("--max-matches", type=int, default=3)
+    p.add_argument("--max-snippet-chars", type=int, default=200)
+    p.add_argument("--local-index", help="local index to search if the server fails")
+    p.add_argument(
+        "--local-search",
+        choices=["fallback", "always"],
+        default="fallback",
+        help="when to search the local index",
+    )
+    p.set_defaults(func=cmd_search)
+
+    p = sub.add_parser("count", help="count documents")
+    p.add_argument("--query", help="only count documents matching a search term")
+    p.add_argument("--court", help="only count documents from a court")
+    p.add_argument("--exact", action="store_true", help="count exactly (slower)")
+    p.add_argument("--collection", default="examples", help="collection to count")
+    p.add_argument("--output", choices=["ndjson", "table"], default="table")
+    p.set_defaults(func=cmd_count)
+
+    p = sub.add_parser("export", help="export all summaries to a file")
+    p.add_argument("path", help="output file, or directory for parquet")
+    p.add_argument("--format", choices=["ndjson", "csv", "parquet"], default="ndjson")
+    p.add_argument("--page-size", type=int, default=1000)
+    p.add_argument(
+        "--resume", action="store_true", help="continue an interrupted export"
+    )
+    p.add_argument("--quiet", action="store_true", help="do not report progress")
+    p.add_argument("--collection", default="examples", help="collection to export")
+    p.set_defaults(func=cmd_export)
+
+    p = sub.add_parser("index", help="sync a local search index of the summaries")
+    p.add_argument("path", help="index directory, created if missing")
+    p.add_argument("--page-size", type=int, default=1000)
+    p.add_argument("--collection", default="examples", help="collection to index")
+    p.set_defaults(func=cmd_index)
+
+    p = sub.add_parser(
+        "deploy",
+        help="deploy changed modules to the server",
+        description="Upload the modules changed since the last deployment and "
+        "apply the database properties of indexes.xml if they have changed or "
+        "the database on the server no longer matches them.",
+    )
+    p.add_argument(
+        "--modules-dir",
+        help="directory of .xqy modules (default: the modules in the package)",
+    )
+    p.add_argument("--force", action="store_true", help="deploy unchanged modules")
+    p.add_argument("--no-smoke", action="store_true", help="skip the smoke queries")
+    p.add_argument("--workers", type=int, default=8, help="parallel uploads")
+    p.set_defaults(func=cmd_deploy)
+
+    p = sub.add_parser(
+        "cache-test",
+        help="check the server cache generations",
+        description="Evaluate the cache-lib self-test against the server. It "
+        "writes and deletes a scratch document, so it is not deployed.",
+    )
+    p.add_argument(
+        "--modules-dir",
+        help="directory of .xqy modules (default: the modules in the package)",
+    )
+    p.add_argument("--collection", default="examples", help="collection to check")
+    p.set_defaults(func=cmd_cache_test)
+
+    p = sub.add_parser("load", help="run a load or soak test")
+    p.add_argument("--rate", type=float, default=50, help="requests per second")
+    p.add_argument("--duration", type=float, default=10, help="seconds")
+    p.add_argument("--concurrency", type=int, default=8)
+    p.add_argument(
+        "--mix", type=_mix, default="summaries=1,search=1", help="weighted operations"
+    )
+    p.add_argument(
+        "--uniform", action="store_true", help="evenly spaced, not Poisson, arrivals"
+    )
+    p.add_argument("--sample-interval", type=float, default=1.0, help="RSS sampling")
+    p.add_argument(
+        "--stand-in", action="store_true", help="run against a local stand-in server"
+    )
+    p.add_argument("--latency", type=float, default=0, help="stand-in latency (ms)")
+    p.add_argument("--jitter", type=float, default=0, help="stand-in jitter (ms)")
+    p.add_argument("--failure-rate", type=float, default=0, help="stand-in failures")
+    p.add_argument("--size", type=int, default=10, help="stand-in summaries/response")
+    p.set_defaults(func=cmd_load)
+
+    p = sub.add_parser("memory", help="check the memory budgets of deserialization")
+    p.add_argument(
+        "--sizes",
+        type=_sizes,
+        default=(10, 100, 1000),
+        help="comma separated summaries per payload",
+    )
+    p.add_argument("--hot-spots", type=int, default=5, help="source lines reported")
+    p.set_defaults(func=cmd_memory)
+
+    return parser
+
+
+def main(argv: list[str] | None = None) -> int:
+    """
+    main is the console entry point.
+    """
+    args = build_parser().parse_args(argv)
+    from ml_akn_client.ml_akn_client import ClientException
+
+    try:
+        return args.func(args)
+    except ClientException as err:
+        print(f"error: {err}", file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,540 @@
+"""
+deploy.py
+
+Idempotent deployment of the XQuery modules and database configuration to a
+MarkLogic server. The modules are shipped with the package as package data, in
+ml_akn_client/xquery, and read with importlib.resources, so that an installed
+package can deploy itself; a directory of modules can be given instead.
+
+A deployment:
+  * hashes (sha256) every .xqy module in the modules directory, other than those in
+    DEPLOY_EXCLUDE
+  * compares the hashes with those recorded by the last deployment in a manifest
+    document on the server (DEPLOY_MANIFEST_URI)
+  * uploads only the changed modules, in parallel
+  * applies the declarative database configuration in DATABASE_CONFIG through the
+    management API if it has changed since the last deployment, or if the
+    database properties on the server no longer match it (config_drift). Indexes
+    the server has which DATABASE_CONFIG does not define are kept (merge_config),
+    as PUTting a list of indexes replaces every index of its kind
+  * records the new hashes in the manifest
+  * runs the SMOKE_QUERIES concurrently, timing each
+
+The self-test of the cache-lib generation, CACHE_SELF_TEST, writes a scratch
+document, so it is neither deployed nor run as a smoke query. cache_self_test, behind
+the "ml-akn-client cache-test" command, evaluates it on request through the REST
+eval endpoint.
+
+Modules uploaded successfully are recorded in the manifest even if others fail, so a
+retried deployment only uploads what is still outstanding.
+
+Example:
+    report = deploy(http_client, admin_port=8002, database="Documents")
+    print(report.format())
+"""
+
+import hashlib
+import json
+import time
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+from importlib.resources import files
+from importlib.resources.abc import Traversable
+from pathlib import Path
+from typing import NamedTuple
+from urllib.parse import urljoin, urlsplit
+
+import requests
+from requests import RequestException
+from requests.adapters import HTTPAdapter
+
+from ml_akn_client.server.marklogic import (
+    ML_MODULE_INTERNAL_PATH,
+    ML_MODULE_INVOCATION_PATH,
+    LocalMLException,
+    MarkLogicHTTPClient,
+    MisconfigurationException,
+)
+
+# the modules shipped as package data
+MODULES_DIR: Traversable = files("ml_akn_client") / "xquery"
+
+# the self-test of cache-lib.xqy, which writes and deletes a scratch document
+CACHE_SELF_TEST: str = "cache-test.xqy"
+
+# modules which are not part of the deployment
+DEPLOY_EXCLUDE: tuple[str, ...] = ("helloworld.xqy", CACHE_SELF_TEST)
+
+# the declarative database properties, see xquery/indexes.xml
+DATABASE_CONFIG: str = "indexes.xml"
+
+# the document recording the hashes of the deployed modules and configuration
+DEPLOY_MANIFEST_URI: str = "/ml-akn-client/deploy-manifest.json"
+
+DEPLOY_WORKERS: int = 8
+DEPLOY_TIMEOUT: int = 30  # 30 seconds
+
+ML_MODULE_UPLOAD_PATH: str = "/v1/ext/"
+ML_DOCUMENTS_PATH: str = "/v1/documents"
+ML_EVAL_PATH: str = "/v1/eval"
+ML_DATABASE_PROPERTIES_PATH: str = "/manage/v2/databases/{database}/properties"
+
+# the namespace of the management API database properties
+ML_MANAGE_NAMESPACE: str = "http://marklogic.com/manage"
+
+# the fields identifying each kind of index; its other fields are settings, which
+# DATABASE_CONFIG may change in place
+INDEX_KEYS: dict[str, tuple[str, ...]] = {
+    "range-element-index": ("namespace-uri", "localname"),
+    "range-element-attribute-index": (
+        "parent-namespace-uri",
+        "parent-localname",
+        "namespace-uri",
+        "localname",
+    ),
+    "range-path-index": ("path-expression",),
+    "path-namespace": ("prefix",),
+}
+
+# a cheap query run against each module after deployment
+SMOKE_QUERIES: dict[str, dict[str, str]] = {
+    "summaries.xqy": {"sort_by": "date", "sort_direction": "desc"},
+    "search.xqy": {"query": "norwich", "sort_by": "date", "sort_direction": "desc"},
+    "export.xqy": {"after": "", "page_size": "3"},
+    "suggest.xqy": {"prefix": "nor", "limit": "5"},
+    "count.xqy": {"query": "norwich", "court": "EWCA-Civil"},
+}
+
+
+class DeployException(Exception):
+    """
+    DeployException reports a failed deployment.
+    """
+
+    pass
+
+
+class SmokeResult(NamedTuple):
+    """
+    SmokeResult is the outcome of a smoke query; error is None if it succeeded.
+    """
+
+    seconds: float
+    error: str | None = None
+
+
+class DeployReport(NamedTuple):
+    """
+    DeployReport is the outcome of a deployment.
+    """
+
+    uploaded: list[str]
+    unchanged: list[str]
+    config_applied: bool
+    smoke: dict[str, SmokeResult]
+    seconds: float
+    config_drift: tuple[str, ...] = ()
+
+    @property
+    def ok(self) -> bool:
+        return all(r.error is None for r in self.smoke.values())
+
+    def format(self) -> str:
+        """
+        format returns a human readable report.
+        """
+        lines = [
+            f"uploaded {len(self.uploaded)} modules: {', '.join(self.uploaded) or '-'}",
+            f"unchanged {len(self.unchanged)} modules: "
+            f"{', '.join(self.unchanged) or '-'}",
+            "database configuration "
+            + ("applied" if self.config_applied else "unchanged")
+            + (
+                f" (server drifted: {', '.join(self.config_drift)})"
+                if self.config_drift
+                else ""
+            ),
+        ]
+        for module, result in sorted(self.smoke.items()):
+            status = "ok" if result.error is None else f"FAILED: {result.error}"
+            lines.append(f"smoke {module:<16} {result.seconds * 1000:8.1f} ms {status}")
+        lines.append(f"deployed in {self.seconds:.2f}s")
+        return "\n".join(lines)
+
+
+def content_hash(path: Traversable) -> str:
+    """
+    content_hash returns the sha256 hex digest of the file at @path.
+    """
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+def module_hashes(directory: str | Traversable = MODULES_DIR) -> dict[str, str]:
+    """
+    module_hashes returns the content hash of each module to deploy from @directory,
+    a path or package resource, keyed by file name.
+    """
+    directory = Path(directory) if isinstance(directory, str) else directory
+    if not directory.is_dir():
+        raise DeployException(f"modules directory {directory} not found")
+    return {
+        p.name: content_hash(p)
+        for p in sorted(directory.iterdir(), key=lambda p: p.name)
+        if p.name.endswith(".xqy") and p.is_file() and p.name not in DEPLOY_EXCLUDE
+    }
+
+
+def _text(element: ET.Element) -> str:
+    """
+    _text returns the whitespace-normalised text of a leaf @element.
+    """
+    return " ".join((element.text or "").split())
+
+
+def _matches(local: ET.Element, server: ET.Element) -> bool:
+    """
+    _matches reports whether the @server element has every setting of @local;
+    settings the server reports but @local does not set are ignored.
+    """
+    if len(local) == 0:
+        return _text(local) == _text(server)
+    return all(
+        any(_matches(item, candidate) for candidate in server.findall(item.tag))
+        for item in local
+    )
+
+
+def config_drift(local: bytes, server: bytes) -> list[str]:
+    """
+    config_drift returns the names of the top-level database properties set in the
+    @local configuration which the @server properties, as returned by the
+    management API, do not match. Each index set locally must be present on the
+    server with the same settings.
+    """
+    wanted, actual = _parse(local, server)
+    drift = []
+    for setting in wanted:
+        found = actual.find(setting.tag)
+        if found is None or not _matches(setting, found):
+            drift.append(setting.tag.rpartition("}")[2])
+    return drift
+
+
+def _parse(local: bytes, server: bytes) -> tuple[ET.Element, ET.Element]:
+    """
+    _parse parses the @local and @server database properties.
+    """
+    try:
+        return ET.fromstring(local), ET.fromstring(server)
+    except ET.ParseError as err:
+        raise DeployException(f"invalid database properties: {err}") from err
+
+
+def _index_key(index: ET.Element) -> tuple[str, ...]:
+    """
+    _index_key returns the fields identifying @index (see INDEX_KEYS), or all its
+    fields for other kinds of list item. The words of a list of local names are
+    sorted.
+    """
+    kind = index.tag.rpartition("}")[2]
+    names = INDEX_KEYS.get(kind)
+    key = [kind]
+    for field in index:
+        name = field.tag.rpartition("}")[2]
+        if names is None or name in names:
+            key.append(f"{name}={' '.join(sorted(_text(field).split()))}")
+    return tuple(key)
+
+
+def merge_config(local: bytes, server: bytes) -> bytes:
+    """
+    merge_config returns the @local database configuration with, in each list of
+    indexes it sets, the indexes of the @server properties which it does not
+    define, so that applying it changes the indexes it defines but removes none.
+    """
+    wanted, actual = _parse(local, server)
+    for setting in wanted:
+        found = actual.find(setting.tag)
+        if len(setting) == 0 or found is None:
+            continue
+        defined = {_index_key(index) for index in setting}
+        for index in found:
+            if _index_key(index) not in defined:
+                setting.append(index)
+    return ET.tostring(wanted, encoding="utf-8", default_namespace=ML_MANAGE_NAMESPACE)
+
+
+class Deployer:
+    """
+    Deployer deploys a modules directory, by default the modules shipped with the
+    package, to the server addressed by a MarkLogicHTTPClient, using its first host
+    and credentials. The management API is reached on @admin_port of the same host
+    and configures @database.
+    """
+
+    def __init__(
+        self,
+        http_client: MarkLogicHTTPClient,
+        directory: str | Traversable = MODULES_DIR,
+        admin_port: int = 8002,
+        database: str = "Documents",
+        workers: int = DEPLOY_WORKERS,
+    ):
+        if workers < 1:
+            raise DeployException("workers must be at least 1")
+        self.http_client = http_client
+        self.directory = Path(directory) if isinstance(directory, str) else directory
+        self.hostpath = http_client.hostpath
+        parts = urlsplit(self.hostpath)
+        try:
+            self.admin_hostpath = MarkLogicHTTPClient._hostpath(
+                parts.scheme, parts.netloc.rpartition(":")[0], admin_port
+            )
+        except MisconfigurationException as err:
+            raise DeployException(f"invalid admin port: {err}") from err
+        self.database = database
+        self.workers = workers
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.auth = http_client.auth
+
+    def _request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """
+        _request makes a request, raising DeployException on failure.
+        """
+        try:
+            r = self.session.request(method, url, timeout=DEPLOY_TIMEOUT, **kwargs)
+            r.raise_for_status()
+        except RequestException as err:
+            raise DeployException(f"{method} {url} failed: {err}") from err
+        return r
+
+    def manifest(self) -> dict:
+        """
+        manifest returns the manifest recorded by the last deployment, or an empty
+        manifest if there has been none.
+        """
+        url = urljoin(self.hostpath, ML_DOCUMENTS_PATH)
+        try:
+            r = self.session.get(
+                url, params={"uri": DEPLOY_MANIFEST_URI}, timeout=DEPLOY_TIMEOUT
+            )
+        except RequestException as err:
+            raise DeployException(f"GET {url} failed: {err}") from err
+        if r.status_code == 404:
+            return {"modules": {}, "config": None}
+        try:
+            r.raise_for_status()
+            manifest = r.json()
+        except (RequestException, ValueError) as err:
+            raise DeployException(f"could not read deploy manifest: {err}") from err
+        return {
+            "modules": manifest.get("modules", {}),
+            "config": manifest.get("config"),
+        }
+
+    def save_manifest(self, manifest: dict) -> None:
+        """
+        save_manifest records @manifest on the server.
+        """
+        self._request(
+            "PUT",
+            urljoin(self.hostpath, ML_DOCUMENTS_PATH),
+            params={"uri": DEPLOY_MANIFEST_URI, "format": "json"},
+            data=json.dumps(manifest),
+            headers={"Content-Type": "application/json"},
+        )
+
+    def upload(self, module: str) -> None:
+        """
+        upload uploads @module from the modules directory.
+        """
+        self._request(
+            "PUT",
+            urljoin(self.hostpath, ML_MODULE_UPLOAD_PATH + module),
+            data=(self.directory / module).read_bytes(),
+            headers={"Content-Type": "application/xquery"},
+        )
+
+    def properties(self) -> bytes:
+        """
+        properties returns the current database properties on the server.
+        """
+        path = ML_DATABASE_PROPERTIES_PATH.format(database=self.database)
+        r = self._request(
+            "GET",
+            urljoin(self.admin_hostpath, path),
+            params={"format": "xml"},
+            headers={"Accept": "application/xml"},
+        )
+        return r.content
+
+    def configure(self, server: bytes) -> None:
+        """
+        configure applies the DATABASE_CONFIG database properties, keeping the
+        indexes of the @server properties it does not define; see merge_config.
+        """
+        path = ML_DATABASE_PROPERTIES_PATH.format(database=self.database)
+        self._request(
+            "PUT",
+            urljoin(self.admin_hostpath, path),
+            data=merge_config((self.directory / DATABASE_CONFIG).read_bytes(), server),
+            headers={"Content-Type": "application/xml"},
+        )
+
+    def smoke(self, module: str) -> SmokeResult:
+        """
+        smoke invokes @module with its SMOKE_QUERIES vars, timing the round trip
+        including decoding of the response.
+        """
+        return self._timed(
+            ML_MODULE_INVOCATION_PATH,
+            {
+                "module": urljoin(ML_MODULE_INTERNAL_PATH, module),
+                "vars": json.dumps(SMOKE_QUERIES[module]),
+            },
+        )
+
+    def cache_self_test(self, collection: str) -> SmokeResult:
+        """
+        cache_self_test evaluates CACHE_SELF_TEST against @collection without
+        installing it, timing it as a smoke query. It needs the deployed
+        cache-lib.xqy and a user allowed to evaluate queries.
+        """
+        try:
+            xquery = (self.directory / CACHE_SELF_TEST).read_text()
+        except OSError as err:
+            raise DeployException(f"could not read {CACHE_SELF_TEST}: {err}") from err
+        return self._timed(
+            ML_EVAL_PATH,
+            {"xquery": xquery, "vars": json.dumps({"collection": collection})},
+        )
+
+    def _timed(self, path: str, data: dict[str, str]) -> SmokeResult:
+        """
+        _timed POSTs @data to @path, timing the round trip including decoding of
+        the response.
+        """
+        start = time.perf_counter()
+        try:
+            r = self.session.post(
+                urljoin(self.hostpath, path),
+                data=data,
+                headers={"Accept": "application/xml"},
+                timeout=DEPLOY_TIMEOUT,
+            )
+            r.raise_for_status()
+            self.http_client.decode_multipart(
+                r.content, r.headers.get("content-type", "")
+            )
+        except (RequestException, LocalMLException) as err:
+            return SmokeResult(time.perf_counter() - start, str(err))
+        return SmokeResult(time.perf_counter() - start)
+
+    def deploy(self, force: bool = False, smoke: bool = True) -> DeployReport:
+        """
+        deploy uploads the changed modules (every module if @force is set), applies
+        the database configuration if it has changed or the server has drifted
+        from it and, if @smoke is set, runs the smoke queries of the deployed
+        modules.
+        """
+        start = time.perf_counter()
+        hashes = module_hashes(self.directory)
+        config_path = self.directory / DATABASE_CONFIG
+        config_hash = content_hash(config_path) if config_path.is_file() else None
+        manifest = self.manifest()
+        drift: list[str] = []
+        if config_hash is not None:
+            server = self.properties()
+            drift = config_drift(config_path.read_bytes(), server)
+
+        changed = [
+            m for m, h in hashes.items() if force or manifest["modules"].get(m) != h
+        ]
+        unchanged = [m for m in hashes if m not in changed]
+        uploaded = []
+        errors = []
+        with ThreadPoolExecutor(self.workers) as pool:
+            futures = {m: pool.submit(self.upload, m) for m in changed}
+            for module, future in futures.items():
+                try:
+                    future.result()
+                except (DeployException, OSError) as err:
+                    errors.append(str(err))
+                    continue
+                uploaded.append(module)
+                manifest["modules"][module] = hashes[module]
+
+        config_applied = False
+        if config_hash is not None and (
+            force or drift or manifest["config"] != config_hash
+        ):
+            try:
+                self.configure(server)
+            except DeployException as err:
+                errors.append(str(err))
+            else:
+                manifest["config"] = config_hash
+                config_applied = True
+
+        if uploaded or config_applied:
+            self.save_manifest(manifest)
+        if errors:
+            raise DeployException("deployment failed: " + "; ".join(errors))
+
+        results = {}
+        if smoke:
+            modules = [m for m in SMOKE_QUERIES if m in hashes]
+            with ThreadPoolExecutor(self.workers) as pool:
+                results = dict(zip(modules, pool.map(self.smoke, modules)))
+        return DeployReport(
+            uploaded,
+            unchanged,
+            config_applied,
+            results,
+            time.perf_counter() - start,
+            tuple(drift),
+        )
+
+    def close(self) -> None:
+        """
+        close releases the deployment connections.
+        """
+        self.session.close()
+
+
+def deploy(
+    http_client: MarkLogicHTTPClient,
+    directory: str | Traversable = MODULES_DIR,
+    admin_port: int = 8002,
+    database: str = "Documents",
+    force: bool = False,
+    smoke: bool = True,
+    workers: int = DEPLOY_WORKERS,
+) -> DeployReport:
+    """
+    deploy deploys the modules in @directory with a Deployer; see Deployer.deploy.
+    """
+    deployer = Deployer(http_client, directory, admin_port, database, workers)
+    try:
+        return deployer.deploy(force=force, smoke=smoke)
+    finally:
+        deployer.close()
+
+
+def cache_self_test(
+    http_client: MarkLogicHTTPClient,
+    directory: str | Traversable = MODULES_DIR,
+    collection: str = "examples",
+) -> SmokeResult:
+    """
+    cache_self_test runs the CACHE_SELF_TEST of @directory against @collection with
+    a Deployer; see Deployer.cache_self_test.
+    """
+    deployer = Deployer(http_client, directory)
+    try:
+        return deployer.cache_self_test(collection)
+    finally:
+        deployer.close()
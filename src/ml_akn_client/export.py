@@ -0,0 +1,280 @@
+"""
+export.py
+
+Streaming export of document summaries to NDJSON, CSV or Parquet.
+
+An export pages through the collection with a stable uri cursor (see
+xquery/export.xqy), writing each page to the output as it arrives, so memory use is
+bounded by the page size rather than the size of the collection.
+
+Progress is checkpointed to a state file alongside the output (the output path with
+EXPORT_STATE_SUFFIX appended) each time the written data is durable. An interrupted
+export can be resumed from the last checkpoint: NDJSON and CSV files are truncated back
+to the checkpointed offset and Parquet part files written after the checkpoint are
+removed before the export continues. The state file is removed when an export
+starts afresh and when it completes.
+
+Parquet output is a directory of part files, each holding up to
+PARQUET_PAGES_PER_PART pages as row groups. Parquet support needs the optional
+`pyarrow` package.
+"""
+
+import csv
+import io
+import json
+import os
+import time
+from pathlib import Path
+from typing import IO, Any, Callable, Literal, NamedTuple, Sequence
+
+from ml_akn_client.models.summaries import SummariesPage, Summary
+
+EXPORT_FIELDS: tuple[str, ...] = ("uri", "name", "judgment_date", "court", "citation")
+EXPORT_STATE_SUFFIX: str = ".export-state.json"
+EXPORT_PAGE_SIZE: int = 1000
+PARQUET_PAGES_PER_PART: int = 100
+
+export_formats = Literal["ndjson", "csv", "parquet"]
+
+
+class ExportException(Exception):
+    """
+    ExportException reports a failure writing an export or its state.
+    """
+
+    pass
+
+
+class ExportResult(NamedTuple):
+    """
+    ExportResult reports the outcome of an export. rows is the number of rows written
+    by this run, total_rows the number in the output including rows written by earlier,
+    resumed, runs.
+    """
+
+    rows: int
+    total_rows: int
+    seconds: float
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds > 0 else 0.0
+
+
+class _TextWriter:
+    """
+    _TextWriter writes pages of summaries to a NDJSON or CSV file. Every page is
+    durable once written.
+    """
+
+    def __init__(self, path: Path, format: export_formats, state: dict | None):
+        self.format = format
+        self.fh: IO[bytes]
+        if state is None:
+            self.fh = open(path, "wb")
+            if format == "csv":
+                self._write_csv([EXPORT_FIELDS])
+        else:
+            self.fh = open(path, "r+b")
+            size = self.fh.seek(0, os.SEEK_END)
+            if state["offset"] > size:
+                self.fh.close()
+                raise ExportException(
+                    f"cannot resume: {path} is shorter than its checkpoint"
+                )
+            self.fh.truncate(state["offset"])
+            self.fh.seek(state["offset"])
+
+    def _write_csv(self, rows: list) -> None:
+        buf = io.StringIO()
+        csv.writer(buf, lineterminator="\n").writerows(rows)
+        self.fh.write(buf.getvalue().encode("utf-8"))
+
+    def write(self, summaries: Sequence[Summary]) -> bool:
+        if self.format == "csv":
+            self._write_csv([[getattr(s, f) for f in EXPORT_FIELDS] for s in summaries])
+        else:
+            self.fh.write(
+                "".join(
+                    json.dumps(s.model_dump(include=set(EXPORT_FIELDS), mode="json"))
+                    + "\n"
+                    for s in summaries
+                ).encode("utf-8")
+            )
+        self.fh.flush()
+        return True
+
+    def checkpoint(self) -> dict:
+        return {"offset": self.fh.tell()}
+
+    def close(self) -> None:
+        self.fh.close()
+
+
+class _ParquetWriter:
+    """
+    _ParquetWriter writes pages of summaries as row groups of Parquet part files in a
+    directory. Data is durable each time a part file is closed.
+    """
+
+    def __init__(self, path: Path, state: dict | None):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as err:
+            raise ExportException(
+                "parquet export requires the optional 'pyarrow' package"
+            ) from err
+        self.pa = pa
+        self.pq = pq
+        self.schema = pa.schema(
+            [
+                ("uri", pa.string()),
+                ("name", pa.string()),
+                ("judgment_date", pa.date32()),
+                ("court", pa.string()),
+                ("citation", pa.string()),
+            ]
+        )
+        self.path = path
+        self.parts = 0 if state is None else state["parts"]
+        path.mkdir(parents=True, exist_ok=True)
+        # remove parts not covered by the checkpoint
+        for part in path.glob("part-*.parquet"):
+            if int(part.stem.split("-")[1]) >= self.parts:
+                part.unlink()
+        self.writer: Any = None
+        self.pages = 0
+
+    def write(self, summaries: Sequence[Summary]) -> bool:
+        if self.writer is None:
+            part = self.path / f"part-{self.parts:05d}.parquet"
+            self.writer = self.pq.ParquetWriter(part, self.schema)
+            self.pages = 0
+        columns = {f: [getattr(s, f) for s in summaries] for f in EXPORT_FIELDS}
+        self.writer.write_table(self.pa.table(columns, schema=self.schema))
+        self.pages += 1
+        if self.pages < PARQUET_PAGES_PER_PART:
+            return False
+        self._close_part()
+        return True
+
+    def _close_part(self) -> None:
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+            self.parts += 1
+
+    def checkpoint(self) -> dict:
+        return {"parts": self.parts}
+
+    def close(self) -> None:
+        self._close_part()
+
+
+def state_path(path: str | Path) -> Path:
+    """
+    state_path returns the path of the checkpoint state file for an export to @path.
+    """
+    path = Path(path)
+    return path.with_name(path.name + EXPORT_STATE_SUFFIX)
+
+
+def _load_state(path: Path, format: export_formats) -> dict | None:
+    """
+    _load_state returns the checkpoint state for an export to @path, or None if there
+    is none.
+    """
+    spath = state_path(path)
+    if not spath.exists():
+        return None
+    try:
+        state = json.loads(spath.read_text())
+    except (OSError, ValueError) as err:
+        raise ExportException(f"could not read export state {spath}: {err}") from err
+    if state.get("format") != format:
+        raise ExportException(
+            f"cannot resume a {state.get('format')} export as {format}"
+        )
+    return state
+
+
+def _save_state(path: Path, state: dict) -> None:
+    """
+    _save_state atomically replaces the checkpoint state for an export to @path.
+    """
+    spath = state_path(path)
+    tmp = spath.with_name(spath.name + ".tmp")
+    tmp.write_text(json.dumps(state))
+    os.replace(tmp, spath)
+
+
+def export_summaries(
+    fetch: Callable[[str], SummariesPage],
+    path: str | Path,
+    format: export_formats = "ndjson",
+    resume: bool = False,
+    progress: Callable[[int, float], None] | None = None,
+) -> ExportResult:
+    """
+    export_summaries writes every summary returned by @fetch to @path in @format.
+
+    @fetch is called with the uri cursor ("" for the first page) and returns the
+    following SummariesPage. If @resume is set and a checkpoint exists the export
+    continues from it, otherwise it starts afresh. @progress, if given, is called after
+    each page with the rows written so far by this run and the elapsed seconds.
+    """
+    if format not in ("ndjson", "csv", "parquet"):
+        raise ExportException(f"unknown export format {format!r}")
+    path = Path(path)
+    if resume:
+        state = _load_state(path, format)
+    else:
+        # a checkpoint of an earlier export must not be resumed over this one
+        state = None
+        try:
+            state_path(path).unlink(missing_ok=True)
+        except OSError as err:
+            raise ExportException(f"could not remove export state: {err}") from err
+
+    writer: _TextWriter | _ParquetWriter
+    try:
+        if format == "parquet":
+            writer = _ParquetWriter(path, state)
+        else:
+            writer = _TextWriter(path, format, state)
+    except OSError as err:
+        raise ExportException(f"could not open {path}: {err}") from err
+
+    cursor = "" if state is None else state["cursor"]
+    previous_rows = 0 if state is None else state["rows"]
+    rows = 0
+    start = time.perf_counter()
+    try:
+        while True:
+            page = fetch(cursor)
+            if page.summaries:
+                durable = writer.write(page.summaries)
+                rows += len(page.summaries)
+                cursor = page.summaries[-1].uri
+                if durable and page.next:
+                    _save_state(
+                        path,
+                        {
+                            "format": format,
+                            "cursor": cursor,
+                            "rows": previous_rows + rows,
+                            **writer.checkpoint(),
+                        },
+                    )
+            if progress is not None:
+                progress(rows, time.perf_counter() - start)
+            if not page.next:
+                break
+    except OSError as err:
+        raise ExportException(f"could not write {path}: {err}") from err
+    finally:
+        writer.close()
+
+    state_path(path).unlink(missing_ok=True)
+    return ExportResult(rows, previous_rows + rows, time.perf_counter() - start)
@@ -0,0 +1,101 @@
+"""
+fanout.py
+
+Concurrent queries of several sources, such as the per-court and per-year collections
+into which judgments are partitioned, and k-way merging of their sorted results.
+
+Each source returns its summaries already sorted (and limited) by the server. The
+sorted listings are merged lazily with heapq.merge, so that only the first `limit`
+summaries of the merged listing are visited. Documents present in more than one
+source, for example in both a court and a year collection, are returned once.
+
+The server sorts strings with its default collation. The merge approximates it by
+comparing case folded text with diacritics removed, falling back to the text itself,
+and, like the server, sorts missing values first in ascending order.
+"""
+
+import heapq
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from typing import Any, Callable, Iterable, Sequence, TypeVar
+
+from ml_akn_client.models.summaries import Summary
+from ml_akn_client.server.marklogic import MarkLogicHTTPClient
+
+S = TypeVar("S", bound=Summary)
+R = TypeVar("R")
+
+# maximum number of sources queried at once
+FAN_OUT_WORKERS: int = 8
+
+# the Summary attribute sorted on for each sort_by value
+SORT_FIELDS: dict[str, MarkLogicHTTPClient.summary_fields] = {
+    "name": "name",
+    "date": "judgment_date",
+    "court": "court",
+    "citation": "citation",
+}
+
+
+def _collation_key(text: str) -> str:
+    """
+    _collation_key approximates the server's default collation for @text.
+    """
+    decomposed = unicodedata.normalize("NFKD", text.casefold())
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def sort_key(sort_by: str) -> Callable[[Summary], tuple[Any, ...]]:
+    """
+    sort_key returns the key ordering summaries as the server does for @sort_by.
+    """
+    field = SORT_FIELDS.get(sort_by, "judgment_date")
+
+    def key(summary: Summary) -> tuple[Any, ...]:
+        value = getattr(summary, field)
+        if value is None:
+            return (0,)
+        if isinstance(value, date):
+            return (1, value)
+        return (1, _collation_key(value), value)
+
+    return key
+
+
+def merge_sorted(
+    listings: Iterable[Sequence[S]],
+    sort_by: str,
+    sort_direction: str,
+    limit: int | None = None,
+) -> list[S]:
+    """
+    merge_sorted merges @listings, each sorted by @sort_by in @sort_direction, into
+    one sorted list of at most @limit summaries (all if None), dropping repeated
+    uris.
+    """
+    merged = heapq.merge(
+        *listings, key=sort_key(sort_by), reverse=sort_direction == "desc"
+    )
+    seen: set[str] = set()
+    out: list[S] = []
+    for summary in merged:
+        if limit is not None and len(out) >= limit:
+            break
+        if summary.uri in seen:
+            continue
+        seen.add(summary.uri)
+        out.append(summary)
+    return out
+
+
+def fan_out(calls: Sequence[Callable[[], R]]) -> list[R]:
+    """
+    fan_out runs @calls concurrently, returning their results in order. The first
+    exception raised by a call is raised once all calls have finished.
+    """
+    if len(calls) == 1:
+        return [calls[0]()]
+    with ThreadPoolExecutor(max(1, min(len(calls), FAN_OUT_WORKERS))) as pool:
+        futures = [pool.submit(call) for call in calls]
+        return [f.result() for f in futures]
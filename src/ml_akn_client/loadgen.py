@@ -0,0 +1,594 @@
+"""
+loadgen.py
+
+Load generation and soak testing for CaseLawClient.
+
+run_load drives a CaseLawClient with a weighted mix of get_summaries and search calls
+at an open-loop arrival rate: requests are scheduled independently of how quickly
+earlier ones complete, and each latency is measured from the time the request was
+scheduled rather than the time it started. A slow server therefore shows up as
+latency, not as a quietly reduced request rate ("coordinated omission").
+
+Latencies are recorded in a LatencyHistogram, a log-linear histogram in the style of
+HdrHistogram, and the process resident set size (RSS) is sampled throughout the run
+so that memory growth over a soak can be seen.
+
+StandIn runs a local stand-in MarkLogic server in a child process, so that its memory
+does not count towards the client's RSS. The stand-in answers summaries.xqy and
+search.xqy with canned payloads after an injectable latency, fails a given fraction of
+requests, and counts the client connections it sees so that connection reuse can be
+reported. Its answers are decided by a StandInResponder, which can be used without a
+server.
+
+The arrival schedule, the clock and sleep of run_load, and the sleep of a
+StandInResponder can be replaced, so that they can be tested without waiting.
+
+Example:
+    with StandIn(latency=0.005, failure_rate=0.01) as stand_in:
+        client = CaseLawClient(stand_in.http_client())
+        report = run_load(client, rate=200, duration=60, concurrency=16)
+        print(report.format(stand_in.stats()))
+"""
+
+import json
+import math
+import multiprocessing
+import os
+import random
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import TYPE_CHECKING, Any, Callable, Iterator, NamedTuple
+from urllib.parse import parse_qs
+from urllib.request import urlopen
+
+if TYPE_CHECKING:
+    from ml_akn_client.ml_akn_client import CaseLawClient
+    from ml_akn_client.server.marklogic import MarkLogicHTTPClient
+
+# default request mix and search terms
+LOAD_MIX: dict[str, float] = {"summaries": 1, "search": 1}
+LOAD_QUERIES: tuple[str, ...] = ("norwich", "lease", "contract", "appeal")
+
+# percentiles shown in a load report
+REPORT_PERCENTILES: tuple[float, ...] = (50, 75, 90, 99, 99.9, 99.99)
+
+
+class LatencyHistogram:
+    """
+    LatencyHistogram records latencies in microseconds in log-linear buckets: each
+    power of two range is split into 2**(sub_bucket_bits - 1) buckets, bounding the
+    relative error of any reported value by 2**-(sub_bucket_bits - 1). Memory use is
+    bounded by the number of occupied buckets, not the number of values recorded.
+    """
+
+    def __init__(self, sub_bucket_bits: int = 8):
+        if sub_bucket_bits < 2:
+            raise ValueError("sub_bucket_bits must be at least 2")
+        self.bits = sub_bucket_bits
+        self.counts: Counter[tuple[int, int]] = Counter()
+        self.total = 0
+        self.max = 0
+
+    def _key(self, value: int) -> tuple[int, int]:
+        exponent = max(0, value.bit_length() - self.bits)
+        return exponent, value >> exponent
+
+    def record(self, seconds: float) -> None:
+        """
+        record adds a latency of @seconds.
+        """
+        value = max(0, round(seconds * 1_000_000))
+        self.counts[self._key(value)] += 1
+        self.total += 1
+        self.max = max(self.max, value)
+
+    def merge(self, other: "LatencyHistogram") -> None:
+        """
+        merge adds every value recorded in @other, which must have the same precision.
+        """
+        if other.bits != self.bits:
+            raise ValueError("cannot merge histograms of different precision")
+        self.counts.update(other.counts)
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def _distribution(self) -> list[tuple[int, int]]:
+        """
+        _distribution returns the highest value of each occupied bucket, with the
+        cumulative count up to and including it, in value order.
+        """
+        cumulative = 0
+        out = []
+        for exponent, mantissa in sorted(self.counts):
+            cumulative += self.counts[(exponent, mantissa)]
+            highest = ((mantissa + 1) << exponent) - 1
+            out.append((min(highest, self.max), cumulative))
+        return out
+
+    def _rank(self, p: float) -> int:
+        """
+        _rank returns the 1-based rank of the value at percentile @p; the product
+        is rounded first so that float error cannot step past the exact rank.
+        """
+        return max(1, math.ceil(round(p / 100 * self.total, 9)))
+
+    def percentile(self, p: float) -> float:
+        """
+        percentile returns the latency in seconds at or below which @p percent of
+        the recorded values fall, or 0 if nothing has been recorded.
+        """
+        if self.total == 0:
+            return 0.0
+        target = self._rank(p)
+        for value, cumulative in self._distribution():
+            if cumulative >= target:
+                return value / 1_000_000
+        return self.max / 1_000_000
+
+    def percentile_distribution(self) -> str:
+        """
+        percentile_distribution returns a text table in the format of HdrHistogram's
+        outputPercentileDistribution: value (ms), percentile, total count and
+        1/(1-percentile), at percentiles halving the distance to 100 in 5 steps.
+        """
+        lines = [
+            f"{'Value(ms)':>12} {'Percentile':>14} {'TotalCount':>10} "
+            f"{'1/(1-Percentile)':>16}"
+        ]
+        if self.total == 0:
+            return lines[0] + "\n"
+        distribution = self._distribution()
+        step = 0
+        while True:
+            # 5 ticks for each halving of the distance to 100: 0, 10, ..., 50, 55, ...
+            remaining = 100 / 2 ** (step // 5)
+            p = 100 - remaining + remaining / 2 * (step % 5) / 5
+            target = self._rank(p)
+            value, cumulative = next((v, c) for v, c in distribution if c >= target)
+            lines.append(
+                f"{value / 1000:12.3f} {p / 100:14.12f} {cumulative:10d} "
+                f"{1 / (1 - p / 100):16.2f}"
+            )
+            if cumulative >= self.total:
+                lines.append(
+                    f"{self.max / 1000:12.3f} {1:14.12f} {self.total:10d} {'inf':>16}"
+                )
+                break
+            step += 1
+        return "\n".join(lines) + "\n"
+
+
+class LoadReport(NamedTuple):
+    """
+    LoadReport is the outcome of run_load. latency maps each operation, and "all",
+    to its LatencyHistogram; errors counts failures by exception type;
+    rss_samples lists (seconds since start, RSS bytes).
+    """
+
+    requests: int
+    errors: Counter
+    seconds: float
+    target_rate: float
+    latency: dict[str, LatencyHistogram]
+    rss_samples: list[tuple[float, int]]
+
+    @property
+    def error_rate(self) -> float:
+        return sum(self.errors.values()) / self.requests if self.requests else 0.0
+
+    def format(self, stand_in_stats: dict[str, int] | None = None) -> str:
+        """
+        format returns a human readable report, including the connection use
+        reported by a StandIn if @stand_in_stats is provided.
+        """
+        rate = self.requests / self.seconds if self.seconds else 0.0
+        lines = [
+            f"requests {self.requests} in {self.seconds:.1f}s: "
+            f"{rate:.1f} req/s (target {self.target_rate:.1f} req/s)",
+            f"errors {sum(self.errors.values())} ({self.error_rate:.2%})"
+            + "".join(f"\n  {name}: {n}" for name, n in self.errors.most_common()),
+            "",
+            "latency (ms) "
+            + " ".join(f"{'p' + format(p, 'g'):>9}" for p in REPORT_PERCENTILES)
+            + f" {'max':>9}",
+        ]
+        for name, hist in sorted(self.latency.items()):
+            lines.append(
+                f"{name:<12} "
+                + " ".join(
+                    f"{hist.percentile(p) * 1000:9.2f}" for p in REPORT_PERCENTILES
+                )
+                + f" {hist.max / 1000:9.2f}"
+            )
+        if stand_in_stats:
+            requests = stand_in_stats["requests"]
+            connections = stand_in_stats["connections"]
+            per = requests / connections if connections else 0.0
+            lines += [
+                "",
+                f"connections {connections} for {requests} requests "
+                f"({per:.1f} requests/connection)",
+            ]
+        if self.rss_samples:
+            first, last = self.rss_samples[0][1], self.rss_samples[-1][1]
+            peak = max(rss for _, rss in self.rss_samples)
+            lines += [
+                "",
+                f"rss (MiB) start {first / 2**20:.1f} end {last / 2**20:.1f} "
+                f"peak {peak / 2**20:.1f} growth {(last - first) / 2**20:+.1f}",
+            ]
+            lines += [
+                f"  t={t:7.1f}s {rss / 2**20:8.1f}" for t, rss in self.rss_samples
+            ]
+        lines += ["", "all requests, percentile distribution:"]
+        lines.append(self.latency["all"].percentile_distribution())
+        return "\n".join(lines)
+
+
+def rss_bytes() -> int:
+    """
+    rss_bytes returns the resident set size of this process, or its peak RSS on
+    platforms without /proc.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        import resource
+        import sys
+
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return maxrss if sys.platform == "darwin" else maxrss * 1024
+
+
+def operations(
+    client: "CaseLawClient", queries: tuple[str, ...] = LOAD_QUERIES
+) -> dict[str, Callable[[random.Random], Any]]:
+    """
+    operations returns the named client calls available to a request mix.
+    """
+    return {
+        "summaries": lambda rnd: client.get_summaries(),
+        "search": lambda rnd: client.search(rnd.choice(queries)),
+    }
+
+
+class Arrival(NamedTuple):
+    """
+    Arrival is a scheduled request: its offset in seconds from the start of a run,
+    the operation to call and a seed for the randomness of the call.
+    """
+
+    offset: float
+    operation: str
+    seed: float
+
+
+def schedule(
+    rate: float,
+    duration: float,
+    mix: dict[str, float],
+    poisson: bool = True,
+    seed: int | None = None,
+) -> Iterator[Arrival]:
+    """
+    schedule yields the arrivals of a run at @rate requests per second for @duration
+    seconds, choosing operations by the weights of @mix.
+
+    Arrivals are a Poisson process if @poisson is set. Otherwise the i-th arrival is
+    at i / @rate, computed from the integer tick rather than by summing intervals,
+    so a run has exactly ceil(@duration * @rate) arrivals. @seed seeds the choices.
+    """
+    if rate <= 0 or duration <= 0:
+        raise ValueError("rate and duration must be positive")
+    names = list(mix)
+    weights = [mix[n] for n in names]
+    rnd = random.Random(seed)
+    if poisson:
+        offset = 0.0
+        while offset < duration:
+            yield Arrival(offset, rnd.choices(names, weights)[0], rnd.random())
+            offset += rnd.expovariate(rate)
+    else:
+        # rounded first so that float error cannot add or drop a tick
+        for i in range(math.ceil(round(duration * rate, 9))):
+            yield Arrival(i / rate, rnd.choices(names, weights)[0], rnd.random())
+
+
+def run_load(
+    client: "CaseLawClient",
+    rate: float,
+    duration: float,
+    concurrency: int = 8,
+    mix: dict[str, float] | None = None,
+    queries: tuple[str, ...] = LOAD_QUERIES,
+    poisson: bool = True,
+    sample_interval: float = 1.0,
+    seed: int | None = None,
+    clock: Callable[[], float] = time.perf_counter,
+    sleep: Callable[[float], None] = time.sleep,
+) -> LoadReport:
+    """
+    run_load drives @client at @rate requests per second for @duration seconds
+    using up to @concurrency worker threads.
+
+    @mix weights the operations ("summaries", "search") to call, by default
+    LOAD_MIX. Arrivals are made by schedule, as a Poisson process if @poisson is
+    set, otherwise evenly spaced. RSS is sampled every @sample_interval seconds.
+    Times are read from @clock, in seconds, and the run waits for each arrival
+    with @sleep.
+    """
+    if rate <= 0 or duration <= 0 or concurrency < 1:
+        raise ValueError("rate, duration and concurrency must be positive")
+    mix = mix or LOAD_MIX
+    ops = operations(client, queries)
+    unknown = set(mix) - set(ops)
+    if unknown:
+        raise ValueError(f"unknown operations in mix: {sorted(unknown)}")
+    arrivals = schedule(rate, duration, mix, poisson, seed)
+
+    latency = {name: LatencyHistogram() for name in mix}
+    errors: Counter[str] = Counter()
+    lock = threading.Lock()
+    rss_samples: list[tuple[float, int]] = []
+    done = threading.Event()
+    start = clock()
+
+    def sample() -> None:
+        while True:
+            rss_samples.append((clock() - start, rss_bytes()))
+            if done.wait(sample_interval):
+                rss_samples.append((clock() - start, rss_bytes()))
+                return
+
+    def call(name: str, intended: float, call_rnd: random.Random) -> None:
+        error = None
+        try:
+            ops[name](call_rnd)
+        except Exception as err:  # report every failure rather than stopping
+            error = type(err).__name__
+        elapsed = clock() - intended
+        with lock:
+            latency[name].record(elapsed)
+            if error is not None:
+                errors[error] += 1
+
+    sampler = threading.Thread(target=sample, name="ml-akn-rss", daemon=True)
+    sampler.start()
+    requests = 0
+    with ThreadPoolExecutor(concurrency, thread_name_prefix="ml-akn-load") as pool:
+        for arrival in arrivals:
+            intended = start + arrival.offset
+            delay = intended - clock()
+            if delay > 0:
+                sleep(delay)
+            call_rnd = random.Random(arrival.seed)
+            pool.submit(call, arrival.operation, intended, call_rnd)
+            requests += 1
+    seconds = clock() - start
+    done.set()
+    sampler.join()
+
+    overall = LatencyHistogram()
+    for hist in latency.values():
+        overall.merge(hist)
+    latency["all"] = overall
+    return LoadReport(requests, errors, seconds, rate, latency, rss_samples)
+
+
+def _summary_xml(i: int, snippet: bool) -> str:
+    """
+    _summary_xml returns a canned summary for the stand-in server.
+    """
+    snippets = (
+        '<snippets><snippet>&lt;span class="highlight"&gt;Norwich&lt;/span&gt; '
+        "Union Life Insurance Society v Shopmoor Ltd</snippet></snippets>"
+        if snippet
+        else ""
+    )
+    return (
+        f"<summary><uri>/documents/doc_{i:06d}.xml</uri>"
+        f"<name>Claimant {i} v Defendant {i}</name>"
+        f"<judgmentDate>20{i % 25:02d}-0{i % 9 + 1}-1{i % 9}</judgmentDate>"
+        f"<court>EWCA-Civil</court><citation>[2020] EWCA Civ {i}</citation>"
+        f"{snippets}</summary>"
+    )
+
+
+class StandInResponder:
+    """
+    StandInResponder decides the answers of the stand-in server. Each request is
+    answered after @latency seconds plus a uniformly distributed @jitter, waited
+    for with @sleep, and a @failure_rate fraction of requests fail with a 500
+    error. Responses hold @size canned summaries. @seed seeds the failures and
+    jitter. It is safe to use from several threads.
+    """
+
+    boundary = "ml-akn-stand-in"
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        failure_rate: float = 0.0,
+        size: int = 10,
+        seed: int | None = None,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.sleep = sleep
+        self.bodies: dict[str, bytes] = {}
+        for module, snippet in (("summaries.xqy", False), ("search.xqy", True)):
+            xml = (
+                "<summaries>"
+                + "".join(_summary_xml(i, snippet) for i in range(size))
+                + "</summaries>"
+            )
+            self.bodies[module] = (
+                f"--{self.boundary}\r\nContent-Type: application/xml\r\n\r\n"
+                f"{xml}\r\n--{self.boundary}--\r\n"
+            ).encode("utf-8")
+        self._lock = threading.Lock()
+        self._peers: set[Any] = set()
+        self._requests = 0
+        self._rnd = random.Random(seed)
+
+    def respond(self, module: str, peer: Any = None) -> tuple[int, str, bytes]:
+        """
+        respond returns the status, content type and body answering a request from
+        @peer, a client address, to invoke @module, after the injected latency.
+        """
+        with self._lock:
+            self._peers.add(peer)
+            self._requests += 1
+            fail = self._rnd.random() < self.failure_rate
+            pause = self.latency + self._rnd.uniform(0, self.jitter)
+        self.sleep(pause)
+        module = module.rpartition("/")[2]
+        if fail:
+            return 500, "text/plain", b"injected failure"
+        if module not in self.bodies:
+            return 404, "text/plain", f"unknown module {module}".encode()
+        return 200, f"multipart/mixed; boundary={self.boundary}", self.bodies[module]
+
+    def stats(self) -> dict[str, int]:
+        """
+        stats returns the number of requests and distinct peers seen.
+        """
+        with self._lock:
+            return {"requests": self._requests, "connections": len(self._peers)}
+
+
+def _stand_in_main(
+    port_queue: Any,
+    latency: float,
+    jitter: float,
+    failure_rate: float,
+    size: int,
+    seed: int | None,
+) -> None:
+    """
+    _stand_in_main runs the stand-in server; it is the target of the StandIn child
+    process.
+    """
+    responder = StandInResponder(latency, jitter, failure_rate, size, seed)
+
+    class Handler(BaseHTTPRequestHandler):
+        # HTTP/1.1 keeps connections alive, so that their reuse can be counted
+        protocol_version = "HTTP/1.1"
+        # headers and body are written separately; avoid delayed ACK stalls
+        disable_nagle_algorithm = True
+
+        def respond(self, status: int, content_type: str, body: bytes) -> None:
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self) -> None:
+            body = json.dumps(responder.stats()).encode("utf-8")
+            self.respond(200, "application/json", body)
+
+        def do_POST(self) -> None:
+            form = parse_qs(
+                self.rfile.read(int(self.headers.get("Content-Length", 0))).decode()
+            )
+            module = form.get("module", [""])[0]
+            self.respond(*responder.respond(module, self.client_address))
+
+        def log_message(self, format: str, *args: Any) -> None:
+            pass
+
+    server = ThreadingHTTPServer(("localhost", 0), Handler)
+    server.daemon_threads = True
+    port_queue.put(server.server_address[1])
+    server.serve_forever()
+
+
+class StandIn:
+    """
+    StandIn is a local stand-in MarkLogic server running in a child process, answering
+    with a StandInResponder.
+
+    Each request is answered after @latency seconds plus a uniformly distributed
+    @jitter, and a @failure_rate fraction of requests fail with a 500 error.
+    Responses hold @size canned summaries. @seed seeds the failures and jitter.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        failure_rate: float = 0.0,
+        size: int = 10,
+        seed: int | None = None,
+    ):
+        if latency < 0 or jitter < 0 or not 0 <= failure_rate <= 1 or size < 0:
+            raise ValueError("invalid stand-in configuration")
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.size = size
+        self.seed = seed
+        self.port = 0
+        self._process: multiprocessing.Process | None = None
+
+    def start(self) -> "StandIn":
+        """
+        start starts the stand-in server and waits until it is listening.
+        """
+        queue: Any = multiprocessing.Queue()
+        self._process = multiprocessing.Process(
+            target=_stand_in_main,
+            args=(
+                queue,
+                self.latency,
+                self.jitter,
+                self.failure_rate,
+                self.size,
+                self.seed,
+            ),
+            daemon=True,
+        )
+        self._process.start()
+        self.port = queue.get(timeout=30)
+        return self
+
+    def stop(self) -> None:
+        """
+        stop terminates the stand-in server.
+        """
+        if self._process is not None:
+            self._process.terminate()
+            self._process.join()
+            self._process = None
+
+    def __enter__(self) -> "StandIn":
+        return self.start()
+
+    def __exit__(self, *exc: object) -> None:
+        self.stop()
+
+    def http_client(self) -> "MarkLogicHTTPClient":
+        """
+        http_client returns a MarkLogicHTTPClient addressing the stand-in.
+        """
+        from ml_akn_client.server.marklogic import MarkLogicHTTPClient
+
+        return MarkLogicHTTPClient(
+            host="localhost", port=self.port, username="load", password="stand-in"
+        )
+
+    def stats(self) -> dict[str, int]:
+        """
+        stats returns the number of requests and distinct client connections the
+        stand-in has seen.
+        """
+        with urlopen(f"http://localhost:{self.port}/stats", timeout=5) as r:
+            return json.loads(r.read())
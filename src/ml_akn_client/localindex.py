@@ -0,0 +1,978 @@
+"""
+localindex.py
+
+An in-process search index over locally synced summaries and judgment paragraph
+text, answering searches when MarkLogic is unreachable or on read replicas.
+
+The index is inverted: each term maps to the sorted ordinals of the documents
+containing it and, for each, the positions of the term in the document. Terms are
+matched as search.xqy configures search:search: words are case-insensitive and
+stemmed, and, as by MarkLogic's default, diacritic-insensitive. The stemmer is a
+light English suffix stripper, an approximation of MarkLogic's dictionary stemming.
+A document's name, court and citation and its paragraphs are searchable; snippets
+are taken from the paragraphs only, as search.xqy prefers the AKN "p" elements, and
+are produced in the same escaped-HTML format, with matches wrapped in
+<span class="highlight"></span>.
+
+Queries are the default conjunction of search:search: every word, and every quoted
+phrase, must match. Words joined by punctuation, such as "EWCA-Civil", are phrases.
+The rest of the search:search grammar, such as OR and negation, is not supported.
+
+The index is a list of immutable segments. Documents added, replaced or removed are
+buffered in an in-memory segment, which flush writes to a new on-disk segment file;
+the replaced and removed documents of earlier segments are recorded as deleted.
+Segment files are memory-mapped, so that postings and paragraph text are read from
+the page cache on demand rather than loaded into memory. When there are more than
+LOCAL_INDEX_MAX_SEGMENTS segments they are compacted into one. The list of segments
+and their deletions is kept in the LOCAL_INDEX_MANIFEST file, replaced atomically, so
+that an interrupted flush leaves the previous index intact.
+
+A search with a limit matching many documents walks each segment's documents in sort
+order until it has found enough, rather than sorting every match, and merges the
+segments' results with a heap, so that searches for common terms stay fast.
+
+Example:
+    with LocalIndex("index") as index:
+        index.add(summary, paragraphs)
+        index.flush()
+        result = index.search("norwich", sort_by="date", limit=10)
+"""
+
+import heapq
+import html
+import json
+import mmap
+import os
+import re
+import struct
+import threading
+import unicodedata
+from abc import ABC, abstractmethod
+from bisect import bisect_left, bisect_right
+from functools import lru_cache
+from itertools import islice
+from pathlib import Path
+from typing import Any, Callable, Iterable, Iterator, Literal, NamedTuple, Sequence
+
+from ml_akn_client import fanout
+from ml_akn_client.models.search import SearchSummaries, SearchSummary, Snippet
+from ml_akn_client.models.summaries import PageSummary, Summary
+from ml_akn_client.server.marklogic import (
+    ML_COLLECTION,
+    SEARCH_MAX_MATCHES,
+    SEARCH_MAX_SNIPPET_CHARS,
+    SEARCH_PER_MATCH_TOKENS,
+)
+
+# when CaseLawClient.search answers from a local index: only if the server cannot
+# be reached, or always
+local_search_modes = Literal["fallback", "always"]
+
+LOCAL_INDEX_MANIFEST: str = "index.json"
+LOCAL_INDEX_VERSION: int = 1
+
+# buffered documents written to a new segment automatically
+LOCAL_INDEX_FLUSH_DOCS: int = 10_000
+
+# segments above which the index is compacted on flush
+LOCAL_INDEX_MAX_SEGMENTS: int = 8
+
+# the summary fields which are searchable, with the paragraphs
+SEARCHABLE_FIELDS: tuple[str, ...] = ("name", "court", "citation")
+
+# a position is the field (a summary field, then each paragraph) in the high bits
+# and the word within it in the low bits; later words are not positioned
+POSITION_BITS: int = 16
+POSITION_MASK: int = (1 << POSITION_BITS) - 1
+
+# the number of terms whose postings each segment keeps decoded
+POSTINGS_CACHE_TERMS: int = 64
+
+# matches per limited result above which the sort order is walked
+DENSE_MATCHES: int = 4
+
+SEGMENT_MAGIC: bytes = b"MLAKNIX1"
+# magic, documents, terms, term index, document index, uris offset and length
+SEGMENT_HEADER = struct.Struct("<8sII4Q")
+# term offset and length, postings offset and count; the postings are followed by
+# count + 1 position offsets and the positions
+TERM_ENTRY = struct.Struct("<QIQI")
+# summary offset and length, paragraphs offset and length
+DOC_ENTRY = struct.Struct("<QIQI")
+# ordinals, position offsets and positions are little-endian unsigned 32 bit
+# integers, whatever the native size and byte order
+UINT32 = struct.Struct("<I")
+
+WORD = re.compile(r"\w+")
+QUERY_ITEM = re.compile(r'"([^"]*)"|(\S+)')
+SNIPPET_ELLIPSIS: str = "..."
+
+
+class LocalIndexException(Exception):
+    """
+    LocalIndexException reports a failure reading or writing a local index.
+    """
+
+    pass
+
+
+def stem(word: str) -> str:
+    """
+    stem returns the stem of the case folded @word, stripping common English
+    inflections, for example "appeals", "appealed" and "appealing" to "appeal".
+    """
+    if len(word) <= 3 or not word.isalpha():
+        return word
+    base = word
+    if word.endswith("ies") and len(word) > 4:
+        base = word[:-3] + "y"
+    elif word.endswith("sses"):
+        base = word[:-2]
+    elif word.endswith("es") and word[-3] in "sxz" or word.endswith(("ches", "shes")):
+        base = word[:-2]
+    elif word.endswith("s") and not word.endswith(("ss", "us", "is")):
+        base = word[:-1]
+    elif word.endswith("eed") and len(word) > 5:
+        base = word[:-1]
+    elif word.endswith(("ing", "ed")):
+        candidate = word[: -3 if word.endswith("ing") else -2]
+        if len(candidate) >= 3 and any(c in "aeiouy" for c in candidate):
+            base = candidate
+            if base[-1] == base[-2] and base[-1] not in "aeiouylsz":
+                base = base[:-1]
+    if len(base) > 3 and base.endswith("e"):
+        base = base[:-1]
+    return base
+
+
+@lru_cache(maxsize=1 << 16)
+def term(word: str) -> str:
+    """
+    term returns the index term of @word: case folded, without diacritics and
+    stemmed.
+    """
+    decomposed = unicodedata.normalize("NFKD", word.casefold())
+    return stem("".join(c for c in decomposed if not unicodedata.combining(c)))
+
+
+def terms(text: str) -> list[str]:
+    """
+    terms returns the terms of the words of @text, in order.
+    """
+    return [term(w) for w in WORD.findall(text)]
+
+
+def parse_query(query: str) -> list[list[str]]:
+    """
+    parse_query returns the terms of each word or quoted phrase of @query which
+    must match; an item of more than one term is a phrase.
+    """
+    items = []
+    for phrase, word in QUERY_ITEM.findall(query):
+        item = terms(phrase or word)
+        if item:
+            items.append(item)
+    return items
+
+
+class IndexedDocument(NamedTuple):
+    """
+    IndexedDocument is a summary with the paragraph text of its judgment and the
+    server's version of the document when it was indexed, if known.
+    """
+
+    summary: Summary
+    paragraphs: tuple[str, ...] = ()
+    version: str | None = None
+
+
+def document_positions(document: IndexedDocument) -> dict[str, list[int]]:
+    """
+    document_positions returns the positions of each term of @document.
+    """
+    texts = [getattr(document.summary, f) or "" for f in SEARCHABLE_FIELDS]
+    positions: dict[str, list[int]] = {}
+    for field, text in enumerate([*texts, *document.paragraphs]):
+        if field > POSITION_MASK:
+            break
+        base = field << POSITION_BITS
+        for i, word in enumerate(islice(WORD.findall(text), POSITION_MASK + 1)):
+            positions.setdefault(term(word), []).append(base | i)
+    return positions
+
+
+def _contains(ordinals: Sequence[int], ordinal: int) -> bool:
+    """
+    _contains reports if the sorted @ordinals contain @ordinal.
+    """
+    i = bisect_left(ordinals, ordinal)
+    return i < len(ordinals) and ordinals[i] == ordinal
+
+
+class _Segment(ABC):
+    """
+    _Segment is a set of documents, numbered by ordinal, with their postings. The
+    sort keys and order of its documents are computed once for each sort field.
+    """
+
+    def __init__(self) -> None:
+        self.uris: list[str] = []
+        self.keys: dict[str, list[tuple[Any, ...]]] = {}
+        self.orders: dict[str, list[int]] = {}
+
+    @abstractmethod
+    def postings(self, term: str) -> Sequence[int]:
+        """
+        postings returns the sorted ordinals of the documents containing @term.
+        """
+
+    @abstractmethod
+    def positions(self, term: str, ordinal: int) -> Sequence[int]:
+        """
+        positions returns the positions of @term in document @ordinal.
+        """
+
+    @abstractmethod
+    def summary(self, ordinal: int) -> Summary:
+        """
+        summary returns the summary of document @ordinal.
+        """
+
+    @abstractmethod
+    def document(self, ordinal: int) -> IndexedDocument:
+        """
+        document returns document @ordinal with its paragraphs.
+        """
+
+    @abstractmethod
+    def version(self, ordinal: int) -> str | None:
+        """
+        version returns the server's version of document @ordinal, if known,
+        without reading its paragraphs.
+        """
+
+    def sort_keys(self, sort_by: str) -> list[tuple[Any, ...]]:
+        """
+        sort_keys returns the key of each document sorting by @sort_by, ending with
+        the uri so that the order is stable.
+        """
+        if sort_by not in self.keys:
+            key = fanout.sort_key(sort_by)
+            self.keys[sort_by] = [
+                (*key(self.summary(i)), uri) for i, uri in enumerate(self.uris)
+            ]
+        return self.keys[sort_by]
+
+    def sort_order(self, sort_by: str) -> list[int]:
+        """
+        sort_order returns the ordinals of the documents sorted by @sort_by.
+        """
+        if sort_by not in self.orders:
+            keys = self.sort_keys(sort_by)
+            self.orders[sort_by] = sorted(range(len(keys)), key=keys.__getitem__)
+        return self.orders[sort_by]
+
+    def close(self) -> None:
+        pass
+
+    def __len__(self) -> int:
+        return len(self.uris)
+
+
+class MemorySegment(_Segment):
+    """
+    MemorySegment is a segment of documents held in memory, to which documents are
+    added until it is written to disk.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.documents: list[IndexedDocument] = []
+        self.index: dict[str, list[int]] = {}
+        self.index_positions: dict[str, list[list[int]]] = {}
+
+    def add(self, document: IndexedDocument) -> int:
+        """
+        add adds @document, returning its ordinal.
+        """
+        ordinal = len(self.documents)
+        self.uris.append(document.summary.uri)
+        self.documents.append(document)
+        for t, positions in document_positions(document).items():
+            self.index.setdefault(t, []).append(ordinal)
+            self.index_positions.setdefault(t, []).append(positions)
+        self.keys.clear()
+        self.orders.clear()
+        return ordinal
+
+    def postings(self, term: str) -> Sequence[int]:
+        return self.index.get(term, ())
+
+    def positions(self, term: str, ordinal: int) -> Sequence[int]:
+        ordinals = self.index.get(term, ())
+        i = bisect_left(ordinals, ordinal)
+        if i < len(ordinals) and ordinals[i] == ordinal:
+            return self.index_positions[term][i]
+        return ()
+
+    def document(self, ordinal: int) -> IndexedDocument:
+        return self.documents[ordinal]
+
+    def summary(self, ordinal: int) -> Summary:
+        return self.documents[ordinal].summary
+
+    def version(self, ordinal: int) -> str | None:
+        return self.documents[ordinal].version
+
+
+def _uint32(values: Iterable[int]) -> bytes:
+    """
+    _uint32 returns @values as little-endian unsigned 32 bit integers.
+    """
+    values = list(values)
+    return struct.pack(f"<{len(values)}I", *values)
+
+
+def write_segment(path: Path, documents: Iterable[IndexedDocument]) -> None:
+    """
+    write_segment writes @documents to a new segment file at @path, replacing any
+    existing file atomically.
+    """
+    segment = MemorySegment()
+    for document in documents:
+        segment.add(document)
+    if not len(segment):
+        raise LocalIndexException("cannot write an empty segment")
+
+    body = bytearray()
+
+    def append(data: bytes) -> int:
+        start = SEGMENT_HEADER.size + len(body)
+        body.extend(data)
+        return start
+
+    term_entries = []
+    for t in sorted(segment.index, key=lambda t: t.encode("utf-8")):
+        encoded = t.encode("utf-8")
+        ordinals = segment.index[t]
+        positions = segment.index_positions[t]
+        offsets = [0]
+        for p in positions:
+            offsets.append(offsets[-1] + len(p))
+        start = append(_uint32(ordinals))
+        append(_uint32(offsets))
+        append(_uint32(p for ps in positions for p in ps))
+        term_entries.append(
+            TERM_ENTRY.pack(append(encoded), len(encoded), start, len(ordinals))
+        )
+    doc_entries = []
+    for document in segment.documents:
+        record = document.summary.model_dump(mode="json")
+        record["version"] = document.version
+        summary = json.dumps(record).encode("utf-8")
+        paragraphs = json.dumps(document.paragraphs).encode("utf-8")
+        doc_entries.append(
+            DOC_ENTRY.pack(
+                append(summary), len(summary), append(paragraphs), len(paragraphs)
+            )
+        )
+    uris = "\n".join(segment.uris).encode("utf-8")
+    uris_offset = append(uris)
+    term_index = append(b"".join(term_entries))
+    doc_index = append(b"".join(doc_entries))
+    header = SEGMENT_HEADER.pack(
+        SEGMENT_MAGIC,
+        len(segment),
+        len(term_entries),
+        term_index,
+        doc_index,
+        uris_offset,
+        len(uris),
+    )
+    tmp = path.with_name(path.name + ".tmp")
+    try:
+        with open(tmp, "wb") as fh:
+            fh.write(header)
+            fh.write(body)
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(tmp, path)
+    except OSError as err:
+        raise LocalIndexException(f"could not write segment {path}: {err}") from err
+
+
+class DiskSegment(_Segment):
+    """
+    DiskSegment is a memory-mapped segment file. Terms are found by binary search of
+    the sorted term index and the postings of recently searched terms are kept;
+    summaries are decoded when first needed and kept.
+    """
+
+    def __init__(self, path: Path):
+        super().__init__()
+        self.path = path
+        try:
+            with open(path, "rb") as fh:
+                self.mm = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError) as err:
+            raise LocalIndexException(f"could not open segment {path}: {err}") from err
+        try:
+            (
+                magic,
+                _,
+                self.term_count,
+                self.term_index,
+                self.doc_index,
+                uris_offset,
+                uris_length,
+            ) = SEGMENT_HEADER.unpack_from(self.mm, 0)
+        except struct.error:
+            magic = b""
+        if magic != SEGMENT_MAGIC:
+            self.mm.close()
+            raise LocalIndexException(f"{path} is not a segment")
+        self.uris = (
+            self.mm[uris_offset : uris_offset + uris_length].decode("utf-8").split("\n")
+        )
+        self.summaries: dict[int, Summary] = {}
+        self._lookup = lru_cache(maxsize=POSTINGS_CACHE_TERMS)(self._find)
+
+    def _read(self, offset: int, count: int) -> tuple[int, ...]:
+        """
+        _read returns @count unsigned 32 bit integers from @offset.
+        """
+        return struct.unpack_from(f"<{count}I", self.mm, offset)
+
+    def _find(self, wanted: str) -> tuple[int, tuple[int, ...]] | None:
+        """
+        _find returns the postings offset and ordinals of @wanted, or None if it is
+        not in the segment.
+        """
+        encoded = wanted.encode("utf-8")
+        lo, hi = 0, self.term_count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            offset, length, postings, count = TERM_ENTRY.unpack_from(
+                self.mm, self.term_index + mid * TERM_ENTRY.size
+            )
+            found = self.mm[offset : offset + length]
+            if found < encoded:
+                lo = mid + 1
+            elif found > encoded:
+                hi = mid
+            else:
+                return postings, self._read(postings, count)
+        return None
+
+    def postings(self, term: str) -> Sequence[int]:
+        found = self._lookup(term)
+        return () if found is None else found[1]
+
+    def positions(self, term: str, ordinal: int) -> Sequence[int]:
+        found = self._lookup(term)
+        if found is None:
+            return ()
+        offset, ordinals = found
+        i = bisect_left(ordinals, ordinal)
+        if i == len(ordinals) or ordinals[i] != ordinal:
+            return ()
+        size = UINT32.size
+        offsets = offset + len(ordinals) * size
+        start, end = self._read(offsets + i * size, 2)
+        return self._read(offsets + (len(ordinals) + 1 + start) * size, end - start)
+
+    def _document_entry(self, ordinal: int) -> tuple[int, int, int, int]:
+        return DOC_ENTRY.unpack_from(self.mm, self.doc_index + ordinal * DOC_ENTRY.size)
+
+    def summary(self, ordinal: int) -> Summary:
+        if ordinal not in self.summaries:
+            offset, length, _, _ = self._document_entry(ordinal)
+            self.summaries[ordinal] = Summary.model_validate_json(
+                self.mm[offset : offset + length]
+            )
+        return self.summaries[ordinal]
+
+    def document(self, ordinal: int) -> IndexedDocument:
+        _, _, offset, length = self._document_entry(ordinal)
+        paragraphs = json.loads(self.mm[offset : offset + length])
+        return IndexedDocument(
+            self.summary(ordinal), tuple(paragraphs), self.version(ordinal)
+        )
+
+    def version(self, ordinal: int) -> str | None:
+        offset, length, _, _ = self._document_entry(ordinal)
+        return json.loads(self.mm[offset : offset + length]).get("version")
+
+    def close(self) -> None:
+        self.mm.close()
+
+
+def _snippet(
+    paragraphs: Sequence[str],
+    highlights: dict[int, set[int]],
+    per_match_tokens: int,
+    max_matches: int,
+    max_snippet_chars: int,
+) -> str | None:
+    """
+    _snippet returns the html-escaped snippet of the words to highlight in
+    @paragraphs, given as the word numbers of each paragraph number in @highlights,
+    or None if there are none. As for search.xqy, up to @max_matches paragraphs
+    contribute a match of at most @per_match_tokens words around their first
+    highlighted word, within @max_snippet_chars characters in all.
+    """
+    matches: list[str] = []
+    chars = 0
+    for number in sorted(highlights):
+        if number >= len(paragraphs):
+            continue
+        text = paragraphs[number]
+        hits = highlights[number]
+        first = min(hits)
+        words = list(islice(WORD.finditer(text), first + per_match_tokens))
+        if first >= len(words):
+            continue
+        starts = [w.start() for w in words]
+        ends = [w.end() for w in words]
+        lo = max(0, first - per_match_tokens // 2)
+        hi = min(len(words), lo + per_match_tokens)
+        lo = max(0, hi - per_match_tokens)
+        # drop words after, then before, the first hit to fit the characters left
+        budget = max_snippet_chars - chars
+        if ends[hi - 1] - starts[lo] > budget:
+            hi = max(first + 1, bisect_right(ends, starts[lo] + budget, lo, hi))
+        if ends[hi - 1] - starts[lo] > budget:
+            lo = min(first, bisect_left(starts, ends[hi - 1] - budget, lo, hi))
+        width = ends[hi - 1] - starts[lo]
+        if matches and width > budget:
+            break
+        out = [SNIPPET_ELLIPSIS] if lo > 0 else []
+        position = starts[lo]
+        for i in sorted(h for h in hits if lo <= h < hi):
+            out.append(html.escape(text[position : starts[i]], quote=False))
+            word = html.escape(text[starts[i] : ends[i]], quote=False)
+            out.append(f'<span class="highlight">{word}</span>')
+            position = ends[i]
+        # the punctuation following the last word of a paragraph is kept
+        truncated = hi < len(words) or WORD.search(text, ends[hi - 1]) is not None
+        end = ends[hi - 1] if truncated else len(text)
+        out.append(html.escape(text[position:end], quote=False))
+        if truncated:
+            out.append(SNIPPET_ELLIPSIS)
+        matches.append("".join(out))
+        chars += width
+        if len(matches) >= max_matches or chars >= max_snippet_chars:
+            break
+    return "".join(matches) if matches else None
+
+
+class LocalIndex:
+    """
+    LocalIndex is an index of the documents of a collection held in @directory,
+    created if it does not exist. Up to @flush_docs added documents are buffered
+    before being written to a new segment. Searches and updates may be made
+    concurrently.
+    """
+
+    def __init__(
+        self,
+        directory: str | Path,
+        collection: str = ML_COLLECTION,
+        flush_docs: int = LOCAL_INDEX_FLUSH_DOCS,
+    ):
+        if flush_docs < 1:
+            raise LocalIndexException("flush_docs must be at least 1")
+        self.directory = Path(directory)
+        self.flush_docs = flush_docs
+        self.lock = threading.RLock()
+        manifest_path = self.directory / LOCAL_INDEX_MANIFEST
+        manifest: dict[str, Any]
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            manifest = (
+                json.loads(manifest_path.read_text())
+                if manifest_path.exists()
+                else {"collection": collection, "next": 0, "segments": []}
+            )
+        except (OSError, ValueError) as err:
+            raise LocalIndexException(
+                f"could not read index {self.directory}: {err}"
+            ) from err
+        if manifest["collection"] != collection:
+            raise LocalIndexException(
+                f"index {self.directory} is of collection {manifest['collection']!r}"
+            )
+        self.collection = collection
+        self.next: int = manifest["next"]
+        self.names: list[str] = []
+        self.segments: list[_Segment] = []
+        self.deleted: list[set[int]] = []
+        # the segment position and ordinal of each live document
+        self.locations: dict[str, tuple[int, int]] = {}
+        for entry in manifest["segments"]:
+            self._append(entry["name"], DiskSegment(self.directory / entry["name"]))
+            self.deleted[-1].update(entry["deleted"])
+        for position, segment in enumerate(self.segments):
+            for ordinal, uri in enumerate(segment.uris):
+                if ordinal not in self.deleted[position]:
+                    self.locations[uri] = (position, ordinal)
+        self._append("", MemorySegment())
+
+    def _append(self, name: str, segment: _Segment) -> None:
+        self.names.append(name)
+        self.segments.append(segment)
+        self.deleted.append(set())
+
+    @property
+    def buffer(self) -> MemorySegment:
+        """
+        buffer is the in-memory segment holding documents not yet flushed.
+        """
+        buffer = self.segments[-1]
+        assert isinstance(buffer, MemorySegment)
+        return buffer
+
+    def _delete(self, uri: str) -> bool:
+        location = self.locations.pop(uri, None)
+        if location is None:
+            return False
+        self.deleted[location[0]].add(location[1])
+        return True
+
+    def add(
+        self,
+        summary: Summary,
+        paragraphs: Sequence[str] = (),
+        version: str | None = None,
+    ) -> None:
+        """
+        add adds the document summarised by @summary, with the text of its judgment
+        @paragraphs and the server's @version of it, replacing any document with
+        the same uri.
+        """
+        with self.lock:
+            self._delete(summary.uri)
+            document = IndexedDocument(summary, tuple(paragraphs), version)
+            ordinal = self.buffer.add(document)
+            self.locations[summary.uri] = (len(self.segments) - 1, ordinal)
+            if len(self.buffer) >= self.flush_docs:
+                self.flush()
+
+    def remove(self, uri: str) -> bool:
+        """
+        remove removes the document @uri, reporting if it was present.
+        """
+        with self.lock:
+            return self._delete(uri)
+
+    def get(self, uri: str) -> IndexedDocument | None:
+        """
+        get returns the document @uri, or None if it is not present.
+        """
+        with self.lock:
+            location = self.locations.get(uri)
+            if location is None:
+                return None
+            return self.segments[location[0]].document(location[1])
+
+    def version(self, uri: str) -> str | None:
+        """
+        version returns the server's version of the document @uri, or None if it
+        is not present or has no version, without reading its paragraphs.
+        """
+        with self.lock:
+            location = self.locations.get(uri)
+            if location is None:
+                return None
+            return self.segments[location[0]].version(location[1])
+
+    def uris(self) -> list[str]:
+        """
+        uris returns the uris of the documents in the index.
+        """
+        with self.lock:
+            return list(self.locations)
+
+    def _save_manifest(self) -> None:
+        manifest = {
+            "version": LOCAL_INDEX_VERSION,
+            "collection": self.collection,
+            "next": self.next,
+            "segments": [
+                {"name": name, "deleted": sorted(deleted)}
+                for name, deleted in zip(self.names[:-1], self.deleted[:-1])
+            ],
+        }
+        path = self.directory / LOCAL_INDEX_MANIFEST
+        tmp = path.with_name(path.name + ".tmp")
+        try:
+            tmp.write_text(json.dumps(manifest))
+            os.replace(tmp, path)
+        except OSError as err:
+            raise LocalIndexException(f"could not write {path}: {err}") from err
+
+    def _new_segment_path(self) -> Path:
+        self.next += 1
+        return self.directory / f"segment-{self.next:06d}.idx"
+
+    def flush(self) -> None:
+        """
+        flush writes the buffered documents to a new segment and records the
+        deletions, compacting the index if it has too many segments.
+        """
+        with self.lock:
+            position = len(self.segments) - 1
+            live = [
+                o for o in range(len(self.buffer)) if o not in self.deleted[position]
+            ]
+            if live:
+                path = self._new_segment_path()
+                write_segment(path, (self.buffer.document(o) for o in live))
+                segment = DiskSegment(path)
+                self.names[position] = path.name
+                self.segments[position] = segment
+                self.deleted[position] = set()
+                for ordinal, uri in enumerate(segment.uris):
+                    self.locations[uri] = (position, ordinal)
+                self._append("", MemorySegment())
+            else:
+                self.segments[position] = MemorySegment()
+                self.deleted[position] = set()
+            self._save_manifest()
+            if len(self.segments) - 1 > LOCAL_INDEX_MAX_SEGMENTS:
+                self.compact()
+
+    def compact(self) -> None:
+        """
+        compact flushes the index and rewrites its live documents as one segment,
+        removing the deleted documents and the old segment files.
+        """
+        with self.lock:
+            if len(self.buffer):
+                self.flush()
+            old = list(zip(self.names[:-1], self.segments[:-1]))
+            if len(old) <= 1 and not any(self.deleted[:-1]):
+                return
+            live = sorted(self.locations.values())
+            self.names, self.segments, self.deleted = [], [], []
+            self.locations = {}
+            if live:
+                path = self._new_segment_path()
+                write_segment(path, (old[p][1].document(o) for p, o in live))
+                self._append(path.name, DiskSegment(path))
+                for ordinal, uri in enumerate(self.segments[0].uris):
+                    self.locations[uri] = (0, ordinal)
+            self._append("", MemorySegment())
+            self._save_manifest()
+            for name, segment in old:
+                segment.close()
+                (self.directory / name).unlink(missing_ok=True)
+
+    def _matcher(
+        self, position: int, items: list[list[str]]
+    ) -> tuple[Sequence[int] | None, Callable[[int], bool]]:
+        """
+        _matcher returns the smallest postings of the terms of @items in segment
+        @position (None if there are no terms), and a predicate reporting if a
+        document of the segment matches every item. The predicate checks every
+        postings list, as the dense walk of _segment_hits tests documents which
+        need not be in the smallest.
+        """
+        segment = self.segments[position]
+        deleted = self.deleted[position]
+        postings = {t: segment.postings(t) for item in items for t in item}
+        ordered = sorted(postings.values(), key=len)
+        smallest = ordered[0] if ordered else None
+        phrases = [item for item in items if len(item) > 1]
+
+        def matches(ordinal: int) -> bool:
+            if ordinal in deleted:
+                return False
+            if not all(_contains(p, ordinal) for p in ordered):
+                return False
+            for phrase in phrases:
+                starts = set(segment.positions(phrase[0], ordinal))
+                for offset, t in enumerate(phrase[1:], 1):
+                    found = segment.positions(t, ordinal)
+                    starts &= {p - offset for p in found}
+                if not starts:
+                    return False
+            return True
+
+        return smallest, matches
+
+    def _segment_hits(
+        self,
+        position: int,
+        items: list[list[str]],
+        sort_by: str,
+        reverse: bool,
+        limit: int,
+    ) -> list[tuple[tuple[Any, ...], int, int]]:
+        """
+        _segment_hits returns the first @limit (all if 0) documents of segment
+        @position matching @items in sort order, each as its sort key, the segment
+        position and its ordinal.
+        """
+        segment = self.segments[position]
+        smallest, matches = self._matcher(position, items)
+        if smallest is not None and not smallest:
+            return []
+        keys = segment.sort_keys(sort_by)
+        candidates = len(segment) if smallest is None else len(smallest)
+        if limit and candidates > DENSE_MATCHES * limit:
+            order = segment.sort_order(sort_by)
+            walk: Iterator[int] = reversed(order) if reverse else iter(order)
+            found = list(islice((o for o in walk if matches(o)), limit))
+        else:
+            pool = range(len(segment)) if smallest is None else smallest
+            found = sorted(
+                (o for o in pool if matches(o)), key=keys.__getitem__, reverse=reverse
+            )
+            if limit:
+                found = found[:limit]
+        return [(keys[o], position, o) for o in found]
+
+    def _highlights(
+        self, position: int, ordinal: int, wanted: set[str]
+    ) -> dict[int, set[int]]:
+        """
+        _highlights returns the words to highlight in each paragraph of a document,
+        by paragraph number.
+        """
+        segment = self.segments[position]
+        out: dict[int, set[int]] = {}
+        first = len(SEARCHABLE_FIELDS)
+        for t in wanted:
+            for p in segment.positions(t, ordinal):
+                field = p >> POSITION_BITS
+                if field >= first:
+                    out.setdefault(field - first, set()).add(p & POSITION_MASK)
+        return out
+
+    def search(
+        self,
+        query: str,
+        sort_by: str = "name",
+        sort_direction: str = "desc",
+        fields: tuple[str, ...] | None = None,
+        snippets: bool = True,
+        per_match_tokens: int = SEARCH_PER_MATCH_TOKENS,
+        max_matches: int = SEARCH_MAX_MATCHES,
+        max_snippet_chars: int = SEARCH_MAX_SNIPPET_CHARS,
+        limit: int = 0,
+    ) -> SearchSummaries:
+        """
+        search returns the summaries of the documents matching @query, sorted and
+        limited as for CaseLawClient.search, projected onto @fields (all if None)
+        and, if @snippets is set, with snippets limited by @per_match_tokens,
+        @max_matches and @max_snippet_chars.
+        """
+        if min(per_match_tokens, max_matches, max_snippet_chars) < 1:
+            raise LocalIndexException("snippet limits must be at least 1")
+        if limit < 0:
+            raise LocalIndexException("limit must not be negative")
+        items = parse_query(query)
+        wanted = {t for item in items for t in item}
+        reverse = sort_direction == "desc"
+        include = None if fields is None else {"uri", *fields}
+        out = []
+        with self.lock:
+            merged = heapq.merge(
+                *(
+                    self._segment_hits(p, items, sort_by, reverse, limit)
+                    for p in range(len(self.segments))
+                ),
+                reverse=reverse,
+            )
+            for _, position, ordinal in islice(merged, limit or None):
+                segment = self.segments[position]
+                snippet = None
+                if snippets and wanted:
+                    highlights = self._highlights(position, ordinal, wanted)
+                    if highlights:
+                        snippet = _snippet(
+                            segment.document(ordinal).paragraphs,
+                            highlights,
+                            per_match_tokens,
+                            max_matches,
+                            max_snippet_chars,
+                        )
+                out.append(
+                    SearchSummary(
+                        **segment.summary(ordinal).model_dump(include=include),
+                        snippets=[Snippet(snippet=snippet)] if snippet else [],
+                    )
+                )
+        return SearchSummaries(cached=False, summaries=out)
+
+    def close(self) -> None:
+        """
+        close releases the memory maps of the segments; buffered documents which
+        have not been flushed are discarded.
+        """
+        with self.lock:
+            for segment in self.segments:
+                segment.close()
+
+    def __len__(self) -> int:
+        return len(self.locations)
+
+    def __contains__(self, uri: object) -> bool:
+        return uri in self.locations
+
+    def __enter__(self) -> "LocalIndex":
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+
+class SyncResult(NamedTuple):
+    """
+    SyncResult reports a sync of a local index: the documents added, replaced and
+    removed, and the number left unchanged.
+    """
+
+    added: int
+    replaced: int
+    removed: int
+    unchanged: int
+
+
+def sync(
+    index: LocalIndex,
+    pages: Iterable[Sequence[PageSummary]],
+    paragraphs: Callable[[str], Sequence[str]] | None = None,
+) -> SyncResult:
+    """
+    sync brings @index up to date with the summaries of @pages, which list every
+    document of the collection. A document is unchanged if its version, the
+    server's change token (see PageSummary), is that held by the index; documents
+    without a version are always treated as changed. New and changed documents are
+    added, with their paragraph text from @paragraphs, called with a uri, or, if
+    None, without text, as any text held may be stale; documents no longer listed
+    are removed. Unchanged documents are not fetched again. The index is flushed.
+    """
+    seen: set[str] = set()
+    added = replaced = unchanged = 0
+    for page in pages:
+        for summary in page:
+            seen.add(summary.uri)
+            held = summary.uri in index
+            version = summary.version
+            if held and version is not None and index.version(summary.uri) == version:
+                unchanged += 1
+                continue
+            text = paragraphs(summary.uri) if paragraphs is not None else ()
+            index.add(summary, text, version)
+            if not held:
+                added += 1
+            else:
+                replaced += 1
+    removed = 0
+    for uri in index.uris():
+        if uri not in seen:
+            removed += index.remove(uri)
+    index.flush()
+    return SyncResult(added, replaced, removed, unchanged)
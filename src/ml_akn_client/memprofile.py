@@ -0,0 +1,391 @@
+"""
+memprofile.py
+
+Memory budgets for the response deserialization path: decode_multipart,
+summaries_deserialize and search_summaries_deserialize.
+
+This is a development harness behind the "ml-akn-client memory" command and the
+tests; the client never imports it, and tracemalloc is only imported once a
+measurement is made.
+
+Each function is run with tracemalloc over synthetic responses of PAYLOAD_SIZES
+summaries, recording
+  * peak: the most memory allocated at once during the call
+  * retained: the memory still allocated on return, while the result is held
+  * leaked: the memory still allocated once the result has been released
+and the source lines which allocated the retained memory ("hot spots"). Each
+function is called once before it is measured so that one-off costs, such as
+imports and pydantic's validator caches, are excluded.
+
+Two budgets are enforced. PAYLOAD_BUDGETS configures the peak and retained bytes
+each function may use per byte of payload, plus FIXED_ALLOWANCE, the ratios shown
+by format_report. A change which uses more memory for each response, such as
+holding two parsed copies, fails the tests. The limits are set about a third
+above the memory measured with Python 3.11, pydantic 2.14 and pydantic-xml 2.21,
+so upgrades which change it substantially need them revisited.
+
+In addition, each function is measured over a baseline payload of BASELINE_SIZE
+summaries in the same process, and its peak and retained memory at each payload
+size may be at most GROWTH_ALLOWANCE times the baseline memory per summary, scaled
+by the number of summaries, plus FIXED_ALLOWANCE. A change making memory grow
+faster than the payload, such as a quadratic buffer, fails this check whatever the
+library versions. Leaks beyond LEAK_BUDGET fail both.
+
+Example:
+    profiles = profile()
+    print(format_report(profiles))
+    check_budgets(profiles)  # raises MemoryBudgetException
+"""
+
+import gc
+from typing import TYPE_CHECKING, Callable, NamedTuple
+
+from ml_akn_client.models import search, summaries
+from ml_akn_client.server.marklogic import MarkLogicHTTPClient
+
+if TYPE_CHECKING:
+    import tracemalloc
+
+# the numbers of summaries in the synthetic responses
+PAYLOAD_SIZES: tuple[int, ...] = (10, 100, 1000)
+
+# the number of summaries in the baseline payload from which budgets are derived
+BASELINE_SIZE: int = 100
+
+# the multiple of the baseline memory per summary allowed at each payload size
+GROWTH_ALLOWANCE: float = 1.5
+
+# memory allowed beyond the scaled baseline, for fixed costs of small payloads
+FIXED_ALLOWANCE: int = 65_536
+
+# the number of matches in the snippet of each synthetic search summary
+SEARCH_SNIPPETS: int = 3
+
+MULTIPART_BOUNDARY: str = "ml-akn-memprofile"
+MULTIPART_CONTENT_TYPE: str = f"multipart/mixed; boundary={MULTIPART_BOUNDARY}"
+
+
+class MemoryBudgetException(Exception):
+    """
+    MemoryBudgetException reports memory budgets which have been exceeded.
+    """
+
+    pass
+
+
+class Budget(NamedTuple):
+    """
+    Budget allows fixed bytes plus per_summary bytes for each summary of payload.
+    """
+
+    fixed: int
+    per_summary: float
+
+    def allowance(self, summaries: int) -> int:
+        return self.fixed + int(self.per_summary * summaries)
+
+
+class MemoryBudget(NamedTuple):
+    """
+    MemoryBudget is the peak and retained memory budget of a function.
+    """
+
+    peak: Budget
+    retained: Budget
+
+
+class PayloadBudget(NamedTuple):
+    """
+    PayloadBudget is the peak and retained memory allowed per byte of payload.
+    """
+
+    peak: float
+    retained: float
+
+
+# the memory each function may use per byte of payload, beyond FIXED_ALLOWANCE
+PAYLOAD_BUDGETS: dict[str, PayloadBudget] = {
+    "decode_multipart": PayloadBudget(peak=4.0, retained=1.3),
+    "summaries_deserialize": PayloadBudget(peak=28.0, retained=8.5),
+    "search_summaries_deserialize": PayloadBudget(peak=14.0, retained=5.0),
+}
+
+# memory which may remain allocated after a result is released
+LEAK_BUDGET: int = 16_384
+
+
+class HotSpot(NamedTuple):
+    """
+    HotSpot is the memory retained by the allocations of a source line.
+    """
+
+    location: str
+    size: int
+    blocks: int
+
+
+class MemoryProfile(NamedTuple):
+    """
+    MemoryProfile is the memory used by a call of function over payload_bytes of
+    input holding a number of summaries, and the budgets derived from its baseline
+    and configured per payload byte it is checked against, if any.
+    """
+
+    function: str
+    summaries: int
+    payload_bytes: int
+    peak: int
+    retained: int
+    leaked: int
+    hot_spots: list[HotSpot]
+    budget: MemoryBudget | None = None
+    payload_budget: PayloadBudget | None = None
+
+    def violations(
+        self,
+        budget: MemoryBudget | None = None,
+        payload_budget: PayloadBudget | None = None,
+    ) -> list[str]:
+        """
+        violations returns a description of each budget exceeded, checking against
+        @budget and @payload_budget or, if None, the profile's own budgets. Only
+        leaks are checked if there are none.
+        """
+        budget = budget or self.budget
+        payload_budget = payload_budget or self.payload_budget
+        checks = []
+        if payload_budget is not None:
+            size = self.payload_bytes
+            checks += [
+                ("peak", self.peak, FIXED_ALLOWANCE + int(payload_budget.peak * size)),
+                (
+                    "retained",
+                    self.retained,
+                    FIXED_ALLOWANCE + int(payload_budget.retained * size),
+                ),
+            ]
+        if budget is not None:
+            checks += [
+                ("peak growth", self.peak, budget.peak.allowance(self.summaries)),
+                (
+                    "retained growth",
+                    self.retained,
+                    budget.retained.allowance(self.summaries),
+                ),
+            ]
+        checks.append(("leaked", self.leaked, LEAK_BUDGET))
+        out = []
+        for name, used, allowed in checks:
+            if used > allowed:
+                out.append(
+                    f"{self.function} ({self.summaries} summaries): {name} {used} "
+                    f"bytes exceeds budget of {allowed} bytes"
+                )
+        return out
+
+
+def summaries_payload(size: int, snippets: int = 0) -> bytes:
+    """
+    summaries_payload returns a synthetic summaries response of @size summaries,
+    each with a search snippet of @snippets matches.
+    """
+    match = (
+        "judgment of the &lt;span class=&quot;highlight&quot;&gt;Norwich&lt;/span&gt; "
+        "Union Life Insurance Society v Shopmoor Ltd "
+    )
+    parts = []
+    for i in range(size):
+        parts.append(
+            f"<summary><uri>/documents/doc_{i:06d}.xml</uri>"
+            f"<name>Claimant {i} &amp; Ors v Defendant {i}</name>"
+            f"<judgmentDate>20{i % 25:02d}-0{i % 9 + 1}-1{i % 9}</judgmentDate>"
+            f"<court>EWCA-Civil</court><citation>[2020] EWCA Civ {i}</citation>"
+        )
+        if snippets:
+            parts.append(f"<snippets><snippet>{match * snippets}</snippet></snippets>")
+        parts.append("</summary>")
+    return f'<summaries etag="1">{"".join(parts)}</summaries>'.encode()
+
+
+def multipart_payload(xml: bytes) -> bytes:
+    """
+    multipart_payload wraps @xml in a single part MarkLogic multipart response.
+    """
+    return (
+        f"--{MULTIPART_BOUNDARY}\r\nContent-Type: application/xml\r\n\r\n".encode()
+        + xml
+        + f"\r\n--{MULTIPART_BOUNDARY}--\r\n".encode()
+    )
+
+
+def _hot_spots(
+    before: "tracemalloc.Snapshot", after: "tracemalloc.Snapshot", limit: int
+) -> list[HotSpot]:
+    """
+    _hot_spots returns the @limit source lines retaining the most memory allocated
+    between the @before and @after snapshots.
+    """
+    import tracemalloc
+
+    ignore = [tracemalloc.Filter(False, tracemalloc.__file__)]
+    stats = after.filter_traces(ignore).compare_to(
+        before.filter_traces(ignore), "lineno"
+    )
+    out = []
+    for stat in stats:
+        if stat.size_diff <= 0:
+            continue
+        frame = stat.traceback[0]
+        out.append(
+            HotSpot(f"{frame.filename}:{frame.lineno}", stat.size_diff, stat.count_diff)
+        )
+    return out[:limit]
+
+
+def measure(
+    function: str,
+    call: Callable[[bytes], object],
+    payload: bytes,
+    summaries: int = 0,
+    hot_spots: int = 10,
+) -> MemoryProfile:
+    """
+    measure measures the memory used by @call on @payload, labelled with @function
+    and the number of @summaries in the payload, reporting the top @hot_spots source
+    lines. Tracing is started if it is not already running.
+    """
+    import tracemalloc
+
+    call(payload)  # exclude one-off costs
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    try:
+        gc.collect()
+        before = tracemalloc.take_snapshot()
+        baseline = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        result = call(payload)
+        current, peak = tracemalloc.get_traced_memory()
+        spots = _hot_spots(before, tracemalloc.take_snapshot(), hot_spots)
+        del result
+        gc.collect()
+        leaked = tracemalloc.get_traced_memory()[0] - baseline
+    finally:
+        if started:
+            tracemalloc.stop()
+    return MemoryProfile(
+        function,
+        summaries,
+        len(payload),
+        peak - baseline,
+        current - baseline,
+        max(0, leaked),
+        spots,
+    )
+
+
+def deserialization_calls() -> dict[
+    str, tuple[Callable[[bytes], object], Callable[[int], bytes]]
+]:
+    """
+    deserialization_calls returns the functions measured, keyed by name, each with
+    a function returning its synthetic payload of a number of summaries.
+    """
+    http_client = MarkLogicHTTPClient(username="memprofile", password="synthetic")
+    return {
+        "decode_multipart": (
+            lambda data: http_client.decode_multipart(data, MULTIPART_CONTENT_TYPE),
+            lambda size: multipart_payload(summaries_payload(size, SEARCH_SNIPPETS)),
+        ),
+        "summaries_deserialize": (
+            summaries.summaries_deserialize,
+            summaries_payload,
+        ),
+        "search_summaries_deserialize": (
+            search.search_summaries_deserialize,
+            lambda size: summaries_payload(size, SEARCH_SNIPPETS),
+        ),
+    }
+
+
+def budget_from(baseline: MemoryProfile) -> MemoryBudget:
+    """
+    budget_from returns the budget derived from a @baseline profile: its peak and
+    retained memory per summary, times GROWTH_ALLOWANCE, plus FIXED_ALLOWANCE.
+    """
+    if baseline.summaries < 1:
+        raise ValueError("a baseline needs at least one summary")
+    return MemoryBudget(
+        peak=Budget(
+            FIXED_ALLOWANCE, GROWTH_ALLOWANCE * baseline.peak / baseline.summaries
+        ),
+        retained=Budget(
+            FIXED_ALLOWANCE, GROWTH_ALLOWANCE * baseline.retained / baseline.summaries
+        ),
+    )
+
+
+def profile(
+    sizes: tuple[int, ...] = PAYLOAD_SIZES,
+    functions: tuple[str, ...] | None = None,
+    hot_spots: int = 10,
+) -> list[MemoryProfile]:
+    """
+    profile measures each of @functions (all if None) over payloads of each of
+    @sizes summaries, with its budget in PAYLOAD_BUDGETS and the budget derived
+    from a measurement over a payload of BASELINE_SIZE summaries.
+    """
+    calls = deserialization_calls()
+    out = []
+    for name in functions or tuple(calls):
+        if name not in calls:
+            raise ValueError(f"unknown function {name!r}")
+        call, payload = calls[name]
+        baseline = measure(name, call, payload(BASELINE_SIZE), BASELINE_SIZE, 0)
+        budget = budget_from(baseline)
+        for size in sizes:
+            measured = measure(name, call, payload(size), size, hot_spots)
+            out.append(
+                measured._replace(budget=budget, payload_budget=PAYLOAD_BUDGETS[name])
+            )
+    return out
+
+
+def check_budgets(profiles: list[MemoryProfile]) -> None:
+    """
+    check_budgets raises MemoryBudgetException listing every budget exceeded by
+    @profiles.
+    """
+    violations = [v for p in profiles for v in p.violations()]
+    if violations:
+        raise MemoryBudgetException("; ".join(violations))
+
+
+def format_report(profiles: list[MemoryProfile], hot_spots: bool = True) -> str:
+    """
+    format_report returns a human readable report of @profiles, with their hot spots
+    if @hot_spots is set.
+    """
+    lines = [
+        f"{'function':<30}{'summaries':>10}{'payload':>12}{'peak':>12}"
+        f"{'x':>6}{'retained':>12}{'x':>6}{'leaked':>10}  budget"
+    ]
+    for p in profiles:
+        size = max(1, p.payload_bytes)
+        status = "ok" if not p.violations() else "EXCEEDED"
+        lines.append(
+            f"{p.function:<30}{p.summaries:>10}{p.payload_bytes:>12}{p.peak:>12}"
+            f"{p.peak / size:>6.1f}{p.retained:>12}{p.retained / size:>6.1f}"
+            f"{p.leaked:>10}  {status}"
+        )
+    if hot_spots:
+        for p in profiles:
+            if not p.hot_spots:
+                continue
+            lines.append(f"\n{p.function} ({p.summaries} summaries) retained by:")
+            for spot in p.hot_spots:
+                lines.append(
+                    f"  {spot.size:>10} bytes {spot.blocks:>7} blocks  {spot.location}"
+                )
+    return "\n".join(lines)
@@ -50,9 +50,28 @@ Example Usage:
 # Started by: rorycl
 # Date      : 13 July 2025
 
+import math
+import threading
+import time
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Iterator, NamedTuple, Sequence
+
+from ml_akn_client.cache import CACHE_TTL, TTLCache
+from ml_akn_client.models import count as counts
+from ml_akn_client.models import not_modified
 from ml_akn_client.models import summaries
 from ml_akn_client.models import search
+from ml_akn_client.models import suggest
 from ml_akn_client.server import marklogic as ml
+from ml_akn_client.server.hosts import HOST_POOL_MAXSIZE
+
+# the export, fan out and local index modules are only imported when used
+if TYPE_CHECKING:
+    from ml_akn_client import export as ex
+    from ml_akn_client import localindex as li
 
 
 class ClientException(Exception):
@@ -78,6 +97,20 @@ class ClientException(Exception):
     pass
 
 
+class WarmUpResult(NamedTuple):
+    """
+    WarmUpResult reports a CaseLawClient warm up: the connections opened, the
+    slowest invocation time in seconds of each module warmed up, the number of
+    results preloaded into the client cache and any errors.
+    """
+
+    connections: int
+    modules: dict[str, float]
+    preloaded: int
+    errors: list[str]
+    seconds: float
+
+
 class CaseLawClient:
     """
     A client for retrieving case law data from a MarkLogic server.
@@ -88,7 +121,15 @@ class CaseLawClient:
     following a dependency injection pattern.
     """
 
-    def __init__(self, http_client: ml.MarkLogicHTTPClient):
+    def __init__(
+        self,
+        http_client: ml.MarkLogicHTTPClient,
+        suggest_cache_ttl: float = CACHE_TTL,
+        results_cache_ttl: float = 0,
+        conditional_requests: bool = True,
+        local_index: "li.LocalIndex | None" = None,
+        local_search: "li.local_search_modes" = "fallback",
+    ):
         """
         Initialize the CaseLawClient.
 
@@ -96,13 +137,51 @@ class CaseLawClient:
             http_client: An initialized and configured MarkLogicHTTPClient
                          instance responsible for handling HTTP communication
                          and authentication with the MarkLogic server.
+            suggest_cache_ttl: Seconds for which suggestions are cached on the
+                               client. 0 disables the cache.
+            results_cache_ttl: Seconds for which summaries and search results
+                               are cached on the client, which also allows them
+                               to be preloaded by `warm_up`. Cached results are
+                               shared between callers and must not be modified.
+                               Defaults to 0, which disables the cache.
+            conditional_requests: Keep the most recent summaries and search
+                                  results with their etags, and send the etag
+                                  with each repeated request so that the server
+                                  can answer "not modified" if the database has
+                                  not changed, in which case the kept result is
+                                  returned. Defaults to True.
+            local_index: A `localindex.LocalIndex`, kept up to date with
+                         `sync_index`, from which searches of its collection
+                         can be answered. Defaults to None.
+            local_search: "fallback" to search the local index only when the
+                          server cannot be reached or fails, or "always" to
+                          search it instead of the server, for example on a
+                          read replica. Defaults to "fallback".
         """
         self.ml_client = http_client
+        self.suggest_cache: TTLCache[suggest.Suggestions] = TTLCache(
+            ttl=suggest_cache_ttl
+        )
+        self.results_cache: TTLCache[summaries.Summaries | search.SearchSummaries] = (
+            TTLCache(ttl=results_cache_ttl)
+        )
+        # results kept with their etags for conditional requests, until evicted
+        self.validated: TTLCache[
+            tuple[str, summaries.Summaries | search.SearchSummaries]
+        ] = TTLCache(ttl=math.inf if conditional_requests else 0)
+        # set once a warm up has finished
+        self.ready = threading.Event()
+        self.warm_up_result: WarmUpResult | None = None
+        self.local_index = local_index
+        self.local_search = local_search
 
     def get_summaries(
         self,
         sort_by: ml.MarkLogicHTTPClient.summaries_sort_by = "name",
         sort_direction: ml.MarkLogicHTTPClient.summaries_order_by = "desc",
+        fields: tuple[ml.MarkLogicHTTPClient.summary_fields, ...] | None = None,
+        collection: str = ml.ML_COLLECTION,
+        limit: int = 0,
     ) -> summaries.Summaries:
         """
         Retrieve a list of document summaries from the database.
@@ -119,6 +198,16 @@ class CaseLawClient:
             sort_direction: The direction of the sort.
                             Must be either "desc" or "asc".
                             Defaults to "desc".
+            fields: The summary fields to return, for example ("name",). The uri
+                    is always returned and unselected fields are None.
+                    Defaults to None, for all fields.
+            collection: The collection to query. Defaults to "examples".
+            limit: Return only the first summaries, once sorted. Defaults to 0,
+                   for all summaries.
+
+        A repeated request sends the etag of the previous result, so that an
+        unchanged result is neither downloaded nor parsed again (see
+        `conditional_requests`).
 
         Returns:
             A `summaries.Summaries` object containing a list of `Summary`
@@ -129,24 +218,197 @@ class CaseLawClient:
                              times out, or if the returned XML data cannot be
                              deserialized into the expected format.
         """
+        key = ("summaries", collection, limit, sort_by, sort_direction, fields)
+        cached = self.results_cache.get(key)
+        if isinstance(cached, summaries.Summaries):
+            return cached
+
+        held = self.validated.get(key)
         try:
-            part = self.ml_client.summaries(sort_by, sort_direction)
+            part = self.ml_client.summaries(
+                sort_by,
+                sort_direction,
+                fields,
+                if_none_match=held[0] if held else "",
+                collection=collection,
+                limit=limit,
+            )
         except ml.LocalMLException as err:
             raise ClientException(
                 f"Failed to retrieve summaries from server: {err}"
             ) from err
 
         try:
-            s = summaries.summaries_deserialize(part)
-        except summaries.SummariesException as err:
+            if held and not_modified.not_modified_deserialize(part):
+                s = held[1]
+            else:
+                s = summaries.summaries_deserialize(part)
+        except (
+            summaries.SummariesException,
+            not_modified.NotModifiedException,
+        ) as err:
             raise ClientException(f"Failed to deserialize summary data: {err}") from err
+        if not isinstance(s, summaries.Summaries):
+            raise ClientException("conditional summaries request mismatch")
+        if s.etag:
+            self.validated.put(key, (s.etag, s))
+        self.results_cache.put(key, s)
         return s
 
+    def _fan_out_fields(
+        self,
+        sort_by: str,
+        fields: tuple[ml.MarkLogicHTTPClient.summary_fields, ...] | None,
+    ) -> tuple[tuple[ml.MarkLogicHTTPClient.summary_fields, ...] | None, str | None]:
+        """
+        _fan_out_fields returns the projection to request from each source, which
+        must include the sort field for the results to be merged, and the field
+        added for merging which is to be removed afterwards, if any.
+        """
+        from ml_akn_client import fanout
+
+        sort_field = fanout.SORT_FIELDS.get(sort_by, "judgment_date")
+        if fields is None or sort_field in fields:
+            return fields, None
+        return fields + (sort_field,), sort_field
+
+    def fan_out_summaries(
+        self,
+        collections: Sequence[str],
+        sort_by: ml.MarkLogicHTTPClient.summaries_sort_by = "name",
+        sort_direction: ml.MarkLogicHTTPClient.summaries_order_by = "desc",
+        limit: int = 100,
+        fields: tuple[ml.MarkLogicHTTPClient.summary_fields, ...] | None = None,
+        clients: Sequence["CaseLawClient"] = (),
+    ) -> summaries.Summaries:
+        """
+        Retrieve the first document summaries from several collections, merged.
+
+        fan_out_summaries calls `get_summaries` for each collection concurrently,
+        each returning at most @limit summaries already sorted by the server, and
+        merges them with a k-way heap merge into one sorted listing of at most
+        @limit summaries. A document in more than one collection is listed once.
+        See the `fanout` module.
+
+        Args:
+            collections: The collections to query, for example per-court or
+                         per-year partitions.
+            sort_by: The field to sort the summaries by, as for `get_summaries`.
+            sort_direction: The direction of the sort, as for `get_summaries`.
+            limit: The number of merged summaries to return. Defaults to 100.
+            fields: The summary fields to return, as for `get_summaries`.
+            clients: Further clients, for example for other clusters, whose
+                     collections of the same names are also queried.
+
+        Returns:
+            A `summaries.Summaries` object containing the merged `Summary` objects.
+
+        Raises:
+            ClientException: If any source fails, as for `get_summaries`.
+        """
+        from ml_akn_client import fanout
+
+        if not collections or limit < 1:
+            raise ClientException("fan out needs collections and a limit above 0")
+        request_fields, added = self._fan_out_fields(sort_by, fields)
+        results = fanout.fan_out(
+            [
+                partial(
+                    client.get_summaries,
+                    sort_by,
+                    sort_direction,
+                    request_fields,
+                    collection=collection,
+                    limit=limit,
+                )
+                for client in (self, *clients)
+                for collection in collections
+            ]
+        )
+        merged = fanout.merge_sorted(
+            (r.summaries for r in results), sort_by, sort_direction, limit
+        )
+        if added:
+            merged = [s.model_copy(update={added: None}) for s in merged]
+        return summaries.Summaries(summaries=merged)
+
+    def fan_out_search(
+        self,
+        query: str,
+        collections: Sequence[str],
+        sort_by: ml.MarkLogicHTTPClient.summaries_sort_by = "name",
+        sort_direction: ml.MarkLogicHTTPClient.summaries_order_by = "desc",
+        limit: int = 100,
+        fields: tuple[ml.MarkLogicHTTPClient.summary_fields, ...] | None = None,
+        snippets: bool = True,
+        clients: Sequence["CaseLawClient"] = (),
+    ) -> search.SearchSummaries:
+        """
+        Search several collections for a term, merging the first results.
+
+        fan_out_search calls `search` for each collection concurrently and merges
+        the sorted results as for `fan_out_summaries`. The merged result is
+        reported as cached only if every source was a server cache hit.
+
+        Args:
+            query: The search term to use.
+            collections: The collections to search.
+            sort_by: The field to sort the summaries by, as for `search`.
+            sort_direction: The direction of the sort, as for `search`.
+            limit: The number of merged summaries to return. Defaults to 100.
+            fields: The summary fields to return, as for `search`.
+            snippets: Whether to generate snippets. Defaults to True.
+            clients: Further clients whose collections are also searched.
+
+        Returns:
+            A `search.SearchSummaries` object containing the merged results.
+
+        Raises:
+            ClientException: If any source fails, as for `search`.
+        """
+        from ml_akn_client import fanout
+
+        if not collections or limit < 1:
+            raise ClientException("fan out needs collections and a limit above 0")
+        request_fields, added = self._fan_out_fields(sort_by, fields)
+        results = fanout.fan_out(
+            [
+                partial(
+                    client.search,
+                    query,
+                    sort_by,
+                    sort_direction,
+                    fields=request_fields,
+                    snippets=snippets,
+                    collection=collection,
+                    limit=limit,
+                )
+                for client in (self, *clients)
+                for collection in collections
+            ]
+        )
+        merged = fanout.merge_sorted(
+            (r.summaries for r in results), sort_by, sort_direction, limit
+        )
+        if added:
+            merged = [s.model_copy(update={added: None}) for s in merged]
+        return search.SearchSummaries(
+            cached=all(r.cached for r in results), summaries=merged
+        )
+
     def search(
         self,
         query: str,
         sort_by: ml.MarkLogicHTTPClient.summaries_sort_by = "name",
         sort_direction: ml.MarkLogicHTTPClient.summaries_order_by = "desc",
+        use_cache: bool = True,
+        fields: tuple[ml.MarkLogicHTTPClient.summary_fields, ...] | None = None,
+        snippets: bool = True,
+        per_match_tokens: int = ml.SEARCH_PER_MATCH_TOKENS,
+        max_matches: int = ml.SEARCH_MAX_MATCHES,
+        max_snippet_chars: int = ml.SEARCH_MAX_SNIPPET_CHARS,
+        collection: str = ml.ML_COLLECTION,
+        limit: int = 0,
     ) -> search.SearchSummaries:
         """
         Search for documents containing a term, returning document summaries and snippets.
@@ -165,11 +427,34 @@ class CaseLawClient:
             sort_direction: The direction of the sort.
                             Must be either "desc" or "asc".
                             Defaults to "desc".
+            use_cache: Whether the server, and the client results cache if
+                       enabled, may answer from cache. Defaults to True.
+            fields: The summary fields to return, as for `get_summaries`.
+                    Defaults to None, for all fields.
+            snippets: Whether to generate snippets. When False the server skips
+                      snippet generation entirely. Defaults to True.
+            per_match_tokens: The maximum number of tokens around each match in
+                              a snippet. Defaults to 30.
+            max_matches: The maximum number of matches in a snippet.
+                         Defaults to 3.
+            max_snippet_chars: The maximum number of characters in a snippet.
+                               Defaults to 200.
+            collection: The collection to query. Defaults to "examples".
+            limit: Return only the first summaries, once sorted. Defaults to 0,
+                   for all summaries.
+
+        As for `get_summaries`, repeated requests are conditional on the etag of
+        the previous result.
+
+        With a `local_index` of the collection, the search is answered from the
+        index if `local_search` is "always", or if the server request fails other
+        than through misconfiguration. Local results are not cached.
 
         Returns:
             A `summaries.SearchSummaries` object containing a list of `Summary` objects
             decorated with search result snippets as returned from the MarkLogic
-            `search:search` function.
+            `search:search` function. Its `cached` attribute reports whether the
+            result was a server cache hit.
 
         Raises:
             ClientException: If the server request fails, the connection
@@ -177,20 +462,427 @@ class CaseLawClient:
                              deserialized into the expected format.
 
         """
+
+        def search_locally() -> search.SearchSummaries:
+            from ml_akn_client import localindex as li
+
+            assert self.local_index is not None
+            try:
+                return self.local_index.search(
+                    query,
+                    sort_by,
+                    sort_direction,
+                    fields=fields,
+                    snippets=snippets,
+                    per_match_tokens=per_match_tokens,
+                    max_matches=max_matches,
+                    max_snippet_chars=max_snippet_chars,
+                    limit=limit,
+                )
+            except li.LocalIndexException as err:
+                raise ClientException(f"Failed to search local index: {err}") from err
+
+        local = (
+            self.local_index is not None and self.local_index.collection == collection
+        )
+        if local and self.local_search == "always":
+            return search_locally()
+
+        key = (
+            "search",
+            collection,
+            limit,
+            query,
+            sort_by,
+            sort_direction,
+            fields,
+            snippets,
+            per_match_tokens,
+            max_matches,
+            max_snippet_chars,
+        )
+        if use_cache:
+            cached = self.results_cache.get(key)
+            if isinstance(cached, search.SearchSummaries):
+                return cached
+
+        held = self.validated.get(key)
         try:
-            part = self.ml_client.search(query, sort_by, sort_direction)
-        except ml.LocalMLException as err:
+            part = self.ml_client.search(
+                query,
+                sort_by,
+                sort_direction,
+                use_cache,
+                fields=fields,
+                snippets=snippets,
+                per_match_tokens=per_match_tokens,
+                max_matches=max_matches,
+                max_snippet_chars=max_snippet_chars,
+                if_none_match=held[0] if held else "",
+                collection=collection,
+                limit=limit,
+            )
+        except ml.LocalMLException as err:  # includes MisconfigurationException
+            if local and not isinstance(err, ml.MisconfigurationException):
+                return search_locally()
             raise ClientException(
                 f"Failed to retrieve search results from server: {err}"
             ) from err
 
         try:
-            s = search.search_summaries_deserialize(part)
-        except summaries.SummariesException as err:  # generic class error
+            if held and not_modified.not_modified_deserialize(part):
+                s = held[1]
+            else:
+                s = search.search_summaries_deserialize(part)
+        except (
+            summaries.SummariesException,  # generic class error
+            not_modified.NotModifiedException,
+        ) as err:
             raise ClientException(f"Failed to deserialize search data: {err}") from err
-        print(s)
+        if not isinstance(s, search.SearchSummaries):
+            raise ClientException("conditional search request mismatch")
+        if s.etag:
+            self.validated.put(key, (s.etag, s))
+        if use_cache:
+            self.results_cache.put(key, s)
+        return s
+
+    def count(
+        self,
+        query: str | None = None,
+        court: str | None = None,
+        exact: bool = False,
+        collection: str = ml.ML_COLLECTION,
+    ) -> counts.Count:
+        """
+        Count the documents matching a search term and/or court.
+
+        count calls the `count.xqy` module on the MarkLogic server. By default the
+        count is an estimate resolved from the server indexes, without reading or
+        summarising any documents, which is suitable for badges and pagination.
+
+        Args:
+            query: An optional search term, interpreted as for `search`.
+            court: An optional court, for example "EWCA-Civil".
+            exact: Return an exact count using a filtered search, which reads the
+                   matching documents and is slower. Defaults to False.
+            collection: The collection to query. Defaults to "examples".
+
+        Returns:
+            A `count.Count` object holding the count and whether it is exact.
+
+        Raises:
+            ClientException: If the server request fails, the connection
+                             times out, or if the returned XML data cannot be
+                             deserialized into the expected format.
+        """
+        try:
+            part = self.ml_client.count(query or "", court or "", exact, collection)
+        except ml.LocalMLException as err:
+            raise ClientException(
+                f"Failed to retrieve count from server: {err}"
+            ) from err
+
+        try:
+            c = counts.count_deserialize(part)
+        except counts.CountException as err:
+            raise ClientException(f"Failed to deserialize count data: {err}") from err
+        return c
+
+    def suggest(
+        self,
+        prefix: str,
+        limit: int = 10,
+        fields: tuple[ml.MarkLogicHTTPClient.suggest_fields, ...] = (
+            "name",
+            "court",
+            "citation",
+        ),
+        collection: str = ml.ML_COLLECTION,
+    ) -> suggest.Suggestions:
+        """
+        Suggest case names, courts and citations starting with a prefix.
+
+        suggest calls the `suggest.xqy` module on the MarkLogic server, which answers
+        from range index lexicons alone, making it cheap enough to call on each
+        keystroke. Matching is case and diacritic insensitive.
+
+        Results are kept in a short-lived client-side cache. When the results for a
+        shorter prefix are cached and were complete (fewer than @limit were
+        returned), results for a longer prefix are filtered from them locally without
+        a server request.
+
+        Args:
+            prefix: The text typed so far.
+            limit: The maximum number of suggestions. Defaults to 10.
+            fields: The fields to suggest from, in order of preference.
+                    Defaults to ("name", "court", "citation").
+            collection: The collection to query. Defaults to "examples".
+
+        Returns:
+            A `suggest.Suggestions` object containing a list of `Suggestion` objects.
+
+        Raises:
+            ClientException: If the server request fails, the connection
+                             times out, or if the returned XML data cannot be
+                             deserialized into the expected format.
+        """
+        # the server drops wildcard characters from the prefix
+        key = _fold(prefix.replace("*", "").replace("?", ""))
+        cached = self.suggest_cache.get((collection, fields, limit, key))
+        if cached is not None:
+            return cached
+        for i in range(len(key) - 1, -1, -1):
+            shorter = self.suggest_cache.get((collection, fields, limit, key[:i]))
+            if shorter is not None and len(shorter.suggestions) < limit:
+                s = suggest.Suggestions(
+                    suggestions=[
+                        x for x in shorter.suggestions if _fold(x.value).startswith(key)
+                    ]
+                )
+                self.suggest_cache.put((collection, fields, limit, key), s)
+                return s
+
+        try:
+            part = self.ml_client.suggest(prefix, limit, fields, collection)
+        except ml.LocalMLException as err:
+            raise ClientException(
+                f"Failed to retrieve suggestions from server: {err}"
+            ) from err
+
+        try:
+            s = suggest.suggestions_deserialize(part)
+        except suggest.SuggestionsException as err:
+            raise ClientException(
+                f"Failed to deserialize suggestion data: {err}"
+            ) from err
+        self.suggest_cache.put((collection, fields, limit, key), s)
         return s
 
+    def _export_page(
+        self, after: str, page_size: int, collection: str
+    ) -> summaries.SummariesPage:
+        """
+        _export_page returns the page of @page_size summaries of @collection
+        following the uri @after.
+        """
+        try:
+            part = self.ml_client.export(after, page_size, collection)
+        except ml.LocalMLException as err:
+            raise ClientException(
+                f"Failed to retrieve export page from server: {err}"
+            ) from err
+        try:
+            return summaries.summaries_page_deserialize(part)
+        except summaries.SummariesException as err:
+            raise ClientException(f"Failed to deserialize export data: {err}") from err
+
+    def export(
+        self,
+        path: str | Path,
+        format: "ex.export_formats" = "ndjson",
+        page_size: int | None = None,
+        resume: bool = False,
+        progress: Callable[[int, float], None] | None = None,
+        collection: str = ml.ML_COLLECTION,
+    ) -> "ex.ExportResult":
+        """
+        Export the summaries of every document in the collection to a file.
+
+        export pages through the 'export.xqy' module on the MarkLogic server in uri
+        order, writing each page to @path as it arrives, so that memory use is bounded
+        by the page size. See the `export` module for details of the output formats
+        and of resuming.
+
+        Args:
+            path: The file to write, or for "parquet" the directory of part files.
+            format: One of "ndjson", "csv" or "parquet". Defaults to "ndjson".
+            page_size: The number of summaries to fetch per request. Defaults
+                       to None, for `export.EXPORT_PAGE_SIZE`.
+            resume: Continue an interrupted export from its last checkpoint.
+                    Defaults to False.
+            progress: An optional callable receiving the rows written and seconds
+                      elapsed after each page.
+            collection: The collection to query. Defaults to "examples".
+
+        Returns:
+            An `export.ExportResult` reporting the rows written and the rate.
+
+        Raises:
+            ClientException: If the server request fails, the returned XML data
+                             cannot be deserialized, or the output cannot be
+                             written.
+        """
+        from ml_akn_client import export as ex
+
+        if page_size is None:
+            page_size = ex.EXPORT_PAGE_SIZE
+        fetch = partial(self._export_page, page_size=page_size, collection=collection)
+        try:
+            return ex.export_summaries(fetch, path, format, resume, progress)
+        except ex.ExportException as err:
+            raise ClientException(f"Failed to export summaries: {err}") from err
+
+    def sync_index(
+        self,
+        index: "li.LocalIndex | None" = None,
+        paragraphs: Callable[[str], Sequence[str]] | None = None,
+        page_size: int | None = None,
+    ) -> "li.SyncResult":
+        """
+        Bring a local search index up to date with its collection on the server.
+
+        sync_index pages through the 'export.xqy' module as `export` does, adding
+        new and changed documents to the index and removing those which have gone,
+        then flushes the index.
+
+        Args:
+            index: The `localindex.LocalIndex` to sync. Defaults to None, for the
+                   client's `local_index`.
+            paragraphs: An optional callable returning the judgment paragraph
+                        text of a document uri, called for new and changed
+                        documents, as told by the version the server reports
+                        for each. Without it, only the summaries are indexed.
+            page_size: The number of summaries to fetch per request. Defaults
+                       to None, for `export.EXPORT_PAGE_SIZE`.
+
+        Returns:
+            A `localindex.SyncResult` reporting the documents changed.
+
+        Raises:
+            ClientException: If there is no index, the server request fails, the
+                             returned XML data cannot be deserialized, or the
+                             index cannot be written.
+        """
+        from ml_akn_client import export as ex
+        from ml_akn_client import localindex as li
+
+        target = self.local_index if index is None else index
+        if target is None:
+            raise ClientException("no local index to sync")
+        if page_size is None:
+            page_size = ex.EXPORT_PAGE_SIZE
+
+        def pages() -> Iterator[list[summaries.PageSummary]]:
+            after = ""
+            while True:
+                page = self._export_page(after, page_size, target.collection)
+                yield page.summaries
+                if page.next is None:
+                    return
+                after = page.next
+
+        try:
+            return li.sync(target, pages(), paragraphs)
+        except li.LocalIndexException as err:
+            raise ClientException(f"Failed to sync local index: {err}") from err
+
+    def warm_up(
+        self,
+        connections: int = HOST_POOL_MAXSIZE,
+        modules: dict[str, dict[str, str]] | None = None,
+        preload_summaries: Sequence[dict[str, Any]] = (),
+        preload_searches: Sequence[str | dict[str, Any]] = (),
+        background: bool = True,
+    ) -> threading.Event:
+        """
+        Warm up the connections, server modules and client cache.
+
+        warm_up pays the costs otherwise paid by the first requests of a new
+        client: it opens the connection pools, then invokes each module once on
+        every host with cheap arguments so that the server compiles it, and
+        finally preloads results into the client results cache. Digest
+        authentication state is kept per thread by requests, so it is not warmed;
+        each calling thread still answers a digest challenge on its first
+        request. Failures are recorded rather than raised, as a failed warm up
+        leaves the client no worse off than a cold one.
+
+        Args:
+            connections: The number of connections to open to each host.
+                         Defaults to the connection pool size.
+            modules: The modules to invoke, mapped to the vars to invoke them
+                     with. Defaults to `marklogic.ML_WARM_UP_VARS`.
+            preload_summaries: Keyword arguments for `get_summaries` calls whose
+                               results are preloaded, for example
+                               [{"sort_by": "date"}].
+            preload_searches: Queries, or keyword arguments for `search` calls,
+                              whose results are preloaded.
+            background: Run in a background thread. Defaults to True.
+
+        Returns:
+            The `ready` event, which is set when the warm up has finished;
+            `warm_up_result` then reports its outcome.
+
+        Raises:
+            ClientException: If results are to be preloaded but the results
+                             cache is disabled.
+        """
+        if (preload_summaries or preload_searches) and self.results_cache.ttl == 0:
+            raise ClientException("preloading requires a results_cache_ttl")
+        if modules is None:
+            modules = ml.ML_WARM_UP_VARS
+        self.ready.clear()
+
+        def run() -> None:
+            start = time.perf_counter()
+            errors: list[str] = []
+            opened = 0
+            timings: dict[str, float] = {}
+            preloaded = 0
+            try:
+                try:
+                    opened = self.ml_client.open_connections(connections)
+                except ml.LocalMLException as err:
+                    errors.append(f"connections: {err}")
+
+                with ThreadPoolExecutor(max(1, len(modules))) as pool:
+                    futures = {
+                        m: pool.submit(self.ml_client.warm_up_module, m, v)
+                        for m, v in modules.items()
+                    }
+                    for m, future in futures.items():
+                        try:
+                            timings[m] = future.result()
+                        except ml.LocalMLException as err:
+                            errors.append(str(err))
+
+                calls: list[Callable[[], Any]] = [
+                    partial(self.get_summaries, **kw) for kw in preload_summaries
+                ]
+                calls += [
+                    partial(self.search, q)
+                    if isinstance(q, str)
+                    else partial(self.search, **q)
+                    for q in preload_searches
+                ]
+                with ThreadPoolExecutor(max(1, min(len(calls), connections))) as pool:
+                    for future in [pool.submit(call) for call in calls]:
+                        try:
+                            future.result()
+                            preloaded += 1
+                        except (ClientException, TypeError) as err:
+                            errors.append(f"preload: {err}")
+            finally:
+                self.warm_up_result = WarmUpResult(
+                    opened, timings, preloaded, errors, time.perf_counter() - start
+                )
+                self.ready.set()
+
+        if background:
+            threading.Thread(target=run, name="ml-akn-warm-up", daemon=True).start()
+        else:
+            run()
+        return self.ready
+
+
+def _fold(text: str) -> str:
+    """
+    _fold normalises text for case and diacritic insensitive prefix matching, in
+    line with the server's suggest matching.
+    """
+    decomposed = unicodedata.normalize("NFKD", text.casefold())
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
 
 # Code for simple demonstrations and ad-hoc testing.
 if __name__ == "__main__":
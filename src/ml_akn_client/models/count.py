@@ -0,0 +1,46 @@
+"""
+count.py
+
+count unmarshalls a document count as returned by the MarkLogic count.xqy module, an
+integer <count> element with an "exact" attribute which is false when the count is an
+index-resolved estimate.
+"""
+
+from pydantic_xml import BaseXmlModel, attr
+from pydantic_xml.errors import BaseError
+from pydantic import ValidationError
+from xml.etree.ElementTree import ParseError
+
+
+class CountException(Exception):
+    """
+    CountException wraps exceptions caused by serialization or deserialization of
+    Count.
+    """
+
+    pass
+
+
+class Count(BaseXmlModel, tag="count"):
+    """
+    Count is a number of matching documents, either exact or estimated.
+    """
+
+    exact: bool = attr()
+    count: int
+
+
+def count_deserialize(xml: bytes) -> Count:
+    """
+    count_deserialize deserialises an xml string to a Count.
+    """
+    if xml == b"":
+        raise CountException("provided xml bytes are empty")
+    try:
+        return Count.from_xml(xml)
+    except ValidationError as err:  # pydantic core validation error
+        raise CountException(err) from err
+    except ParseError as err:  # xml parsing error
+        raise CountException(err) from err
+    except BaseError as err:  # base package error
+        raise CountException(err) from err
@@ -0,0 +1,51 @@
+"""
+not_modified.py
+
+not_modified recognises the <not-modified etag="..."/> answer to a conditional request,
+returned by summaries.xqy and search.xqy in place of a result when the etag sent by the
+client is still current (see xquery/cache-lib.xqy).
+
+Recognising the answer only inspects the start of the response, so that a full result
+is not parsed twice.
+"""
+
+from pydantic_xml import BaseXmlModel, attr
+from pydantic_xml.errors import BaseError
+from pydantic import ValidationError
+from xml.etree.ElementTree import ParseError
+
+NOT_MODIFIED_TAG: bytes = b"<not-modified"
+
+
+class NotModifiedException(Exception):
+    """
+    NotModifiedException wraps exceptions caused by deserialization of NotModified.
+    """
+
+    pass
+
+
+class NotModified(BaseXmlModel, tag="not-modified"):
+    """
+    NotModified reports that the result held by the client, with this etag, is
+    current.
+    """
+
+    etag: str = attr()
+
+
+def not_modified_deserialize(xml: bytes) -> NotModified | None:
+    """
+    not_modified_deserialize deserialises an xml string to a NotModified, or returns
+    None if it is some other element.
+    """
+    if not xml.lstrip().startswith(NOT_MODIFIED_TAG):
+        return None
+    try:
+        return NotModified.from_xml(xml)
+    except ValidationError as err:  # pydantic core validation error
+        raise NotModifiedException(err) from err
+    except ParseError as err:  # xml parsing error
+        raise NotModifiedException(err) from err
+    except BaseError as err:  # base package error
+        raise NotModifiedException(err) from err
@@ -5,6 +5,10 @@ search extends summaries by adding a <snippets></snippets> element containing a
 one or more <snippet>, an html escaped search result snippet as returned by a MarkLogic
 search:search routine.
 
+The <summaries> element carries a "cached" attribute reporting whether the result was
+served from the server-side search cache, and an "etag" attribute for conditional
+requests.
+
 Please see summaries for documentation about the base classs.
 
 Started by: rorycl
@@ -13,7 +17,7 @@ Date      : 21 July 2025
 
 from typing import List
 
-from pydantic_xml import BaseXmlModel, element
+from pydantic_xml import BaseXmlModel, attr, element
 from pydantic_xml.errors import BaseError
 from pydantic import ValidationError
 from xml.etree.ElementTree import ParseError
@@ -39,22 +43,25 @@ class Snippet(BaseXmlModel, tag="snippet"):
     snippet: str = element()
 
 
-class SearchSummary(Summary, tag="summary"):
+class SearchSummary(Summary, tag="summary", search_mode="unordered"):
     """
     Search Summary extends Summary, adding a "snippet" element with one or more
     "snippets" of contextual information from a search across Akomo Ntosi judicial
-    records.
+    records. snippets is empty if snippets were not requested.
     """
 
-    snippets: List[Snippet] = element(tag="snippets")
+    snippets: List[Snippet] = element(tag="snippets", default_factory=list)
 
 
 class SearchSummaries(BaseXmlModel, tag="summaries"):
     """
-    Summaries is a list of Summary.
+    Summaries is a list of Summary. cached reports if the result was a server cache
+    hit and etag is the validator of the result for conditional requests.
     """
 
-    summaries: List[SearchSummary] = element(tag="summary")
+    cached: bool = attr(default=False)
+    etag: str | None = attr(default=None)
+    summaries: List[SearchSummary] = element(tag="summary", default_factory=list)
 
 
 def search_summaries_deserialize(xml: bytes) -> SearchSummaries:
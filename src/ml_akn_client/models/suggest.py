@@ -0,0 +1,56 @@
+"""
+suggest.py
+
+suggest unmarshalls type-ahead suggestions, a list of <suggestion> elements each
+carrying the field ("name", "court" or "citation") the suggested value was matched
+from, as returned by the MarkLogic suggest.xqy module.
+"""
+
+from typing import List
+
+from pydantic_xml import BaseXmlModel, attr, element
+from pydantic_xml.errors import BaseError
+from pydantic import ValidationError
+from xml.etree.ElementTree import ParseError
+
+
+class SuggestionsException(Exception):
+    """
+    SuggestionsException wraps exceptions caused by serialization or
+    deserialization of Suggestions.
+    """
+
+    pass
+
+
+class Suggestion(BaseXmlModel, tag="suggestion"):
+    """
+    Suggestion is a single suggested value and the field it was matched from.
+    """
+
+    field: str = attr()
+    value: str
+
+
+class Suggestions(BaseXmlModel, tag="suggestions"):
+    """
+    Suggestions is a list of Suggestion.
+    """
+
+    suggestions: List[Suggestion] = element(tag="suggestion", default_factory=list)
+
+
+def suggestions_deserialize(xml: bytes) -> Suggestions:
+    """
+    suggestions_deserialize deserialises an xml string to Suggestions.
+    """
+    if xml == b"":
+        raise SuggestionsException("provided xml bytes are empty")
+    try:
+        return Suggestions.from_xml(xml)
+    except ValidationError as err:  # pydantic core validation error
+        raise SuggestionsException(err) from err
+    except ParseError as err:  # xml parsing error
+        raise SuggestionsException(err) from err
+    except BaseError as err:  # base package error
+        raise SuggestionsException(err) from err
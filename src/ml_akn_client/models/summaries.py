@@ -3,7 +3,8 @@ summaries.py
 
 A simple MarkLogic XML unmarshalling module for unmarshalling Akoma
 Ntosi (AKN) legal files. summaries.py unmarshall simple summaries of AKN
-files.
+files, either as a whole (Summaries) or one page at a time
+(SummariesPage).
 
 Started by: rorycl
 Date      : 12 July 2025
@@ -12,7 +13,7 @@ Date      : 12 July 2025
 from datetime import date
 from typing import List
 
-from pydantic_xml import BaseXmlModel, element
+from pydantic_xml import BaseXmlModel, attr, element
 from pydantic_xml.errors import BaseError
 from pydantic import ValidationError
 from xml.etree.ElementTree import ParseError
@@ -27,24 +28,52 @@ class SummariesException(Exception):
     pass
 
 
-class Summary(BaseXmlModel, tag="summary"):
+class Summary(BaseXmlModel, tag="summary", search_mode="unordered"):
     """
     Summary is a simple summary of an Akomo Ntosi judicial record.
+
+    Only the uri is always present: the other fields are None if they were not
+    selected by a field projection. Elements are matched in any order and unknown
+    elements are ignored, so that the server may add summary elements without
+    breaking older clients.
     """
 
     uri: str = element()
-    name: str = element()
-    judgment_date: date = element(tag="judgmentDate")
-    court: str = element()
-    citation: str = element()
+    name: str | None = element(default=None)
+    judgment_date: date | None = element(tag="judgmentDate", default=None)
+    court: str | None = element(default=None)
+    citation: str | None = element(default=None)
 
 
 class Summaries(BaseXmlModel, tag="summaries"):
     """
-    Summaries is a list of Summary.
+    Summaries is a list of Summary. etag is the validator of the result for
+    conditional requests.
+    """
+
+    etag: str | None = attr(default=None)
+    summaries: List[Summary] = element(tag="summary", default_factory=list)
+
+
+class PageSummary(Summary, tag="summary", search_mode="unordered"):
+    """
+    PageSummary extends Summary with version, the server's change token for the
+    document, which differs whenever the document has been updated, or None if the
+    server does not report one.
+    """
+
+    version: str | None = attr(default=None)
+
+
+class SummariesPage(BaseXmlModel, tag="summaries"):
+    """
+    SummariesPage is one page of a list of PageSummary, in uri order. next is the
+    cursor for the following page, or None if this is the last page. A page may be
+    empty.
     """
 
-    summaries: List[Summary] = element(tag="summary")
+    next: str | None = attr(default=None)
+    summaries: List[PageSummary] = element(tag="summary", default_factory=list)
 
 
 def summaries_deserialize(xml: bytes) -> Summaries:
@@ -64,3 +93,20 @@ def summaries_deserialize(xml: bytes) -> Summaries:
         raise SummariesException(BaseError)
     except:
         raise
+
+
+def summaries_page_deserialize(xml: bytes) -> SummariesPage:
+    """
+    summaries_page_deserialize deserialises an xml string to a
+    SummariesPage.
+    """
+    if xml == b"":
+        raise SummariesException("provided xml bytes are empty")
+    try:
+        return SummariesPage.from_xml(xml)
+    except ValidationError as err:  # pydantic core validation error
+        raise SummariesException(err) from err
+    except ParseError as err:  # xml parsing error
+        raise SummariesException(err) from err
+    except BaseError as err:  # base package error
+        raise SummariesException(err) from err
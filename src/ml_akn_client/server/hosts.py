@@ -0,0 +1,191 @@
+"""
+hosts.py
+
+Endpoint selection and health checking for clients talking to a cluster of MarkLogic
+e-nodes.
+
+A HostPool holds one Endpoint per e-node. Each Endpoint has its own requests.Session
+and therefore its own connection pool. Requests are distributed across the healthy
+endpoints either by round-robin or by choosing the endpoint with the fewest
+outstanding requests. Endpoints are ejected after a number of consecutive failures and
+readmitted when a health probe succeeds. Probes can be run once with `probe` or
+periodically in a background thread with `start_health_checks`.
+
+If every endpoint has been ejected the pool "fails open" and selects from all
+endpoints, so that a cluster-wide blip does not leave the client with nothing to try.
+"""
+
+import itertools
+import threading
+from typing import Callable, Literal
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# default number of consecutive failures before an endpoint is ejected
+HOST_MAX_FAILURES: int = 3
+# default number of connections kept per endpoint
+HOST_POOL_MAXSIZE: int = 10
+
+
+class Endpoint:
+    """
+    Endpoint is a single MarkLogic e-node with its own connection pool and health
+    state.
+    """
+
+    hostpath: str  # for example http://host:8000
+    session: requests.Session  # per-endpoint connection pool
+    outstanding: int  # requests currently in flight
+    failures: int  # consecutive failures
+    healthy: bool  # false once ejected
+
+    def __init__(self, hostpath: str, pool_maxsize: int = HOST_POOL_MAXSIZE):
+        self.hostpath = hostpath
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_maxsize)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.outstanding = 0
+        self.failures = 0
+        self.healthy = True
+
+    def __repr__(self) -> str:
+        return (
+            f"Endpoint({self.hostpath!r}, healthy={self.healthy}, "
+            f"outstanding={self.outstanding}, failures={self.failures})"
+        )
+
+
+class HostPool:
+    """
+    HostPool distributes requests across a list of Endpoints.
+
+    Callers `acquire` an endpoint before a request and `release` it afterwards,
+    reporting whether the request reached the server. All state changes are made
+    under a lock so a pool can be shared between threads.
+    """
+
+    strategies = Literal["round-robin", "least-outstanding"]
+
+    endpoints: list[Endpoint]
+    strategy: strategies
+    max_failures: int
+
+    def __init__(
+        self,
+        hostpaths: list[str],
+        strategy: strategies = "round-robin",
+        max_failures: int = HOST_MAX_FAILURES,
+    ):
+        if not hostpaths:
+            raise ValueError("at least one hostpath is required")
+        if strategy not in ("round-robin", "least-outstanding"):
+            raise ValueError(f"unknown balancing strategy {strategy!r}")
+        if max_failures < 1:
+            raise ValueError("max_failures must be at least 1")
+        self.endpoints = [Endpoint(h) for h in hostpaths]
+        self.strategy = strategy
+        self.max_failures = max_failures
+        self._lock = threading.Lock()
+        self._counter = itertools.count()
+        self._stop = threading.Event()
+        self._checker: threading.Thread | None = None
+
+    def available(self) -> list[Endpoint]:
+        """
+        available returns the healthy endpoints, or all endpoints if none are healthy.
+        """
+        healthy = [e for e in self.endpoints if e.healthy]
+        return healthy if healthy else list(self.endpoints)
+
+    def acquire(self, exclude: tuple[Endpoint, ...] = ()) -> Endpoint:
+        """
+        acquire selects an endpoint according to the pool strategy and marks a request
+        as outstanding on it. Endpoints in @exclude are skipped unless nothing else is
+        available, which allows callers to fail over to a different host.
+        """
+        with self._lock:
+            candidates = [e for e in self.available() if e not in exclude]
+            if not candidates:
+                candidates = self.available()
+            if self.strategy == "least-outstanding":
+                # ties are broken round-robin so idle endpoints share the load
+                start = next(self._counter) % len(candidates)
+                rotated = candidates[start:] + candidates[:start]
+                endpoint = min(rotated, key=lambda e: e.outstanding)
+            else:
+                endpoint = candidates[next(self._counter) % len(candidates)]
+            endpoint.outstanding += 1
+            return endpoint
+
+    def release(self, endpoint: Endpoint, ok: bool) -> None:
+        """
+        release marks a request on @endpoint as finished. A failed request (@ok False)
+        counts towards ejection; a successful one resets the failure count.
+        """
+        with self._lock:
+            endpoint.outstanding -= 1
+            self._record(endpoint, ok)
+
+    def _record(self, endpoint: Endpoint, ok: bool) -> None:
+        """
+        _record updates the health state of @endpoint. The caller holds the lock.
+        """
+        if ok:
+            endpoint.failures = 0
+            endpoint.healthy = True
+            return
+        endpoint.failures += 1
+        if endpoint.failures >= self.max_failures:
+            endpoint.healthy = False
+
+    def probe(self, check: Callable[[Endpoint], bool]) -> None:
+        """
+        probe runs @check against every endpoint once, ejecting or readmitting each
+        according to the result. @check should return True if the endpoint is usable
+        and must not raise.
+        """
+        for endpoint in self.endpoints:
+            ok = check(endpoint)
+            with self._lock:
+                self._record(endpoint, ok)
+
+    def start_health_checks(
+        self, check: Callable[[Endpoint], bool], interval: float
+    ) -> None:
+        """
+        start_health_checks runs `probe` with @check every @interval seconds in a
+        daemon thread until `stop_health_checks` is called.
+        """
+        if interval <= 0:
+            raise ValueError("health check interval must be positive")
+        if self._checker is not None and self._checker.is_alive():
+            return
+        self._stop.clear()
+
+        def run() -> None:
+            while not self._stop.wait(interval):
+                self.probe(check)
+
+        self._checker = threading.Thread(
+            target=run, name="ml-akn-health-check", daemon=True
+        )
+        self._checker.start()
+
+    def stop_health_checks(self) -> None:
+        """
+        stop_health_checks stops the background health check thread, if running.
+        """
+        self._stop.set()
+        if self._checker is not None:
+            self._checker.join()
+            self._checker = None
+
+    def close(self) -> None:
+        """
+        close stops health checks and closes every endpoint's connection pool.
+        """
+        self.stop_health_checks()
+        for endpoint in self.endpoints:
+            endpoint.session.close()
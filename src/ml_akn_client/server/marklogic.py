@@ -3,6 +3,9 @@ marklogic.py
 
 A class for interacting with a MarkLogic REST server over HTTP.
 
+The client can be pointed at a single MarkLogic e-node or at several, in which case
+requests are distributed across them by a hosts.HostPool.
+
 Started by: rorycl
 Date      : 13 July 2025
 """
@@ -16,14 +19,46 @@ from requests_toolbelt.multipart import decoder, ImproperBodyPartContentExceptio
 
 # needed for creating post content
 from json import dumps
-from urllib.parse import urljoin
+from urllib.parse import urljoin, urlsplit
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Literal, get_args
 
-from typing import Literal
+from .hosts import HOST_POOL_MAXSIZE, Endpoint, HostPool
 
 # MarkLogic fixed paths and timeout
 ML_MODULE_INVOCATION_PATH: str = "/LATEST/invoke"
 ML_MODULE_INTERNAL_PATH: str = "/ext/"
+ML_HEALTH_CHECK_PATH: str = "/LATEST/ping"
 ML_SERVER_TIMEOUT: int = 3  # 3 seconds
+ML_HEALTH_CHECK_TIMEOUT: float = 1  # 1 second
+
+# cheap arguments with which each module is invoked to warm it up; the search term
+# is chosen to match nothing
+ML_WARM_UP_VARS: dict[str, dict[str, str]] = {
+    "summaries.xqy": {"sort_by": "name", "sort_direction": "asc", "fields": "uri"},
+    "search.xqy": {
+        "query": "ml-akn-client-warm-up",
+        "sort_by": "name",
+        "sort_direction": "asc",
+        "cache": "false",
+        "fields": "uri",
+        "snippets": "false",
+    },
+    "export.xqy": {"after": "", "page_size": "1"},
+    "suggest.xqy": {"prefix": "a", "limit": "1", "fields": "name"},
+    "count.xqy": {"query": "", "court": "", "exact": "false"},
+}
+
+# the collection queried unless another is given
+ML_COLLECTION: str = "examples"
+
+# search snippet defaults, see xquery/search.xqy
+SEARCH_PER_MATCH_TOKENS: int = 30
+SEARCH_MAX_MATCHES: int = 3
+SEARCH_MAX_SNIPPET_CHARS: int = 200
 
 
 class LocalMLException(Exception):
@@ -58,15 +93,29 @@ class MarkLogicHTTPClient:
     server.
 
     The connection is always used making digest authentication.
+
+    A single e-node is addressed with @host and @port. A cluster is addressed by
+    providing @hosts, a list of "host" or "host:port" strings (the port defaults to
+    @port), which are balanced according to @balancing, either "round-robin" or
+    "least-outstanding". Each host keeps its own connection pool. If
+    @health_check_interval is set, each host is probed in the background every
+    @health_check_interval seconds; failing hosts are ejected and readmitted when they
+    recover. Call `close` to stop the health checks and release connections.
     """
 
-    hostpath: str  # the basepath to the server host
+    pool: HostPool  # the e-nodes to which requests are sent
     auth: HTTPDigestAuth  # the digest authentication string
 
     # summaries: permitted values
     summaries_sort_by = Literal["name", "date", "court", "citation"]
     summaries_order_by = Literal["desc", "asc"]
 
+    # summaries: fields which may be selected; uri is always returned
+    summary_fields = Literal["uri", "name", "judgment_date", "court", "citation"]
+
+    # suggest: permitted fields
+    suggest_fields = Literal["name", "court", "citation"]
+
     def __init__(
         self,
         scheme: str = "http",
@@ -74,12 +123,18 @@ class MarkLogicHTTPClient:
         port: int = 8000,
         username: str = "",
         password: str = "",
+        hosts: list[str] | None = None,
+        balancing: HostPool.strategies = "round-robin",
+        health_check_interval: float | None = None,
     ):
         # checks
-        if (host == "localhost" or host == "127.0.0.1") and scheme != "http":
-            raise MisconfigurationException("http only used for local connections")
-        if host == "" or port < 80:
-            raise MisconfigurationException("empty host or low port received")
+        if hosts is None:
+            hosts = [host]
+        if not hosts:
+            raise MisconfigurationException("empty hosts list received")
+        hostpaths = [self._hostpath(scheme, h, port) for h in hosts]
+        if balancing not in ("round-robin", "least-outstanding"):
+            raise MisconfigurationException(f"unknown balancing {balancing!r}")
         if username == "" or password == "":
             raise MisconfigurationException(
                 "empty usernames and passwords not accepted"
@@ -88,8 +143,82 @@ class MarkLogicHTTPClient:
             raise MisconfigurationException("https://xkcd.com/792/ reuse exception")
 
         # define instance variables
-        self.hostpath = f"{scheme}://{host}:{port}"
+        self.pool = HostPool(hostpaths, strategy=balancing)
         self.auth = HTTPDigestAuth(username, password)
+        if health_check_interval is not None:
+            if health_check_interval <= 0:
+                raise MisconfigurationException("health_check_interval must be > 0")
+            self.pool.start_health_checks(self._check_endpoint, health_check_interval)
+
+    @staticmethod
+    def _hostpath(scheme: str, host: str, port: int) -> str:
+        """
+        _hostpath validates a "host" or "host:port" string, returning the base url
+        for the host. IPv6 addresses are given in brackets, as in "[::1]:8000".
+        """
+        parts = urlsplit(f"//{host}")
+        try:
+            port = parts.port or port
+        except ValueError as e:
+            raise MisconfigurationException(f"invalid port in {host!r}") from e
+        name = parts.hostname or ""
+        if name in ("localhost", "127.0.0.1", "::1") and scheme != "http":
+            raise MisconfigurationException("http only used for local connections")
+        if name == "" or port < 80:
+            raise MisconfigurationException("empty host or low port received")
+        if ":" in name:
+            name = f"[{name}]"
+        return f"{scheme}://{name}:{port}"
+
+    @property
+    def hostpath(self) -> str:
+        """
+        hostpath is the base path of the first configured host.
+        """
+        return self.pool.endpoints[0].hostpath
+
+    @hostpath.setter
+    def hostpath(self, value: str) -> None:
+        """
+        Setting hostpath replaces the configured hosts with the single host @value.
+        """
+        strategy = self.pool.strategy
+        self.pool.close()
+        self.pool = HostPool([value], strategy=strategy)
+
+    @property
+    def hostpaths(self) -> list[str]:
+        """
+        hostpaths lists the base paths of all configured hosts.
+        """
+        return [e.hostpath for e in self.pool.endpoints]
+
+    def _check_endpoint(self, endpoint: Endpoint) -> bool:
+        """
+        _check_endpoint is the health probe for a host. Any response other than a
+        server error counts as healthy.
+        """
+        try:
+            r = endpoint.session.get(
+                urljoin(endpoint.hostpath, ML_HEALTH_CHECK_PATH),
+                auth=self.auth,
+                timeout=ML_HEALTH_CHECK_TIMEOUT,
+            )
+        except RequestException:
+            return False
+        return r.status_code < 500
+
+    def check_health(self) -> None:
+        """
+        check_health probes every host once, ejecting or readmitting each.
+        """
+        self.pool.probe(self._check_endpoint)
+
+    def close(self) -> None:
+        """
+        close stops any background health checks and closes all connections.
+        """
+        self.pool.close()
 
     def _post_to_module(self, module_endpoint: str, vars: dict[str, str]) -> bytes:
         """
@@ -113,32 +242,112 @@ class MarkLogicHTTPClient:
         if module_endpoint == "":
             raise MisconfigurationException("empty module_endpoint provided")
 
-        # the form data for the POST request body.
-        payload = {
-            "module": urljoin(ML_MODULE_INTERNAL_PATH, module_endpoint),
-            "vars": dumps(vars),  # The 'vars' value itself is a JSON string
-        }
+        # connection failures are retried once on each other host; any other
+        # failure is reported to the caller
+        tried: tuple[Endpoint, ...] = ()
+        while True:
+            endpoint = self.pool.acquire(exclude=tried)
+            tried += (endpoint,)
+            try:
+                r = self._invoke(endpoint, module_endpoint, vars)
+            except requests.ConnectionError as e:
+                self.pool.release(endpoint, ok=False)
+                if any(other not in tried for other in self.pool.available()):
+                    continue
+                raise LocalMLException(f"Request failed: {e}") from e
+            except RequestException as e:
+                self.pool.release(endpoint, ok=False)
+                raise LocalMLException(f"Request failed: {e}") from e
+            self.pool.release(endpoint, ok=r.status_code < 500)
+            break
 
-        module_url = urljoin(self.hostpath, ML_MODULE_INVOCATION_PATH)
         try:
-            r = requests.post(
-                module_url,
-                auth=self.auth,
-                data=payload,
-                headers={"Accept": "application/xml"},
-                timeout=ML_SERVER_TIMEOUT,
-            )
             r.raise_for_status()
         except requests.HTTPError as e:
             raise LocalMLException(f"HTTP exception: {e}") from e
-        except RequestException as e:
-            raise LocalMLException(f"Request failed: {e}") from e
 
         first_multipart_part = self.decode_multipart(
             r.content, r.headers.get("content-type", "")
         )
         return first_multipart_part
 
+    def _invoke(
+        self, endpoint: Endpoint, module_endpoint: str, vars: dict[str, str]
+    ) -> requests.Response:
+        """
+        _invoke POSTs a module invocation to @endpoint, returning the response.
+        """
+        # the form data for the POST request body.
+        payload = {
+            "module": urljoin(ML_MODULE_INTERNAL_PATH, module_endpoint),
+            "vars": dumps(vars),  # The 'vars' value itself is a JSON string
+        }
+        return endpoint.session.post(
+            urljoin(endpoint.hostpath, ML_MODULE_INVOCATION_PATH),
+            auth=self.auth,
+            data=payload,
+            headers={"Accept": "application/xml"},
+            timeout=ML_SERVER_TIMEOUT,
+        )
+
+    def open_connections(self, size: int = HOST_POOL_MAXSIZE) -> int:
+        """
+        open_connections opens @size connections to every host so that they are
+        ready in the connection pools. It returns the number of connections opened.
+
+        Each connection is held open (by streaming its response) until all have
+        been made, so that none is reused by another. Only the connections are
+        warmed: requests keeps digest authentication state per thread, and that of
+        the threads used here is discarded, so each thread still answers a digest
+        challenge on its first request.
+        """
+        if size < 1:
+            raise MisconfigurationException("size must be at least 1")
+        size = min(size, HOST_POOL_MAXSIZE)
+        barrier = threading.Barrier(size * len(self.pool.endpoints))
+
+        def connect(endpoint: Endpoint) -> bool:
+            r = None
+            try:
+                r = endpoint.session.get(
+                    urljoin(endpoint.hostpath, ML_HEALTH_CHECK_PATH),
+                    auth=self.auth,
+                    timeout=ML_HEALTH_CHECK_TIMEOUT,
+                    stream=True,
+                )
+            except RequestException:
+                pass
+            try:
+                barrier.wait(ML_SERVER_TIMEOUT)
+            except threading.BrokenBarrierError:
+                pass
+            if r is None:
+                return False
+            r.close()
+            return r.status_code < 500
+
+        endpoints = [e for e in self.pool.endpoints for _ in range(size)]
+        with ThreadPoolExecutor(len(endpoints)) as executor:
+            return sum(executor.map(connect, endpoints))
+
+    def warm_up_module(self, module_endpoint: str, vars: dict[str, str]) -> float:
+        """
+        warm_up_module invokes @module_endpoint with @vars once on every host, so that
+        each host compiles and caches the module, returning the slowest time taken
+        in seconds.
+        """
+        slowest = 0.0
+        for endpoint in self.pool.endpoints:
+            start = time.perf_counter()
+            try:
+                self._invoke(endpoint, module_endpoint, vars).raise_for_status()
+            except RequestException as e:
+                raise LocalMLException(
+                    f"warm up of {module_endpoint} on {endpoint.hostpath} failed: {e}"
+                ) from e
+            slowest = max(slowest, time.perf_counter() - start)
+        return slowest
+
     def decode_multipart(
         self,
         data: bytes,
@@ -158,7 +367,10 @@ class MarkLogicHTTPClient:
             return b""
         try:
             decoded = decoder.MultipartDecoder(data, content_type)
-        except ImproperBodyPartContentException as e:
+        except (
+            ImproperBodyPartContentException,
+            decoder.NonMultipartContentTypeException,
+        ) as e:
             raise LocalContentException(f"Decoding failed: {e}") from e
         if not decoded.parts:
             raise LocalContentException(
@@ -171,19 +383,70 @@ class MarkLogicHTTPClient:
             )
         return decoded.parts[offset].content  # content is bytes, text is unicode
 
+    @staticmethod
+    def _fields_var(fields: tuple[summary_fields, ...] | None) -> str:
+        """
+        _fields_var converts a projection of summary fields to the comma separated
+        summary element names expected by the XQuery modules. None, for all fields,
+        is converted to "". Unknown field names are rejected.
+        """
+        if fields is None:
+            return ""
+        if not fields:
+            raise MisconfigurationException("empty fields projection provided")
+        known = get_args(MarkLogicHTTPClient.summary_fields)
+        unknown = [f for f in fields if f not in known]
+        if unknown:
+            raise MisconfigurationException(f"unknown summary fields {unknown}")
+        return ",".join("judgmentDate" if f == "judgment_date" else f for f in fields)
+
+    @staticmethod
+    def _collection_var(collection: str) -> str:
+        """
+        _collection_var checks a collection name for the XQuery modules.
+        """
+        if collection == "":
+            raise MisconfigurationException("empty collection provided")
+        return collection
+
+    @staticmethod
+    def _limit_var(limit: int) -> str:
+        """
+        _limit_var converts a result limit, 0 for no limit, to a module var.
+        """
+        if limit < 0:
+            raise MisconfigurationException("limit must not be negative")
+        return str(limit)
+
     def summaries(
         self,
         sort_by: summaries_sort_by,
         sort_direction: summaries_order_by,
+        fields: tuple[summary_fields, ...] | None = None,
+        if_none_match: str = "",
+        collection: str = ML_COLLECTION,
+        limit: int = 0,
     ) -> bytes:
         """
-        Summaries gets a list of summaries of documents in the database
+        Summaries gets a list of summaries of documents in the collection
         sorted by the sort_by field and ordered either "desc" or "asc".
-        The XQuery counterpart to this is marklogic/summaries.xqy
+        If fields is provided only those summary fields (and the uri) are
+        returned. If limit is more than 0 only the first limit summaries are
+        returned.
+        If if_none_match is the etag of a result which is still current, a
+        <not-modified/> element is returned instead.
+        The XQuery counterpart to this is xquery/summaries.xqy
         """
         return self._post_to_module(
             module_endpoint="summaries.xqy",
-            vars={"sort_by": sort_by, "sort_direction": sort_direction},
+            vars={
+                "collection": self._collection_var(collection),
+                "limit": self._limit_var(limit),
+                "sort_by": sort_by,
+                "sort_direction": sort_direction,
+                "fields": self._fields_var(fields),
+                "if_none_match": if_none_match,
+            },
         )
 
     def search(
@@ -191,14 +454,116 @@ class MarkLogicHTTPClient:
         query: str,
         sort_by: summaries_sort_by,
         sort_direction: summaries_order_by,
+        use_cache: bool = True,
+        fields: tuple[summary_fields, ...] | None = None,
+        snippets: bool = True,
+        per_match_tokens: int = SEARCH_PER_MATCH_TOKENS,
+        max_matches: int = SEARCH_MAX_MATCHES,
+        max_snippet_chars: int = SEARCH_MAX_SNIPPET_CHARS,
+        if_none_match: str = "",
+        collection: str = ML_COLLECTION,
+        limit: int = 0,
     ) -> bytes:
         """
-        Search searches the documents in the database for the query term using the
+        Search searches the documents in the collection for the query term using the
         server "search:search" routine which returns summary items possibly decorated
         with snippets showing the context of the search hits.
-        The XQuery counterpart to this function is marklogic/search.xqy
+        Results are served from the server-side cache unless use_cache is False.
+        If fields is provided only those summary fields (and the uri) are returned.
+        If snippets is False no snippets are generated; otherwise their size is
+        limited by per_match_tokens, max_matches and max_snippet_chars.
+        If limit is more than 0 only the first limit summaries are returned.
+        If if_none_match is the etag of a result which is still current, a
+        <not-modified/> element is returned instead.
+        The XQuery counterpart to this function is xquery/search.xqy
         """
+        if min(per_match_tokens, max_matches, max_snippet_chars) < 1:
+            raise MisconfigurationException("snippet limits must be at least 1")
         return self._post_to_module(
             module_endpoint="search.xqy",
-            vars={"query": query, "sort_by": sort_by, "sort_direction": sort_direction},
+            vars={
+                "collection": self._collection_var(collection),
+                "limit": self._limit_var(limit),
+                "query": query,
+                "sort_by": sort_by,
+                "sort_direction": sort_direction,
+                "cache": "true" if use_cache else "false",
+                "fields": self._fields_var(fields),
+                "snippets": "true" if snippets else "false",
+                "per_match_tokens": str(per_match_tokens),
+                "max_matches": str(max_matches),
+                "max_snippet_chars": str(max_snippet_chars),
+                "if_none_match": if_none_match,
+            },
+        )
+
+    def export(
+        self, after: str, page_size: int, collection: str = ML_COLLECTION
+    ) -> bytes:
+        """
+        Export gets one page of summaries of documents in the collection in uri
+        order, starting after the uri cursor @after ("" for the first page). The
+        response carries the cursor for the next page, if any.
+        The XQuery counterpart to this function is xquery/export.xqy
+        """
+        if page_size < 1:
+            raise MisconfigurationException("page_size must be at least 1")
+        return self._post_to_module(
+            module_endpoint="export.xqy",
+            vars={
+                "collection": self._collection_var(collection),
+                "after": after,
+                "page_size": str(page_size),
+            },
+        )
+
+    def suggest(
+        self,
+        prefix: str,
+        limit: int,
+        fields: tuple[suggest_fields, ...] = ("name", "court", "citation"),
+        collection: str = ML_COLLECTION,
+    ) -> bytes:
+        """
+        Suggest gets up to @limit values of @fields starting with @prefix in
+        @collection, matched case and diacritic insensitively from the server range
+        index lexicons without opening any documents.
+        The XQuery counterpart to this function is xquery/suggest.xqy
+        """
+        if limit < 1:
+            raise MisconfigurationException("limit must be at least 1")
+        if not fields:
+            raise MisconfigurationException("no suggest fields provided")
+        return self._post_to_module(
+            module_endpoint="suggest.xqy",
+            vars={
+                "collection": self._collection_var(collection),
+                "prefix": prefix,
+                "limit": str(limit),
+                "fields": ",".join(fields),
+            },
+        )
+
+    def count(
+        self,
+        query: str = "",
+        court: str = "",
+        exact: bool = False,
+        collection: str = ML_COLLECTION,
+    ) -> bytes:
+        """
+        Count gets the number of documents in the collection, optionally only those
+        matching the search term @query and/or in @court. Unless @exact is set the
+        count is an estimate resolved from the server indexes without reading any
+        documents.
+        The XQuery counterpart to this function is xquery/count.xqy
+        """
+        return self._post_to_module(
+            module_endpoint="count.xqy",
+            vars={
+                "collection": self._collection_var(collection),
+                "query": query,
+                "court": court,
+                "exact": "true" if exact else "false",
+            },
         )
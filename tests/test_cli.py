@@ -0,0 +1,155 @@
+"""
+Test the command-line interface
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+from ml_akn_client import cli
+
+SUMMARIES_XML = b"""<summaries>
+  <summary>
+    <uri>/documents/ewca_civ_2018_2414.xml</uri>
+    <name>Barrow &amp; Anoe v Kazim &amp; Ors</name>
+    <judgmentDate>2018-10-31</judgmentDate>
+    <court>EWCA-Civil</court>
+    <citation>[2018] EWCA Civ 2414</citation>
+  </summary>
+</summaries>"""
+
+# modules which must not be imported to start the CLI
+HEAVY_MODULES = ("requests", "requests_toolbelt", "pydantic", "pydantic_xml")
+
+STARTUP_SCRIPT = f"""
+import sys, time
+start = time.perf_counter()
+import ml_akn_client.cli as cli
+cli.build_parser()
+elapsed = time.perf_counter() - start
+heavy = [m for m in {HEAVY_MODULES!r} if m in sys.modules]
+print(elapsed, ",".join(heavy))
+"""
+
+
+@pytest.fixture
+def ml_env(monkeypatch, requests_mock):
+    """
+    Sets the connection environment variables and returns a function mocking the
+    MarkLogic response body.
+    """
+    monkeypatch.setenv("ML_USERNAME", "admin")
+    monkeypatch.setenv("ML_PASSWORD", "not-admin")
+    monkeypatch.delenv("ML_HOSTS", raising=False)
+    monkeypatch.delenv("ML_HOST", raising=False)
+    monkeypatch.delenv("ML_PORT", raising=False)
+
+    def respond(xml):
+        requests_mock.post(
+            "http://localhost:8000/LATEST/invoke",
+            content=b"--b\r\nContent-Type: application/xml\r\n\r\n"
+            + xml
+            + b"\r\n--b--",
+            headers={"Content-Type": "multipart/mixed; boundary=b"},
+        )
+
+    return respond
+
+
+def test_cli_startup():
+    """
+    Test the CLI starts within CLI_STARTUP_BUDGET without importing the client's
+    heavy dependencies. The best of three cold starts is used to reduce noise.
+    """
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+    timings = []
+    for _ in range(3):
+        out = subprocess.run(
+            [sys.executable, "-c", STARTUP_SCRIPT],
+            env=env,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.split(" ")
+        assert out[1].strip() == "", f"heavy modules imported: {out[1]}"
+        timings.append(float(out[0]))
+    assert min(timings) < cli.CLI_STARTUP_BUDGET
+
+
+def test_cli_summaries_ndjson(ml_env, capsys):
+    """
+    Test summaries writes one JSON object per summary.
+    """
+    ml_env(SUMMARIES_XML)
+    assert cli.main(["summaries", "--sort-by", "date"]) == 0
+    lines = capsys.readouterr().out.splitlines()
+    assert len(lines) == 1
+    assert json.loads(lines[0])["citation"] == "[2018] EWCA Civ 2414"
+
+
+def test_cli_search_table(ml_env, capsys):
+    """
+    Test search writes a table of the selected fields.
+    """
+    ml_env(SUMMARIES_XML)
+    args = ["search", "kazim", "--fields", "name,court", "--output", "table"]
+    assert cli.main(args) == 0
+    lines = capsys.readouterr().out.splitlines()
+    assert lines[0].split() == ["name", "court"]
+    assert lines[2].endswith("EWCA-Civil")
+
+
+def test_cli_count(ml_env, capsys):
+    """
+    Test count prints estimates with a tilde.
+    """
+    ml_env(b'<count exact="false">42</count>')
+    assert cli.main(["count", "--court", "EWCA-Civil"]) == 0
+    assert capsys.readouterr().out.strip() == "~42"
+
+
+def test_cli_error(ml_env, capsys, monkeypatch):
+    """
+    Test client errors are reported on stderr with a non-zero exit code.
+    """
+    monkeypatch.setenv("ML_PASSWORD", "admin")
+    assert cli.main(["count"]) == 1
+    assert "misconfiguration" in capsys.readouterr().err
+
+
+def test_cli_summaries_collections(ml_env, capsys, requests_mock):
+    """
+    Test summaries of several collections are fanned out, one request each.
+    """
+    ml_env(SUMMARIES_XML)
+    args = ["summaries", "--collection", "ewca", "--collection", "uksc"]
+    assert cli.main(args + ["--limit", "5"]) == 0
+    assert len(capsys.readouterr().out.splitlines()) == 1  # the same document
+    assert requests_mock.call_count == 2
+
+
+def test_cli_local_index(ml_env, capsys, tmp_path, requests_mock):
+    """
+    Test index syncs a local index which search can then answer from.
+    """
+    ml_env(SUMMARIES_XML)
+    path = str(tmp_path / "index")
+    assert cli.main(["index", path]) == 0
+    assert "indexed 1 documents: 1 added" in capsys.readouterr().err
+    calls = requests_mock.call_count
+    args = ["search", "kazim", "--local-index", path, "--local-search", "always"]
+    assert cli.main(args) == 0
+    assert json.loads(capsys.readouterr().out)["court"] == "EWCA-Civil"
+    assert requests_mock.call_count == calls
+
+
+def test_cli_memory(capsys):
+    """
+    Test memory reports each function within its budget.
+    """
+    assert cli.main(["memory", "--sizes", "20", "--hot-spots", "0"]) == 0
+    lines = capsys.readouterr().out.splitlines()
+    assert len(lines) == 4
+    assert all(line.endswith("ok") for line in lines[1:])
@@ -0,0 +1,398 @@
+"""
+Test the CaseLawClient
+"""
+
+import json
+import os
+import secrets
+import subprocess
+import sys
+from urllib.parse import parse_qs
+
+import pytest
+from ml_akn_client import ml_akn_client as cl
+from ml_akn_client.cache import TTLCache
+from ml_akn_client.server import marklogic as ml
+
+
+def multipart(xml):
+    """
+    multipart wraps xml in a single part MarkLogic multipart response body.
+    """
+    return b"--b\r\nContent-Type: application/xml\r\n\r\n" + xml + b"\r\n--b--"
+
+
+def module_vars(request):
+    """
+    module_vars returns the module name and vars posted in a mocked request.
+    """
+    form = parse_qs(request.text)
+    return form["module"][0], json.loads(form["vars"][0])
+
+
+@pytest.fixture
+def client():
+    """
+    Provides a CaseLawClient for localhost.
+    """
+    http_client = ml.MarkLogicHTTPClient(
+        username="admin", password=secrets.token_urlsafe(10)
+    )
+    return cl.CaseLawClient(http_client)
+
+
+# -- cache testing --#
+
+
+def test_ttl_cache():
+    """
+    Test TTLCache expiry and least-recently-used eviction.
+    """
+    now = [0.0]
+    cache = TTLCache(maxsize=2, ttl=10, clock=lambda: now[0])
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1  # "b" is now least recently used
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert len(cache) == 2
+
+    now[0] = 10.0
+    assert cache.get("a") is None
+    assert len(cache) == 1
+
+
+def test_ttl_cache_disabled():
+    """
+    Test a TTLCache with a ttl of 0 stores nothing.
+    """
+    cache = TTLCache(ttl=0)
+    cache.put("a", 1)
+    assert cache.get("a") is None
+
+
+# -- suggest testing --#
+
+
+def test_suggest(client, requests_mock):
+    """
+    Test suggest posts to suggest.xqy and deserializes the suggestions.
+    """
+    requests_mock.post(
+        "http://localhost:8000/LATEST/invoke",
+        content=multipart(
+            b'<suggestions><suggestion field="court">EWCA-Civil</suggestion>'
+            b"</suggestions>"
+        ),
+        headers={"Content-Type": "multipart/mixed; boundary=b"},
+    )
+    s = client.suggest("ewca", limit=5, fields=("court",))
+    assert s.suggestions[0].value == "EWCA-Civil"
+    module, posted = module_vars(requests_mock.request_history[0])
+    assert module == "/ext/suggest.xqy"
+    assert posted == {
+        "collection": "examples",
+        "prefix": "ewca",
+        "limit": "5",
+        "fields": "court",
+    }
+
+
+def test_suggest_prefix_cache(client, requests_mock):
+    """
+    Test that complete results for a prefix answer longer prefixes locally, while
+    truncated results do not.
+    """
+    requests_mock.post(
+        "http://localhost:8000/LATEST/invoke",
+        content=multipart(
+            b"<suggestions>"
+            b'<suggestion field="name">Nor\xc3\xa9n v Smith</suggestion>'
+            b'<suggestion field="name">Norwich Union v Shopmoor</suggestion>'
+            b"</suggestions>"
+        ),
+        headers={"Content-Type": "multipart/mixed; boundary=b"},
+    )
+    assert len(client.suggest("No", limit=3).suggestions) == 2
+    s = client.suggest("NORW", limit=3)
+    assert [x.value for x in s.suggestions] == ["Norwich Union v Shopmoor"]
+    s = client.suggest("nore", limit=3)
+    assert [x.value for x in s.suggestions] == ["Norén v Smith"]
+    assert requests_mock.call_count == 1
+
+    # with a limit of 2 the results are possibly truncated, so the server is asked
+    client.suggest("No", limit=2)
+    client.suggest("Nor", limit=2)
+    assert requests_mock.call_count == 3
+
+
+def test_suggest_error(client, requests_mock):
+    """
+    Test server errors are reported as ClientException.
+    """
+    requests_mock.post("http://localhost:8000/LATEST/invoke", status_code=500)
+    with pytest.raises(cl.ClientException, match="suggestions"):
+        client.suggest("nor")
+
+
+# -- count testing --#
+
+
+@pytest.mark.parametrize(
+    "kwargs, expected_vars",
+    [
+        ({}, {"collection": "examples", "query": "", "court": "", "exact": "false"}),
+        (
+            {"query": "norwich", "court": "EWCA-Civil", "exact": True},
+            {
+                "collection": "examples",
+                "query": "norwich",
+                "court": "EWCA-Civil",
+                "exact": "true",
+            },
+        ),
+        (
+            {"collection": "ewca-2020"},
+            {"collection": "ewca-2020", "query": "", "court": "", "exact": "false"},
+        ),
+    ],
+    ids=["all", "filtered exact", "collection"],
+)
+def test_count(client, requests_mock, kwargs, expected_vars):
+    """
+    Test count posts to count.xqy and deserializes the count.
+    """
+    requests_mock.post(
+        "http://localhost:8000/LATEST/invoke",
+        content=multipart(b'<count exact="false">42</count>'),
+        headers={"Content-Type": "multipart/mixed; boundary=b"},
+    )
+    c = client.count(**kwargs)
+    assert c.count == 42
+    module, posted = module_vars(requests_mock.request_history[0])
+    assert module == "/ext/count.xqy"
+    assert posted == expected_vars
+
+
+# -- projection and snippet testing --#
+
+
+def test_get_summaries_fields(client, requests_mock):
+    """
+    Test get_summaries sends the projection as summary element names.
+    """
+    requests_mock.post(
+        "http://localhost:8000/LATEST/invoke",
+        content=multipart(
+            b"<summaries><summary><uri>/a.xml</uri></summary></summaries>"
+        ),
+        headers={"Content-Type": "multipart/mixed; boundary=b"},
+    )
+    s = client.get_summaries(sort_by="date", fields=("name", "judgment_date"))
+    assert s.summaries[0].uri == "/a.xml"
+    _, posted = module_vars(requests_mock.request_history[0])
+    assert posted["fields"] == "name,judgmentDate"
+
+
+def test_search_snippet_options(client, requests_mock):
+    """
+    Test search sends the snippet switch and limits.
+    """
+    requests_mock.post(
+        "http://localhost:8000/LATEST/invoke",
+        content=multipart(b"<summaries/>"),
+        headers={"Content-Type": "multipart/mixed; boundary=b"},
+    )
+    client.search("norwich", fields=("name",), snippets=False, max_matches=1)
+    _, posted = module_vars(requests_mock.request_history[0])
+    assert posted["fields"] == "name"
+    assert posted["snippets"] == "false"
+    assert posted["max_matches"] == "1"
+    assert posted["per_match_tokens"] == "30"
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [{"fields": ()}, {"fields": ("name", "nickname")}, {"max_snippet_chars": 0}],
+    ids=["empty projection", "unknown field", "zero limit"],
+)
+def test_search_options_invalid(client, requests_mock, kwargs):
+    """
+    Test invalid projection or snippet options raise ClientException without
+    being sent to the server.
+    """
+    with pytest.raises(cl.ClientException):
+        client.search("norwich", **kwargs)
+    assert requests_mock.call_count == 0
+
+
+# -- warm up testing --#
+
+
+@pytest.fixture
+def warm_client():
+    """
+    Provides a CaseLawClient for localhost with the results cache enabled.
+    """
+    http_client = ml.MarkLogicHTTPClient(
+        username="admin", password=secrets.token_urlsafe(10)
+    )
+    return cl.CaseLawClient(http_client, results_cache_ttl=60)
+
+
+def test_results_cache(warm_client, requests_mock):
+    """
+    Test summaries and search results are cached only when enabled, and search
+    use_cache=False bypasses the cache.
+    """
+    requests_mock.post(
+        "http://localhost:8000/LATEST/invoke",
+        content=multipart(b"<summaries/>"),
+        headers={"Content-Type": "multipart/mixed; boundary=b"},
+    )
+    warm_client.get_summaries()
+    warm_client.get_summaries()
+    warm_client.search("lease")
+    warm_client.search("lease")
+    warm_client.search("lease", use_cache=False)
+    assert requests_mock.call_count == 3
+
+
+def test_warm_up(warm_client, requests_mock):
+    """
+    Test warm_up opens connections, invokes every module and preloads results in
+    the background, then signals readiness.
+    """
+    requests_mock.get("http://localhost:8000/LATEST/ping", status_code=204)
+    requests_mock.post(
+        "http://localhost:8000/LATEST/invoke",
+        content=multipart(b"<summaries/>"),
+        headers={"Content-Type": "multipart/mixed; boundary=b"},
+    )
+    ready = warm_client.warm_up(
+        connections=2,
+        preload_summaries=[{"sort_by": "date"}],
+        preload_searches=["lease", {"query": "contract", "snippets": False}],
+    )
+    assert ready is warm_client.ready
+    assert ready.wait(10)
+    result = warm_client.warm_up_result
+    assert result.errors == []
+    assert result.connections == 2
+    assert set(result.modules) == set(ml.ML_WARM_UP_VARS)
+    assert result.preloaded == 3
+
+    invoked = [
+        module_vars(r)[0] for r in requests_mock.request_history if r.method == "POST"
+    ]
+    assert len(invoked) == len(ml.ML_WARM_UP_VARS) + 3
+    assert "ml-akn-client-warm-up" in [
+        module_vars(r)[1].get("query")
+        for r in requests_mock.request_history
+        if r.method == "POST"
+    ]
+
+    requests_mock.reset_mock()
+    warm_client.get_summaries(sort_by="date")
+    warm_client.search("contract", snippets=False)
+    assert requests_mock.call_count == 0
+
+
+def test_warm_up_errors(requests_mock):
+    """
+    Test warm up failures are recorded, not raised, and preloading needs the
+    results cache.
+    """
+    http_client = ml.MarkLogicHTTPClient(
+        username="admin", password=secrets.token_urlsafe(10)
+    )
+    client = cl.CaseLawClient(http_client)
+    with pytest.raises(cl.ClientException, match="results_cache_ttl"):
+        client.warm_up(preload_searches=["lease"])
+
+    requests_mock.get("http://localhost:8000/LATEST/ping", status_code=204)
+    requests_mock.post("http://localhost:8000/LATEST/invoke", status_code=500)
+    client.warm_up(connections=1, modules={"count.xqy": {}}, background=False)
+    assert client.ready.is_set()
+    assert client.warm_up_result.modules == {}
+    assert "count.xqy" in client.warm_up_result.errors[0]
+
+
+# -- conditional request testing --#
+
+
+@pytest.mark.parametrize(
+    "call, module",
+    [
+        (lambda c: c.get_summaries(sort_by="date"), "/ext/summaries.xqy"),
+        (lambda c: c.search("lease", use_cache=False), "/ext/search.xqy"),
+    ],
+    ids=["summaries", "search"],
+)
+def test_conditional_requests(client, requests_mock, call, module):
+    """
+    Test repeated requests send the etag of the kept result and reuse it when the
+    server answers not modified.
+    """
+    etag = ["100"]
+
+    def respond(request, context):
+        context.headers["Content-Type"] = "multipart/mixed; boundary=b"
+        name, vars = module_vars(request)
+        assert name == module
+        if vars["if_none_match"] == etag[0]:
+            return multipart(f'<not-modified etag="{etag[0]}"/>'.encode())
+        xml = (
+            f'<summaries etag="{etag[0]}"><summary>'
+            f"<uri>/documents/{etag[0]}.xml</uri></summary></summaries>"
+        )
+        return multipart(xml.encode())
+
+    requests_mock.post("http://localhost:8000/LATEST/invoke", content=respond)
+    first = call(client)
+    assert first.etag == "100"
+    assert call(client) is first
+    sent = [module_vars(r)[1]["if_none_match"] for r in requests_mock.request_history]
+    assert sent == ["", "100"]
+
+    etag[0] = "101"
+    changed = call(client)
+    assert changed is not first
+    assert changed.summaries[0].uri == "/documents/101.xml"
+    assert call(client) is changed
+
+
+def test_conditional_requests_disabled(requests_mock):
+    """
+    Test no etag is sent when conditional requests are disabled.
+    """
+    http_client = ml.MarkLogicHTTPClient(
+        username="admin", password=secrets.token_urlsafe(10)
+    )
+    client = cl.CaseLawClient(http_client, conditional_requests=False)
+    requests_mock.post(
+        "http://localhost:8000/LATEST/invoke",
+        content=multipart(b'<summaries etag="100"/>'),
+        headers={"Content-Type": "multipart/mixed; boundary=b"},
+    )
+    client.get_summaries()
+    client.get_summaries()
+    sent = [module_vars(r)[1]["if_none_match"] for r in requests_mock.request_history]
+    assert sent == ["", ""]
+
+
+def test_lazy_imports():
+    """
+    Test the client imports the export, fan out and local index modules only when
+    they are used.
+    """
+    modules = ("export", "fanout", "localindex")
+    script = (
+        "import sys, ml_akn_client.ml_akn_client; "
+        f"print(*('ml_akn_client.' + m in sys.modules for m in {modules!r}))"
+    )
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+    out = subprocess.run(
+        [sys.executable, "-c", script], env=env, capture_output=True, text=True
+    )
+    assert out.stdout.split() == ["False", "False", "False"]
@@ -0,0 +1,302 @@
+"""
+Test the idempotent module deployment
+"""
+
+import json
+import secrets
+from urllib.parse import parse_qs
+
+import pytest
+from ml_akn_client import cli, deploy
+from ml_akn_client.server import marklogic as ml
+
+HOST = "http://localhost:8000"
+ADMIN = "http://localhost:8002"
+MULTIPART = b"--b\r\nContent-Type: application/xml\r\n\r\n<summaries/>\r\n--b--"
+CONFIG = """<database-properties xmlns="http://marklogic.com/manage">
+  <stemmed-searches>basic</stemmed-searches>
+  <range-element-indexes>
+    <range-element-index>
+      <scalar-type>string</scalar-type>
+      <localname>court cite</localname>
+      <collation/>
+    </range-element-index>
+  </range-element-indexes>
+</database-properties>"""
+
+
+@pytest.fixture
+def modules(tmp_path):
+    """
+    Returns a modules directory holding two modules and a database configuration.
+    """
+    (tmp_path / "summaries-lib.xqy").write_text("module namespace lib = 'lib';")
+    (tmp_path / "summaries.xqy").write_text("xquery version '1.0-ml'; 1")
+    (tmp_path / "helloworld.xqy").write_text("'hello'")
+    (tmp_path / "indexes.xml").write_text(CONFIG)
+    return tmp_path
+
+
+@pytest.fixture
+def server(requests_mock):
+    """
+    Mocks the REST and management endpoints, keeping the manifest document and
+    database properties in the returned dict.
+    """
+    store = {"properties": CONFIG}
+
+    def get_manifest(request, context):
+        if "manifest" not in store:
+            context.status_code = 404
+            return ""
+        return json.dumps(store["manifest"])
+
+    def put_manifest(request, context):
+        store["manifest"] = json.loads(request.text)
+        return ""
+
+    requests_mock.get(f"{HOST}/v1/documents", text=get_manifest)
+    requests_mock.put(f"{HOST}/v1/documents", text=put_manifest)
+    requests_mock.put(f"{HOST}/v1/ext/summaries-lib.xqy", status_code=204)
+    requests_mock.put(f"{HOST}/v1/ext/summaries.xqy", status_code=204)
+
+    def put_properties(request, context):
+        store["properties"] = request.text
+        context.status_code = 204
+        return ""
+
+    properties = f"{ADMIN}/manage/v2/databases/Documents/properties"
+    requests_mock.get(properties, text=lambda request, context: store["properties"])
+    requests_mock.put(properties, text=put_properties)
+    requests_mock.post(
+        f"{HOST}/LATEST/invoke",
+        content=MULTIPART,
+        headers={"Content-Type": "multipart/mixed; boundary=b"},
+    )
+    return store
+
+
+@pytest.fixture
+def http_client():
+    return ml.MarkLogicHTTPClient(username="admin", password=secrets.token_urlsafe(10))
+
+
+def uploads(requests_mock):
+    """
+    uploads returns the names of the modules uploaded.
+    """
+    return sorted(
+        r.path.rpartition("/")[2]
+        for r in requests_mock.request_history
+        if r.method == "PUT" and "/v1/ext/" in r.path
+    )
+
+
+def test_module_hashes(modules):
+    """
+    Test hashes cover every module other than the excluded ones.
+    """
+    hashes = deploy.module_hashes(modules)
+    assert list(hashes) == ["summaries-lib.xqy", "summaries.xqy"]
+    assert all(len(h) == 64 for h in hashes.values())
+    with pytest.raises(deploy.DeployException):
+        deploy.module_hashes(str(modules / "missing"))
+
+
+def test_shipped_modules():
+    """
+    Test the modules and database configuration are shipped with the package, and
+    the cache self-test is shipped but not deployed.
+    """
+    hashes = deploy.module_hashes()
+    assert set(deploy.SMOKE_QUERIES) <= set(hashes)
+    assert "summaries-lib.xqy" in hashes
+    assert deploy.CACHE_SELF_TEST not in hashes
+    assert (deploy.MODULES_DIR / deploy.CACHE_SELF_TEST).is_file()
+    assert (deploy.MODULES_DIR / deploy.DATABASE_CONFIG).is_file()
+
+
+def test_config_drift():
+    """
+    Test drift is reported for settings and indexes the server does not match,
+    ignoring settings and indexes only the server has.
+    """
+    server = CONFIG.replace(
+        "<stemmed-searches>basic</stemmed-searches>",
+        "<stemmed-searches>basic</stemmed-searches><word-positions>true"
+        "</word-positions>",
+    ).replace(
+        "<collation/>",
+        "<collation></collation><invalid-values>reject</invalid-values>",
+    )
+    assert deploy.config_drift(CONFIG.encode(), server.encode()) == []
+    drifted = server.replace("basic", "off").replace("court cite", "court")
+    assert deploy.config_drift(CONFIG.encode(), drifted.encode()) == [
+        "stemmed-searches",
+        "range-element-indexes",
+    ]
+    missing = '<database-properties xmlns="http://marklogic.com/manage"/>'
+    assert len(deploy.config_drift(CONFIG.encode(), missing.encode())) == 2
+    with pytest.raises(deploy.DeployException):
+        deploy.config_drift(CONFIG.encode(), b"<unclosed>")
+
+
+def test_merge_config():
+    """
+    Test applying the configuration keeps the indexes only the server has, and
+    replaces those it defines, identified by their names rather than settings.
+    """
+    server = CONFIG.replace(
+        "</range-element-index>",
+        "</range-element-index><range-element-index><scalar-type>int</scalar-type>"
+        "<localname>year</localname><collation/></range-element-index>",
+    ).replace("<localname>court cite</localname>", "<localname>cite court</localname>")
+    server = server.replace("<scalar-type>string", "<scalar-type>token")
+    merged = deploy.merge_config(CONFIG.encode(), server.encode())
+    assert deploy.config_drift(CONFIG.encode(), merged) == []
+    assert deploy.config_drift(server.encode(), merged) == ["range-element-indexes"]
+    assert merged.count(b"<range-element-index>") == 2
+    assert b"<localname>year</localname>" in merged
+    assert b"token" not in merged
+    assert b"ns0:" not in merged
+
+
+def test_deploy_keeps_server_indexes(modules, server, http_client):
+    """
+    Test a deployment applying the configuration does not remove indexes the
+    server has which the configuration does not define.
+    """
+    extra = (
+        "<range-element-index><scalar-type>int</scalar-type>"
+        "<localname>year</localname><collation/></range-element-index>"
+    )
+    server["properties"] = CONFIG.replace(
+        "</range-element-indexes>", extra + "</range-element-indexes>"
+    )
+    assert deploy.deploy(http_client, modules, smoke=False).config_applied
+    assert "<localname>year</localname>" in server["properties"]
+    assert "<localname>court cite</localname>" in server["properties"]
+
+
+def test_admin_hostpath(http_client):
+    """
+    Test the management API is addressed on the admin port of the first host,
+    including IPv6 hosts.
+    """
+    assert deploy.Deployer(http_client).admin_hostpath == "http://localhost:8002"
+    http_client = ml.MarkLogicHTTPClient(
+        hosts=["[::1]:8000"], username="admin", password=secrets.token_urlsafe(10)
+    )
+    assert deploy.Deployer(http_client).admin_hostpath == "http://[::1]:8002"
+    with pytest.raises(deploy.DeployException):
+        deploy.Deployer(http_client, admin_port=0)
+
+
+def test_deploy_only_changed(modules, server, http_client, requests_mock):
+    """
+    Test a deployment uploads only modules changed since the last deployment, and
+    applies the database configuration only when it changes.
+    """
+    report = deploy.deploy(http_client, modules)
+    assert report.uploaded == ["summaries-lib.xqy", "summaries.xqy"]
+    assert report.config_applied
+    assert report.ok
+    assert list(report.smoke) == ["summaries.xqy"]
+    assert server["manifest"]["modules"] == deploy.module_hashes(modules)
+    assert uploads(requests_mock) == ["summaries-lib.xqy", "summaries.xqy"]
+    body = requests_mock.request_history[2]
+    assert body.headers["Content-Type"] == "application/xquery"
+
+    requests_mock.reset_mock()
+    report = deploy.deploy(http_client, modules, smoke=False)
+    assert report.uploaded == []
+    assert report.unchanged == ["summaries-lib.xqy", "summaries.xqy"]
+    assert not report.config_applied
+    assert report.smoke == {}
+    assert [r.method for r in requests_mock.request_history] == ["GET", "GET"]
+
+    (modules / "summaries.xqy").write_text("xquery version '1.0-ml'; 2")
+    requests_mock.reset_mock()
+    report = deploy.deploy(http_client, modules)
+    assert uploads(requests_mock) == ["summaries.xqy"]
+    assert not report.config_applied
+
+    requests_mock.reset_mock()
+    report = deploy.deploy(http_client, modules, force=True, smoke=False)
+    assert uploads(requests_mock) == ["summaries-lib.xqy", "summaries.xqy"]
+    assert report.config_applied
+
+
+def test_deploy_corrects_drift(modules, server, http_client):
+    """
+    Test the database configuration is reapplied when the server has drifted from
+    it, although the file is unchanged since the last deployment.
+    """
+    assert deploy.deploy(http_client, modules, smoke=False).config_applied
+    server["properties"] = CONFIG.replace("basic", "off")
+    report = deploy.deploy(http_client, modules, smoke=False)
+    assert report.config_applied
+    assert report.config_drift == ("stemmed-searches",)
+    assert "server drifted: stemmed-searches" in report.format()
+    assert deploy.config_drift(CONFIG.encode(), server["properties"].encode()) == []
+    assert not deploy.deploy(http_client, modules, smoke=False).config_applied
+
+
+def test_deploy_partial_failure(modules, server, http_client, requests_mock):
+    """
+    Test a failed upload fails the deployment but successful uploads are recorded.
+    """
+    requests_mock.put(f"{HOST}/v1/ext/summaries.xqy", status_code=500)
+    with pytest.raises(deploy.DeployException, match="summaries.xqy"):
+        deploy.deploy(http_client, modules)
+    assert list(server["manifest"]["modules"]) == ["summaries-lib.xqy"]
+
+
+def test_deploy_smoke_failure(modules, server, http_client, requests_mock):
+    """
+    Test a failing smoke query is reported.
+    """
+    requests_mock.post(f"{HOST}/LATEST/invoke", status_code=500)
+    report = deploy.deploy(http_client, modules)
+    assert not report.ok
+    assert "500" in report.smoke["summaries.xqy"].error
+    assert "FAILED" in report.format()
+
+
+def test_cli_deploy(modules, server, monkeypatch, capsys):
+    """
+    Test the deploy command.
+    """
+    monkeypatch.setenv("ML_USERNAME", "admin")
+    monkeypatch.setenv("ML_PASSWORD", "not-admin")
+    for name in ("ML_HOSTS", "ML_HOST", "ML_PORT", "ML_ADMIN_PORT"):
+        monkeypatch.delenv(name, raising=False)
+    assert cli.main(["deploy", "--modules-dir", str(modules)]) == 0
+    out = capsys.readouterr().out
+    assert "uploaded 2 modules" in out
+    assert "smoke summaries.xqy" in out
+
+
+def test_cache_self_test(http_client, requests_mock, monkeypatch, capsys):
+    """
+    Test the cache self-test is evaluated on request, without being installed.
+    """
+    requests_mock.post(
+        f"{HOST}/v1/eval",
+        content=MULTIPART,
+        headers={"Content-Type": "multipart/mixed; boundary=b"},
+    )
+    result = deploy.cache_self_test(http_client, collection="uksc")
+    assert result.error is None
+    form = parse_qs(requests_mock.last_request.text)
+    assert "cache:generation" in form["xquery"][0]
+    assert json.loads(form["vars"][0]) == {"collection": "uksc"}
+    assert all(r.method == "POST" for r in requests_mock.request_history)
+
+    monkeypatch.setenv("ML_USERNAME", "admin")
+    monkeypatch.setenv("ML_PASSWORD", "not-admin")
+    for name in ("ML_HOSTS", "ML_HOST", "ML_PORT"):
+        monkeypatch.delenv(name, raising=False)
+    requests_mock.post(f"{HOST}/v1/eval", status_code=500)
+    assert cli.main(["cache-test"]) == 1
+    assert "FAILED" in capsys.readouterr().out
@@ -0,0 +1,215 @@
+"""
+Test the streaming summaries export
+"""
+
+import csv
+import json
+import secrets
+from datetime import date
+from urllib.parse import parse_qs
+
+import pytest
+from ml_akn_client import export
+from ml_akn_client import ml_akn_client as cl
+from ml_akn_client.models.summaries import PageSummary, SummariesPage
+from ml_akn_client.server import marklogic as ml
+
+
+def make_pages(n_pages, per_page):
+    """
+    make_pages returns a dict of SummariesPage keyed by the cursor used to fetch each.
+    """
+    pages = {}
+    cursor = ""
+    for p in range(n_pages):
+        summaries = [
+            PageSummary(
+                uri=f"/documents/doc_{p:02d}_{i:02d}.xml",
+                name=f'Case {p}.{i}, "quoted" & comma',
+                judgment_date=date(2020, 1, 1 + i),
+                court="EWCA-Civil",
+                citation=f"[2020] EWCA Civ {p * per_page + i}",
+            )
+            for i in range(per_page)
+        ]
+        last = p == n_pages - 1
+        pages[cursor] = SummariesPage(
+            next=None if last else summaries[-1].uri, summaries=summaries
+        )
+        cursor = summaries[-1].uri
+    return pages
+
+
+class Fetcher:
+    """
+    Fetcher serves pages by cursor, optionally failing on a given call.
+    """
+
+    def __init__(self, pages, fail_on=None):
+        self.pages = pages
+        self.fail_on = fail_on
+        self.calls = []
+
+    def __call__(self, after):
+        self.calls.append(after)
+        if self.fail_on is not None and len(self.calls) == self.fail_on:
+            raise cl.ClientException("server went away")
+        return self.pages[after]
+
+
+def test_export_ndjson(tmp_path):
+    """
+    Test a NDJSON export writes one line per summary and removes its state file.
+    """
+    path = tmp_path / "out.ndjson"
+    progress = []
+    result = export.export_summaries(
+        Fetcher(make_pages(3, 4)), path, progress=lambda r, s: progress.append(r)
+    )
+    assert result.rows == result.total_rows == 12
+    assert progress == [4, 8, 12]
+    lines = path.read_text().splitlines()
+    assert len(lines) == 12
+    first = json.loads(lines[0])
+    assert list(first) == list(export.EXPORT_FIELDS)
+    assert first["judgment_date"] == "2020-01-01"
+    assert not export.state_path(path).exists()
+
+
+def test_export_csv(tmp_path):
+    """
+    Test a CSV export has a header and quotes awkward values.
+    """
+    path = tmp_path / "out.csv"
+    export.export_summaries(Fetcher(make_pages(2, 3)), path, format="csv")
+    with open(path, newline="") as f:
+        rows = list(csv.reader(f))
+    assert rows[0] == list(export.EXPORT_FIELDS)
+    assert len(rows) == 7
+    assert rows[1][1] == 'Case 0.0, "quoted" & comma'
+
+
+def test_export_empty(tmp_path):
+    """
+    Test exporting an empty collection.
+    """
+    path = tmp_path / "out.ndjson"
+    result = export.export_summaries(Fetcher({"": SummariesPage()}), path)
+    assert result.rows == 0
+    assert path.read_text() == ""
+
+
+@pytest.mark.parametrize("format", ["ndjson", "csv"])
+def test_export_resume(tmp_path, format):
+    """
+    Test an interrupted export resumes from its checkpoint without duplicating rows.
+    """
+    pages = make_pages(4, 5)
+    path = tmp_path / f"out.{format}"
+    with pytest.raises(cl.ClientException):
+        export.export_summaries(Fetcher(pages, fail_on=3), path, format=format)
+    assert export.state_path(path).exists()
+
+    # simulate a partial write after the last checkpoint
+    with open(path, "ab") as f:
+        f.write(b"partial line")
+
+    fetcher = Fetcher(pages)
+    result = export.export_summaries(fetcher, path, format=format, resume=True)
+    assert fetcher.calls[0] == list(pages)[2]
+    assert result.rows == 10
+    assert result.total_rows == 20
+    lines = path.read_text().splitlines()
+    uris = [ln for ln in lines if "/documents/" in ln]
+    assert len(uris) == 20
+    assert len(set(uris)) == 20
+    assert "partial line" not in path.read_text()
+
+
+def test_export_fresh_discards_state(tmp_path):
+    """
+    Test a fresh export discards the checkpoint of an earlier one, so a later resume
+    starts again rather than truncating to the earlier offset, and that a resume
+    refuses an output shorter than its checkpoint.
+    """
+    pages = make_pages(4, 5)
+    path = tmp_path / "out.ndjson"
+    with pytest.raises(cl.ClientException):
+        export.export_summaries(Fetcher(pages, fail_on=3), path)
+    with pytest.raises(cl.ClientException):
+        export.export_summaries(Fetcher(pages, fail_on=1), path)
+    assert not export.state_path(path).exists()
+
+    result = export.export_summaries(Fetcher(pages), path, resume=True)
+    assert result.total_rows == 20
+    assert b"\0" not in path.read_bytes()
+    assert len(path.read_text().splitlines()) == 20
+
+    with pytest.raises(cl.ClientException):
+        export.export_summaries(Fetcher(pages, fail_on=3), path)
+    path.write_bytes(b"")
+    with pytest.raises(export.ExportException, match="shorter than its checkpoint"):
+        export.export_summaries(Fetcher(pages), path, resume=True)
+
+
+def test_export_resume_format_mismatch(tmp_path):
+    """
+    Test an export cannot be resumed in a different format.
+    """
+    path = tmp_path / "out"
+    with pytest.raises(cl.ClientException):
+        export.export_summaries(Fetcher(make_pages(3, 2), fail_on=2), path)
+    with pytest.raises(export.ExportException, match="cannot resume"):
+        export.export_summaries(
+            Fetcher(make_pages(3, 2)), path, format="csv", resume=True
+        )
+
+
+def test_export_parquet_resume(tmp_path, monkeypatch):
+    """
+    Test a Parquet export writes part files and resumes from the last closed part.
+    """
+    pq = pytest.importorskip("pyarrow.parquet")
+    monkeypatch.setattr(export, "PARQUET_PAGES_PER_PART", 2)
+    pages = make_pages(5, 3)
+    path = tmp_path / "out"
+    with pytest.raises(cl.ClientException):
+        export.export_summaries(Fetcher(pages, fail_on=4), path, format="parquet")
+
+    result = export.export_summaries(
+        Fetcher(pages), path, format="parquet", resume=True
+    )
+    assert result.rows == 9
+    assert result.total_rows == 15
+    assert sorted(p.name for p in path.iterdir()) == [
+        "part-00000.parquet",
+        "part-00001.parquet",
+        "part-00002.parquet",
+    ]
+    table = pq.read_table(path)
+    assert table.num_rows == 15
+    assert len(set(table.column("uri").to_pylist())) == 15
+    assert table.column("judgment_date").to_pylist()[0] == date(2020, 1, 1)
+
+
+def test_client_export(tmp_path, requests_mock):
+    """
+    Test CaseLawClient.export pages through export.xqy using the cursor.
+    """
+    pages = make_pages(3, 2)
+
+    def respond(request, context):
+        after = json.loads(parse_qs(request.text)["vars"][0])["after"]
+        context.headers["Content-Type"] = "multipart/mixed; boundary=b"
+        xml = pages[after].to_xml()
+        return b"--b\r\nContent-Type: application/xml\r\n\r\n" + xml + b"\r\n--b--"
+
+    requests_mock.post("http://localhost:8000/LATEST/invoke", content=respond)
+    http_client = ml.MarkLogicHTTPClient(
+        username="admin", password=secrets.token_urlsafe(10)
+    )
+    path = tmp_path / "out.ndjson"
+    result = cl.CaseLawClient(http_client).export(path, page_size=2)
+    assert result.total_rows == 6
+    assert len(requests_mock.request_history) == 3
+    assert len(path.read_text().splitlines()) == 6
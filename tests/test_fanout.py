@@ -0,0 +1,176 @@
+"""
+Test fan out across collections and the merging of sorted results
+"""
+
+import json
+import secrets
+from datetime import date
+from urllib.parse import parse_qs
+
+import pytest
+from ml_akn_client import fanout
+from ml_akn_client import ml_akn_client as cl
+from ml_akn_client.ml_akn_client import ClientException
+from ml_akn_client.models.summaries import Summary
+from ml_akn_client.server import marklogic as ml
+
+# the summaries held by each mocked collection, already sorted by date descending
+COLLECTIONS = {
+    "ewca": [
+        ("/documents/ewca_2.xml", "Barrow v Kazim", "2018-10-31"),
+        ("/documents/ewca_1.xml", "Rama v Ukraine", "2018-03-02"),
+    ],
+    "uksc": [
+        ("/documents/uksc_1.xml", "Khan v Khan", "2019-01-15"),
+        ("/documents/ewca_1.xml", "Rama v Ukraine", "2018-03-02"),
+        ("/documents/uksc_0.xml", "Ali v Ali", "2017-07-07"),
+    ],
+}
+
+
+def summary(uri, name=None, judgment_date=None):
+    """
+    summary returns a Summary of @uri.
+    """
+    return Summary(uri=uri, name=name, judgment_date=judgment_date)
+
+
+@pytest.fixture
+def client(requests_mock):
+    """
+    Provides a CaseLawClient for localhost whose modules answer from COLLECTIONS,
+    honouring the collection, sort_direction and limit vars.
+    """
+
+    def respond(request, context):
+        args = json.loads(parse_qs(request.text)["vars"][0])
+        rows = COLLECTIONS[args["collection"]]
+        if args["sort_direction"] == "asc":
+            rows = rows[::-1]
+        rows = rows[: int(args["limit"]) or None]
+        xml = "".join(
+            f"<summary><uri>{uri}</uri><name>{name}</name>"
+            f"<judgmentDate>{day}</judgmentDate></summary>"
+            for uri, name, day in rows
+        )
+        context.headers["Content-Type"] = "multipart/mixed; boundary=b"
+        return (
+            f"--b\r\nContent-Type: application/xml\r\n\r\n<summaries>{xml}</summaries>\r\n--b--"
+        ).encode()
+
+    requests_mock.post("http://localhost:8000/LATEST/invoke", content=respond)
+    http_client = ml.MarkLogicHTTPClient(
+        username="admin", password=secrets.token_urlsafe(10)
+    )
+    return cl.CaseLawClient(http_client)
+
+
+@pytest.mark.parametrize(
+    "sort_direction,expected",
+    [
+        ("asc", ["/a", "/b", "/c", "/d"]),
+        ("desc", ["/d", "/c", "/b", "/a"]),
+    ],
+)
+def test_merge_sorted(sort_direction, expected):
+    """
+    Test merge_sorted merges sorted listings in either direction.
+    """
+    days = {"/a": 1, "/b": 2, "/c": 3, "/d": 4}
+    listings = [
+        [summary(u, judgment_date=date(2020, 1, days[u])) for u in uris]
+        for uris in (["/a", "/c"], ["/b", "/d"])
+    ]
+    if sort_direction == "desc":
+        listings = [list(reversed(listing)) for listing in listings]
+    merged = fanout.merge_sorted(listings, "date", sort_direction)
+    assert [s.uri for s in merged] == expected
+
+
+def test_merge_sorted_limit_and_duplicates():
+    """
+    Test merge_sorted returns a document once and stops at the limit.
+    """
+    listings = [
+        [summary("/a", "alpha"), summary("/b", "Beta")],
+        [summary("/b", "Beta"), summary("/c", "gamma"), summary("/d", "delta")],
+    ]
+    merged = fanout.merge_sorted(listings, "name", "asc", limit=3)
+    assert [s.uri for s in merged] == ["/a", "/b", "/c"]
+
+
+def test_sort_key():
+    """
+    Test strings sort without regard to case or diacritics and missing values sort
+    first.
+    """
+    key = fanout.sort_key("name")
+    names = [summary("/1", "zeta"), summary("/2", "Éclair"), summary("/3", "apple")]
+    names.append(summary("/4"))
+    assert [s.uri for s in sorted(names, key=key)] == ["/4", "/3", "/2", "/1"]
+
+
+def test_fan_out_summaries(client, requests_mock):
+    """
+    Test fan_out_summaries queries each collection with the limit and merges the
+    results by date, listing shared documents once.
+    """
+    result = client.fan_out_summaries(
+        ["ewca", "uksc"], sort_by="date", sort_direction="desc", limit=3
+    )
+    assert [s.uri for s in result.summaries] == [
+        "/documents/uksc_1.xml",
+        "/documents/ewca_2.xml",
+        "/documents/ewca_1.xml",
+    ]
+    sent = [
+        json.loads(parse_qs(r.text)["vars"][0]) for r in requests_mock.request_history
+    ]
+    assert sorted(v["collection"] for v in sent) == ["ewca", "uksc"]
+    assert {v["limit"] for v in sent} == {"3"}
+
+
+def test_fan_out_search_projection(client):
+    """
+    Test fan_out_search requests the sort field to merge on, but does not return it
+    if it was not selected.
+    """
+    result = client.fan_out_search(
+        "v", ["ewca", "uksc"], sort_by="date", sort_direction="asc", fields=("name",)
+    )
+    assert [s.name for s in result.summaries] == [
+        "Ali v Ali",
+        "Rama v Ukraine",
+        "Barrow v Kazim",
+        "Khan v Khan",
+    ]
+    assert all(s.judgment_date is None for s in result.summaries)
+
+
+def test_fan_out_search_beyond_page(client, requests_mock, monkeypatch):
+    """
+    Test fan_out_search asks each collection for the whole limit, not a page of 10
+    results, and merges more than 10 of them.
+    """
+    for name, first in (("ewhc", 1), ("ukut", 2)):
+        rows = [
+            (f"/documents/{name}_{day}.xml", f"Case {day}", f"2020-01-{day:02d}")
+            for day in range(first, 25, 2)
+        ]
+        monkeypatch.setitem(COLLECTIONS, name, rows[::-1])
+    result = client.fan_out_search(
+        "case", ["ewhc", "ukut"], sort_by="date", sort_direction="desc", limit=15
+    )
+    assert [s.judgment_date.day for s in result.summaries] == list(range(24, 9, -1))
+    sent = [
+        json.loads(parse_qs(r.text)["vars"][0]) for r in requests_mock.request_history
+    ]
+    assert {v["limit"] for v in sent} == {"15"}
+
+
+def test_fan_out_no_collections(client):
+    """
+    Test fan out without collections raises ClientException.
+    """
+    with pytest.raises(ClientException):
+        client.fan_out_summaries([])
@@ -0,0 +1,199 @@
+"""
+Test balancing and health checking across several MarkLogic (ML/ml) hosts
+"""
+
+import pytest
+from ml_akn_client.server import hosts
+from ml_akn_client.server import marklogic as ml
+from pytest_httpserver import HTTPServer
+import secrets
+import socket
+
+MULTIPART_OK = (
+    b"--boundary\r\nContent-Type: application/xml\r\n\r\n<ok/>\r\n--boundary--"
+)
+MULTIPART_TYPE = "multipart/mixed; boundary=boundary"
+
+
+@pytest.fixture
+def random_password():
+    """
+    Provides a random string to be used as a password.
+    """
+    return secrets.token_urlsafe(10)
+
+
+@pytest.fixture
+def servers():
+    """
+    Provides three local stand-in MarkLogic servers.
+    """
+    started = [HTTPServer() for _ in range(3)]
+    for s in started:
+        s.start()
+    yield started
+    for s in started:
+        s.clear()
+        s.stop()
+
+
+def client_for(servers, password, **kwargs):
+    """
+    client_for returns a MarkLogicHTTPClient addressing each server in servers.
+    """
+    return ml.MarkLogicHTTPClient(
+        username="admin",
+        password=password,
+        hosts=[f"{s.host}:{s.port}" for s in servers],
+        **kwargs,
+    )
+
+
+def test_hosts_init(random_password):
+    """
+    Test hosts are parsed, the first host providing hostpath.
+    """
+    client = ml.MarkLogicHTTPClient(
+        username="admin", password=random_password, hosts=["node1", "node2:8010"]
+    )
+    assert client.hostpath == "http://node1:8000"
+    assert client.hostpaths == ["http://node1:8000", "http://node2:8010"]
+
+
+def test_hosts_init_ipv6(random_password):
+    """
+    Test bracketed IPv6 hosts keep their brackets, with or without a port.
+    """
+    client = ml.MarkLogicHTTPClient(
+        username="admin", password=random_password, hosts=["[::1]", "[fe80::2]:8010"]
+    )
+    assert client.hostpaths == ["http://[::1]:8000", "http://[fe80::2]:8010"]
+
+
+@pytest.mark.parametrize(
+    "client_kwargs",
+    [
+        {"hosts": []},
+        {"hosts": ["node1", "node2:79"]},
+        {"hosts": ["node1:http"]},
+        {"hosts": ["::1"]},
+        {"balancing": "random"},
+        {"health_check_interval": 0},
+    ],
+    ids=[
+        "empty hosts",
+        "low port",
+        "bad port",
+        "unbracketed ipv6",
+        "bad balancing",
+        "bad interval",
+    ],
+)
+def test_hosts_init_failures(random_password, client_kwargs):
+    """
+    Test misconfigured host lists are rejected.
+    """
+    with pytest.raises(ml.MisconfigurationException):
+        ml.MarkLogicHTTPClient(
+            username="admin", password=random_password, **client_kwargs
+        )
+
+
+def test_round_robin(servers, random_password):
+    """
+    Test round-robin sends an equal share of requests to each server.
+    """
+    for s in servers:
+        s.expect_request("/LATEST/invoke", method="POST").respond_with_data(
+            MULTIPART_OK, content_type=MULTIPART_TYPE
+        )
+    client = client_for(servers, random_password)
+    for _ in range(6):
+        assert client._post_to_module("test.xqy", {}) == b"<ok/>"
+    assert [len(s.log) for s in servers] == [2, 2, 2]
+    client.close()
+
+
+def test_least_outstanding():
+    """
+    Test least-outstanding avoids endpoints with requests in flight.
+    """
+    pool = hosts.HostPool(["http://a:8000", "http://b:8000"], "least-outstanding")
+    first = pool.acquire()
+    second = pool.acquire()
+    assert first is not second
+    pool.release(first, ok=True)
+    assert pool.acquire() is first
+
+
+def test_eject_and_readmit():
+    """
+    Test an endpoint is ejected after max_failures and readmitted by a probe.
+    """
+    pool = hosts.HostPool(["http://a:8000", "http://b:8000"], max_failures=2)
+    a, b = pool.endpoints
+    for _ in range(2):
+        pool.acquire()  # keep the counter moving
+        pool.release(a, ok=False)
+    assert not a.healthy
+    assert pool.available() == [b]
+    assert all(pool.acquire() is b for _ in range(4))
+
+    pool.probe(lambda e: True)
+    assert a.healthy
+    assert pool.available() == [a, b]
+
+
+def test_fail_open():
+    """
+    Test that with every endpoint ejected all endpoints remain selectable.
+    """
+    pool = hosts.HostPool(["http://a:8000", "http://b:8000"], max_failures=1)
+    pool.probe(lambda e: False)
+    assert not any(e.healthy for e in pool.endpoints)
+    assert pool.available() == pool.endpoints
+
+
+def test_failover(servers, random_password):
+    """
+    Test a request fails over to a live server when a host refuses connections.
+    """
+    live = servers[0]
+    live.expect_request("/LATEST/invoke", method="POST").respond_with_data(
+        MULTIPART_OK, content_type=MULTIPART_TYPE
+    )
+    # find a port with nothing listening so that connections are refused
+    with socket.socket() as sock:
+        sock.bind(("localhost", 0))
+        dead_port = sock.getsockname()[1]
+    client = ml.MarkLogicHTTPClient(
+        username="admin",
+        password=random_password,
+        hosts=[f"{live.host}:{live.port}", f"localhost:{dead_port}"],
+    )
+    for _ in range(6):
+        assert client._post_to_module("test.xqy", {}) == b"<ok/>"
+    assert len(live.log) == 6
+    dead = client.pool.endpoints[1]
+    assert not dead.healthy
+    client.close()
+
+
+def test_health_check(servers, random_password):
+    """
+    Test check_health ejects a server returning errors and readmits it on recovery.
+    """
+    servers[0].expect_request("/LATEST/ping").respond_with_data("", status=204)
+    servers[1].expect_request("/LATEST/ping").respond_with_data("", status=503)
+    client = client_for(servers[:2], random_password)
+    for _ in range(hosts.HOST_MAX_FAILURES):
+        client.check_health()
+    good, bad = client.pool.endpoints
+    assert good.healthy
+    assert not bad.healthy
+
+    servers[1].clear()
+    servers[1].expect_request("/LATEST/ping").respond_with_data("", status=204)
+    client.check_health()
+    assert bad.healthy
+    client.close()
@@ -0,0 +1,223 @@
+"""
+Test the load generation harness
+"""
+
+import math
+import random
+
+import pytest
+from ml_akn_client import loadgen
+from ml_akn_client import ml_akn_client as cl
+
+
+def test_histogram_percentiles():
+    """
+    Test histogram percentiles are within the bucket precision of the exact values.
+    """
+    rnd = random.Random(1)
+    values = sorted(rnd.lognormvariate(-5, 1) for _ in range(10000))
+    hist = loadgen.LatencyHistogram()
+    for v in values:
+        hist.record(v)
+    assert hist.total == 10000
+    for p in (50, 90, 99, 99.9):
+        exact = values[int(p / 100 * len(values)) - 1]
+        assert hist.percentile(p) == pytest.approx(exact, rel=2**-6)
+    assert hist.percentile(100) == pytest.approx(values[-1], abs=1e-6)
+    assert len(hist.counts) < 1000
+
+
+def test_histogram_distribution():
+    """
+    Test the percentile distribution ends at the maximum value.
+    """
+    hist = loadgen.LatencyHistogram()
+    assert hist.percentile(99) == 0
+    for ms in range(1, 101):
+        hist.record(ms / 1000)
+    lines = hist.percentile_distribution().splitlines()
+    assert lines[0].split()[0] == "Value(ms)"
+    assert float(lines[1].split()[0]) == pytest.approx(1, rel=0.01)
+    assert lines[-1].split()[:3] == ["100.000", "1.000000000000", "100"]
+
+
+def test_histogram_merge():
+    """
+    Test merging histograms.
+    """
+    a, b = loadgen.LatencyHistogram(), loadgen.LatencyHistogram()
+    a.record(0.001)
+    b.record(0.002)
+    a.merge(b)
+    assert a.total == 2
+    assert a.max == 2000
+    with pytest.raises(ValueError):
+        a.merge(loadgen.LatencyHistogram(sub_bucket_bits=4))
+
+
+class FakeClock:
+    """
+    FakeClock is a clock that only moves when slept on.
+    """
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def test_schedule():
+    """
+    Test evenly spaced arrivals are whole ticks, and have the length of the run.
+    """
+    arrivals = list(loadgen.schedule(500, 0.2, {"summaries": 1}, poisson=False))
+    assert len(arrivals) == 100
+    assert [a.offset for a in arrivals] == [i / 500 for i in range(100)]
+    assert {a.operation for a in arrivals} == {"summaries"}
+    for rate, duration in ((3, 0.1), (10, 0.3), (7, 1), (1000, 2.5)):
+        arrivals = list(loadgen.schedule(rate, duration, {"a": 1}, poisson=False))
+        assert len(arrivals) == math.ceil(round(rate * duration, 9))
+
+    mix = {"summaries": 3, "search": 1}
+    arrivals = list(loadgen.schedule(1000, 10, mix, seed=1))
+    assert arrivals == list(loadgen.schedule(1000, 10, mix, seed=1))
+    assert len(arrivals) == pytest.approx(10000, rel=0.05)
+    assert all(0 <= a.offset < 10 for a in arrivals)
+    searches = sum(a.operation == "search" for a in arrivals)
+    assert searches / len(arrivals) == pytest.approx(0.25, abs=0.02)
+
+
+def test_run_load_mix():
+    """
+    Test run_load follows the schedule and request mix, records latency from the
+    scheduled time and records failures.
+    """
+    calls = []
+    clock = FakeClock()
+
+    class Client:
+        def get_summaries(self):
+            calls.append("summaries")
+
+        def search(self, query):
+            calls.append(query)
+            raise cl.ClientException("no")
+
+    report = loadgen.run_load(
+        Client(),
+        rate=500,
+        duration=0.2,
+        mix={"summaries": 1},
+        poisson=False,
+        seed=1,
+        clock=clock,
+        sleep=clock.sleep,
+        concurrency=1,
+    )
+    schedule = list(loadgen.schedule(500, 0.2, {"summaries": 1}, poisson=False))
+    assert report.requests == len(schedule)
+    assert calls == ["summaries"] * len(schedule)
+    assert report.latency["all"].total == len(schedule)
+    assert sum(clock.sleeps) == pytest.approx(schedule[-1].offset)
+    assert report.seconds == pytest.approx(schedule[-1].offset)
+    assert not report.errors
+    assert report.rss_samples
+
+    clock = FakeClock()
+    report = loadgen.run_load(
+        Client(),
+        rate=500,
+        duration=0.1,
+        mix={"search": 1},
+        clock=clock,
+        sleep=clock.sleep,
+    )
+    assert report.errors["ClientException"] == report.requests
+    assert report.error_rate == 1
+    with pytest.raises(ValueError, match="unknown operations"):
+        loadgen.run_load(Client(), rate=1, duration=1, mix={"delete": 1})
+
+
+def test_run_load_latency():
+    """
+    Test latency is measured from the scheduled time, so that a slow call delays
+    the calls behind it without hiding their wait.
+    """
+    clock = FakeClock()
+
+    class Client:
+        def get_summaries(self):
+            clock.now += 0.025  # each call takes 2.5 ticks of the schedule
+
+    report = loadgen.run_load(
+        Client(),
+        rate=100,
+        duration=0.04,
+        mix={"summaries": 1},
+        poisson=False,
+        concurrency=1,
+        clock=clock,
+        sleep=lambda seconds: None,
+    )
+    hist = report.latency["summaries"]
+    assert hist.total == 4
+    assert hist.max == pytest.approx(4 * 25_000 - 30_000, abs=1)
+
+
+def test_stand_in_responder():
+    """
+    Test the stand-in answers after the injected latency and fails the injected
+    fraction of requests, reproducibly for a seed.
+    """
+    pauses = []
+    responder = loadgen.StandInResponder(
+        latency=0.005, jitter=0.001, size=3, sleep=pauses.append
+    )
+    status, content_type, body = responder.respond("/ext/search.xqy", "a")
+    assert status == 200
+    assert content_type.startswith("multipart/mixed")
+    assert body.count(b"<summary>") == 3
+    assert b"<snippets>" in body
+    assert responder.respond("/ext/delete.xqy", "b")[0] == 404
+    assert all(0.005 <= p <= 0.006 for p in pauses)
+    assert len(pauses) == 2
+    assert responder.stats() == {"requests": 2, "connections": 2}
+
+    def statuses(failure_rate, seed):
+        responder = loadgen.StandInResponder(
+            failure_rate=failure_rate, seed=seed, sleep=lambda seconds: None
+        )
+        return [responder.respond("summaries.xqy")[0] for _ in range(1000)]
+
+    assert set(statuses(0, 1)) == {200}
+    assert set(statuses(1, 1)) == {500}
+    assert statuses(0.2, 1) == statuses(0.2, 1)
+    assert statuses(0.2, 1).count(500) == pytest.approx(200, abs=40)
+
+
+def test_stand_in():
+    """
+    Test a load run against the stand-in server reuses connections and reports
+    injected failures.
+    """
+    stand_in = loadgen.StandIn(failure_rate=0.2, size=5, seed=0)
+    with stand_in:
+        client = cl.CaseLawClient(stand_in.http_client())
+        assert len(client.get_summaries().summaries) == 5
+        report = loadgen.run_load(
+            client, rate=200, duration=0.25, concurrency=4, poisson=False
+        )
+        stats = stand_in.stats()
+    assert report.requests == 50
+    assert stats["requests"] == report.requests + 1
+    assert stats["connections"] <= 4
+    assert 0 < report.error_rate < 0.5
+    text = report.format(stats)
+    assert "requests/connection" in text
+    assert "rss (MiB)" in text
@@ -0,0 +1,345 @@
+"""
+Test the local search index
+"""
+
+import secrets
+import time
+from datetime import date
+
+import pytest
+import requests
+from ml_akn_client import localindex as li
+from ml_akn_client import ml_akn_client as cl
+from ml_akn_client.models.summaries import PageSummary, Summary
+from ml_akn_client.server import marklogic as ml
+
+DOCUMENTS = [
+    (
+        Summary(
+            uri="/documents/ewca_1.xml",
+            name="Norwich Union Life Insurance Society v Shopmoor Ltd",
+            judgment_date=date(1998, 7, 31),
+            court="EWCA-Civil",
+            citation="[1998] EWCA Civ 1",
+        ),
+        (
+            "The appellants appealed against the decision of the judge.",
+            "The landlord's consent was unreasonably withheld <so it was said>.",
+        ),
+    ),
+    (
+        Summary(
+            uri="/documents/uksc_1.xml",
+            name="Café Ltd v Norwich City Council",
+            judgment_date=date(2019, 1, 15),
+            court="UKSC",
+            citation="[2019] UKSC 1",
+        ),
+        ("The council agreed that the union of the parties was at an end.",),
+    ),
+    (
+        Summary(
+            uri="/documents/ewhc_1.xml",
+            name="Ali v Ali",
+            judgment_date=date(2005, 3, 2),
+            court="EWHC-Family",
+            citation="[2005] EWHC 1",
+        ),
+        ("No appeal was brought.", "The parties agree the facts."),
+    ),
+]
+
+# seconds allowed for a limited search for a term common to every document
+SEARCH_LATENCY_BUDGET: float = 0.005
+
+
+@pytest.fixture
+def index(tmp_path):
+    """
+    Provides a LocalIndex holding DOCUMENTS, the first two flushed to a segment.
+    """
+    with li.LocalIndex(tmp_path / "index") as index:
+        for summary, paragraphs in DOCUMENTS[:2]:
+            index.add(summary, paragraphs)
+        index.flush()
+        index.add(*DOCUMENTS[2])
+        yield index
+
+
+def uris(result):
+    """
+    uris returns the uris of the summaries of a search result.
+    """
+    return [s.uri.split("/")[-1] for s in result.summaries]
+
+
+@pytest.mark.parametrize(
+    "word,expected",
+    [
+        ("Appeals", "appeal"),
+        ("appealed", "appeal"),
+        ("appealing", "appeal"),
+        ("parties", "party"),
+        ("agreed", "agre"),
+        ("agreeing", "agre"),
+        ("Café", "caf"),
+    ],
+)
+def test_term(word, expected):
+    """
+    Test terms are case folded, stemmed and diacritic-insensitive.
+    """
+    assert li.term(word) == expected
+
+
+def test_parse_query():
+    """
+    Test quoted and punctuated words are phrases.
+    """
+    assert li.parse_query('norwich "Union Life" EWCA-Civil') == [
+        ["norwich"],
+        ["union", "lif"],
+        ["ewca", "civil"],
+    ]
+
+
+def test_search_stemmed(index):
+    """
+    Test words match their stemmed forms in every segment, and all must match.
+    """
+    assert uris(index.search("appeal", sort_by="date")) == ["ewhc_1.xml", "ewca_1.xml"]
+    assert uris(index.search("AGREEING party")) == ["uksc_1.xml", "ewhc_1.xml"]
+    assert uris(index.search("cafe norwich")) == ["uksc_1.xml"]
+    assert uris(index.search("appeal council")) == []
+
+
+def test_search_phrase(index):
+    """
+    Test phrases match consecutive words only.
+    """
+    assert uris(index.search('"norwich union"')) == ["ewca_1.xml"]
+    assert uris(index.search('"union norwich"')) == []
+    assert uris(index.search("EWCA-Civil")) == ["ewca_1.xml"]
+
+
+def test_search_snippet(index):
+    """
+    Test snippets are escaped HTML with the matches highlighted, as from search.xqy.
+    """
+    result = index.search("withheld")
+    assert len(result.summaries) == 1
+    assert result.summaries[0].snippets[0].snippet == (
+        "The landlord's consent was unreasonably "
+        '<span class="highlight">withheld</span> &lt;so it was said&gt;.'
+    )
+    result = index.search("appeal", per_match_tokens=2, max_snippet_chars=30)
+    snippet = result.summaries[0].snippets[0].snippet
+    assert snippet == '...appellants <span class="highlight">appealed</span>...'
+    assert index.search("norwich").summaries[0].snippets == []  # only in the name
+
+
+def test_search_sort_limit_fields(index):
+    """
+    Test results are sorted and limited across segments and projected onto fields.
+    """
+    result = index.search("the", sort_by="date", sort_direction="asc", limit=2)
+    assert uris(result) == ["ewca_1.xml", "ewhc_1.xml"]
+    result = index.search("the", sort_by="name", fields=("court",), snippets=False)
+    assert uris(result) == ["ewca_1.xml", "uksc_1.xml", "ewhc_1.xml"]
+    assert result.summaries[0].court == "EWCA-Civil"
+    assert result.summaries[0].name is None
+    assert all(s.snippets == [] for s in result.summaries)
+    assert not result.cached
+
+
+def test_updates(index, tmp_path):
+    """
+    Test documents are replaced and removed across segments, and persist once
+    flushed and compacted.
+    """
+    summary, _ = DOCUMENTS[0]
+    index.add(summary.model_copy(update={"name": "Renamed v Ltd"}), ("New text.",))
+    assert uris(index.search("norwich")) == ["uksc_1.xml"]
+    assert uris(index.search("renamed text")) == ["ewca_1.xml"]
+    assert index.remove("/documents/uksc_1.xml")
+    assert not index.remove("/documents/uksc_1.xml")
+    assert uris(index.search("norwich")) == []
+    index.flush()
+
+    with li.LocalIndex(tmp_path / "index") as reopened:
+        assert sorted(reopened.uris()) == [
+            "/documents/ewca_1.xml",
+            "/documents/ewhc_1.xml",
+        ]
+        reopened.compact()
+        assert len(list((tmp_path / "index").glob("*.idx"))) == 1
+        assert uris(reopened.search("text")) == ["ewca_1.xml"]
+        assert reopened.get("/documents/ewca_1.xml").paragraphs == ("New text.",)
+
+
+def test_segment_format(tmp_path):
+    """
+    Test segments must implement their lookups, and segment files hold
+    little-endian 32 bit integers whatever the platform.
+    """
+    with pytest.raises(TypeError):
+        li._Segment()
+    path = tmp_path / "segment.idx"
+    li.write_segment(path, [li.IndexedDocument(*DOCUMENTS[2])])
+    segment = li.DiskSegment(path)
+    try:
+        offset, ordinals = segment._find("ali")
+        assert ordinals == (0,)
+        assert list(segment.positions("ali", 0)) == [0, 2]
+        # the ordinal 0, the position offsets 0 and 2, then the positions 0 and 2
+        expected = bytes([0, 0, 0, 0, 0, 0, 0, 0, 2, 0, 0, 0, 0, 0, 0, 0, 2, 0, 0, 0])
+        assert path.read_bytes()[offset : offset + 20] == expected
+    finally:
+        segment.close()
+
+
+def test_collection_mismatch(index, tmp_path):
+    """
+    Test an index is only opened for its own collection.
+    """
+    with pytest.raises(li.LocalIndexException):
+        li.LocalIndex(tmp_path / "index", collection="uksc")
+
+
+def test_search_dense(tmp_path):
+    """
+    Test a limited search for a common term, answered by walking the documents in
+    sort order, skips the documents sorting ahead of the matches which lack it.
+    """
+    matching = li.DENSE_MATCHES * 5 + 10
+    with li.LocalIndex(tmp_path / "index") as index:
+        for i in range(matching * 2):
+            name = f"Norwich case {i}" if i < matching else f"Zeta case {i}"
+            index.add(Summary(uri=f"/documents/doc_{i}.xml", name=name))
+        index.flush()
+        for limit in (5, 0):
+            result = index.search(
+                "norwich", sort_by="name", sort_direction="desc", limit=limit
+            )
+            assert len(result.summaries) == (limit or matching)
+            assert all(s.name.startswith("Norwich") for s in result.summaries)
+
+
+def test_search_latency(tmp_path):
+    """
+    Test a limited search for a term in every document of a multi-segment index is
+    within SEARCH_LATENCY_BUDGET. The best of several searches is used to reduce
+    noise.
+    """
+    with li.LocalIndex(tmp_path / "index", flush_docs=1000) as index:
+        for i in range(3000):
+            summary, paragraphs = DOCUMENTS[i % len(DOCUMENTS)]
+            uri = f"/documents/doc_{i}.xml"
+            index.add(summary.model_copy(update={"uri": uri}), paragraphs * 5)
+        timings = []
+        for _ in range(5):
+            start = time.perf_counter()
+            result = index.search("the", sort_by="date", limit=10)
+            timings.append(time.perf_counter() - start)
+        assert len(result.summaries) == 10
+        assert min(timings) < SEARCH_LATENCY_BUDGET
+
+
+def test_client_local_search(index, requests_mock):
+    """
+    Test the client searches its local index when the server cannot be reached, or
+    always if asked to, but not for other collections.
+    """
+    requests_mock.post(
+        "http://localhost:8000/LATEST/invoke", exc=requests.ConnectionError
+    )
+    http_client = ml.MarkLogicHTTPClient(
+        username="admin", password=secrets.token_urlsafe(10)
+    )
+    client = cl.CaseLawClient(http_client, local_index=index)
+    assert uris(client.search('"norwich union"')) == ["ewca_1.xml"]
+    with pytest.raises(cl.ClientException):
+        client.search("norwich", collection="uksc")
+
+    client.local_search = "always"
+    calls = requests_mock.call_count
+    assert uris(client.search("ali")) == ["ewhc_1.xml"]
+    assert requests_mock.call_count == calls
+
+
+def test_client_sync_index(tmp_path, requests_mock):
+    """
+    Test sync_index adds, replaces and removes documents, fetching the paragraphs
+    of new and changed documents only.
+    """
+    pages = [
+        b'<summaries next="/documents/b.xml"><summary version="1">'
+        b"<uri>/documents/a.xml</uri><name>Alpha v Beta</name></summary>"
+        b'<summary version="3"><uri>/documents/b.xml</uri>'
+        b"<name>Gamma v Delta</name></summary></summaries>",
+        b'<summaries><summary version="4"><uri>/documents/c.xml</uri>'
+        b"<name>Epsilon v Zeta</name></summary></summaries>",
+    ]
+    requests_mock.post(
+        "http://localhost:8000/LATEST/invoke",
+        [
+            {
+                "content": b"--b\r\nContent-Type: application/xml\r\n\r\n"
+                + page
+                + b"\r\n--b--",
+                "headers": {"Content-Type": "multipart/mixed; boundary=b"},
+            }
+            for page in pages
+        ],
+    )
+    http_client = ml.MarkLogicHTTPClient(
+        username="admin", password=secrets.token_urlsafe(10)
+    )
+    fetched = []
+
+    def paragraphs(uri):
+        fetched.append(uri)
+        return (f"Judgment text of {uri}.",)
+
+    with li.LocalIndex(tmp_path / "index") as index:
+        alpha = Summary(uri="/documents/a.xml", name="Alpha v Beta")
+        index.add(alpha, ("Kept.",), version="1")
+        index.add(Summary(uri="/documents/b.xml", name="Gamma v Beta"), version="2")
+        index.add(Summary(uri="/documents/d.xml", name="Gone v Gone"), version="1")
+        client = cl.CaseLawClient(http_client, local_index=index)
+        result = client.sync_index(paragraphs=paragraphs, page_size=2)
+        assert result == li.SyncResult(added=1, replaced=1, removed=1, unchanged=1)
+        assert fetched == ["/documents/b.xml", "/documents/c.xml"]
+        assert sorted(index.uris()) == [f"/documents/{x}.xml" for x in "abc"]
+        assert uris(index.search("kept")) == ["a.xml"]
+        assert uris(index.search("judgment delta")) == ["b.xml"]
+        assert not len(index.buffer)
+
+
+def test_sync_changed_text(tmp_path, monkeypatch):
+    """
+    Test sync fetches the paragraphs of a document whose version has changed even
+    if its summary has not, keeps versions once flushed without reading the
+    paragraphs back to compare them, and drops stale text if it cannot fetch
+    paragraphs.
+    """
+    summary, _ = DOCUMENTS[0]
+    page = [PageSummary(**summary.model_dump(), version="2")]
+    with li.LocalIndex(tmp_path / "index") as index:
+        index.add(summary, ("Old text.",), version="1")
+        index.flush()
+        result = li.sync(index, [page], lambda uri: ("New text.",))
+        assert result == li.SyncResult(added=0, replaced=1, removed=0, unchanged=0)
+        assert uris(index.search("new")) == ["ewca_1.xml"]
+        assert uris(index.search("old")) == []
+        assert index.get(summary.uri).version == "2"
+
+        with monkeypatch.context() as m:
+            m.setattr(li.DiskSegment, "document", lambda *a: pytest.fail("read"))
+            result = li.sync(index, [page], lambda uri: pytest.fail("fetched"))
+        assert result.unchanged == 1
+
+        page = [PageSummary(**summary.model_dump(), version="3")]
+        li.sync(index, [page])
+        assert index.get(summary.uri).paragraphs == ()
+        assert uris(index.search("new")) == []
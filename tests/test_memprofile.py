@@ -0,0 +1,148 @@
+"""
+Test the memory budgets of the deserialization path
+"""
+
+import inspect
+import os
+import subprocess
+import sys
+
+import pytest
+from ml_akn_client import memprofile
+from ml_akn_client.models import summaries
+
+FUNCTIONS = tuple(memprofile.deserialization_calls())
+
+
+def retain(data):
+    """
+    retain returns ten copies of @data.
+    """
+    return [bytearray(data) for _ in range(10)]
+
+
+def squared(data):
+    """
+    squared returns a buffer growing with the square of the size of @data.
+    """
+    return bytearray(len(data) ** 2 // 1000)
+
+
+@pytest.mark.parametrize("function", FUNCTIONS)
+def test_memory_budgets(function):
+    """
+    Test each deserialization function is within its configured memory budgets and
+    those derived from its baseline at each payload size, and that memory is
+    released with its result.
+    """
+    profiles = memprofile.profile(functions=(function,))
+    assert [p.summaries for p in profiles] == list(memprofile.PAYLOAD_SIZES)
+    assert all(p.budget == profiles[0].budget for p in profiles)
+    assert all(
+        p.payload_budget == memprofile.PAYLOAD_BUDGETS[function] for p in profiles
+    )
+    memprofile.check_budgets(profiles)
+    largest = profiles[-1]
+    assert largest.peak >= largest.retained > 0
+
+
+def test_budget_scaling():
+    """
+    Test a budget derived from a baseline admits memory growing in proportion to the
+    payload but not memory growing faster.
+    """
+    for call, exceeded in ((retain, False), (squared, True)):
+        baseline = memprofile.measure("f", call, b"x" * 10_000, summaries=10)
+        budget = memprofile.budget_from(baseline)
+        assert budget.peak.per_summary >= 1000 * memprofile.GROWTH_ALLOWANCE
+        large = memprofile.measure("f", call, b"x" * 100_000, summaries=100)
+        assert bool(large.violations(budget)) is exceeded
+    with pytest.raises(ValueError):
+        memprofile.budget_from(baseline._replace(summaries=0))
+
+
+def test_payload_budget():
+    """
+    Test a deserialization keeping two parsed copies of each response exceeds the
+    configured budget, though it grows in proportion to its own baseline.
+    """
+
+    def doubled(data):
+        first = summaries.summaries_deserialize(data)
+        return first, summaries.summaries_deserialize(data)
+
+    name = "summaries_deserialize"
+    payload = memprofile.summaries_payload(1000)
+    single = memprofile.measure(name, summaries.summaries_deserialize, payload, 1000)
+    payload_budget = memprofile.PAYLOAD_BUDGETS[name]
+    assert single.violations(payload_budget=payload_budget) == []
+
+    baseline = memprofile.summaries_payload(memprofile.BASELINE_SIZE)
+    budget = memprofile.budget_from(
+        memprofile.measure(name, doubled, baseline, memprofile.BASELINE_SIZE)
+    )
+    profile = memprofile.measure(name, doubled, payload, 1000)
+    assert profile.violations(budget) == []
+    violations = profile.violations(payload_budget=payload_budget)
+    assert violations
+    assert violations[0].startswith(f"{name} (1000 summaries): retained")
+
+
+def test_budget_exceeded():
+    """
+    Test memory exceeding a budget is reported, with the source line responsible.
+    """
+    payload = b"x" * 100_000
+    budget = memprofile.MemoryBudget(
+        memprofile.Budget(65_536, 1000), memprofile.Budget(65_536, 1000)
+    )
+    profile = memprofile.measure("f", retain, payload, summaries=10, hot_spots=3)
+    assert profile.retained >= 10 * len(payload)
+    assert profile.violations() == []  # no budget, and no leak
+    violations = profile.violations(budget)
+    assert len(violations) == 2
+    assert violations[0].startswith("f (10 summaries): peak growth")
+    lines, start = inspect.getsourcelines(retain)
+    line = start + next(
+        i for i, t in enumerate(lines) if t.strip().startswith("return")
+    )
+    assert profile.hot_spots[0].location == f"{inspect.getsourcefile(retain)}:{line}"
+    with pytest.raises(memprofile.MemoryBudgetException):
+        memprofile.check_budgets([profile._replace(budget=budget)])
+
+
+def test_not_imported_by_client():
+    """
+    Test the client imports neither the harness nor tracemalloc.
+    """
+    script = (
+        "import sys, ml_akn_client.ml_akn_client; "
+        "print('ml_akn_client.memprofile' in sys.modules, 'tracemalloc' in sys.modules)"
+    )
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+    out = subprocess.run(
+        [sys.executable, "-c", script], env=env, capture_output=True, text=True
+    )
+    assert out.stdout.split() == ["False", "False"]
+
+
+def test_format_report():
+    """
+    Test the report lists each profile and its hot spots.
+    """
+    profiles = memprofile.profile(sizes=(5,), hot_spots=2)
+    report = memprofile.format_report(profiles)
+    lines = report.splitlines()
+    assert lines[0].split()[0] == "function"
+    for line, p in zip(lines[1:], profiles):
+        assert line.split()[:2] == [p.function, "5"]
+        assert line.endswith("ok")
+    assert report.count("retained by:") == len(profiles)
+
+
+def test_unknown_function():
+    """
+    Test profiling an unknown function raises ValueError.
+    """
+    with pytest.raises(ValueError):
+        memprofile.profile(functions=("judgment_deserialize",))
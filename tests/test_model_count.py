@@ -0,0 +1,39 @@
+"""
+Test the count.Count xml deserializer
+"""
+
+import pytest
+from ml_akn_client.models import count
+
+
+def test_count_empty():
+    """
+    Test to ensure count raises a CountException when fed empty xml.
+    """
+    with pytest.raises(count.CountException):
+        count.count_deserialize(b"")
+
+
+def test_count_invalid():
+    """
+    Test to ensure count raises a CountException when the count is not an integer.
+    """
+    with pytest.raises(count.CountException):
+        count.count_deserialize(b'<count exact="false">many</count>')
+
+
+@pytest.mark.parametrize(
+    "xml, expected, exact",
+    [
+        (b'<count exact="false">1024</count>', 1024, False),
+        (b'<count exact="true">0</count>', 0, True),
+    ],
+    ids=["estimate", "exact"],
+)
+def test_count_ok(xml, expected, exact):
+    """
+    Test estimated and exact counts deserialize.
+    """
+    c = count.count_deserialize(xml)
+    assert c.count == expected
+    assert c.exact is exact
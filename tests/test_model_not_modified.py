@@ -0,0 +1,31 @@
+"""
+Test the not_modified.NotModified xml deserializer
+"""
+
+import pytest
+from ml_akn_client.models import not_modified
+
+
+def test_not_modified_ok():
+    """
+    Test a not-modified answer deserializes with its etag.
+    """
+    nm = not_modified.not_modified_deserialize(b'<not-modified etag="16945"/>')
+    assert nm.etag == "16945"
+
+
+def test_not_modified_other():
+    """
+    Test any other element is not a not-modified answer.
+    """
+    assert not_modified.not_modified_deserialize(b"<summaries/>") is None
+    assert not_modified.not_modified_deserialize(b"") is None
+
+
+def test_not_modified_invalid():
+    """
+    Test to ensure a not-modified answer without an etag raises a
+    NotModifiedException.
+    """
+    with pytest.raises(not_modified.NotModifiedException):
+        not_modified.not_modified_deserialize(b"<not-modified/>")
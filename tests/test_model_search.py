@@ -47,9 +47,10 @@ def test_search_empty():
 def test_search_invalid():
     """
     Test to ensure search raises a SummariesException when fed incorrect xml. This test
-    replaces the court element which should raise a core pydantic ValidationError.
+    replaces the required uri element which should raise a core pydantic
+    ValidationError.
     """
-    broken_summaries = SEARCH_XML.replace(b"court", b"playground")
+    broken_summaries = SEARCH_XML.replace(b"uri>", b"url>")
     with pytest.raises(search.SummariesException):
         search.search_summaries_deserialize(broken_summaries)
 
@@ -64,3 +65,29 @@ def test_search_ok():
     assert (
         "Union Life Insurance Society v Shockmore" in s.summaries[0].snippets[0].snippet
     )
+
+
+def test_search_cached():
+    """
+    Test the cached attribute of SearchSummaries defaults to False and is read when
+    provided by the server.
+    """
+    s = search.search_summaries_deserialize(SEARCH_XML)
+    assert s.cached is False
+
+    hit = SEARCH_XML.replace(b"<summaries>", b'<summaries cached="true">', 1)
+    s = search.search_summaries_deserialize(hit)
+    assert s.cached is True
+    assert len(s.summaries) == 2
+
+
+def test_search_no_snippets():
+    """
+    Test a snippet-free, projected search result deserializes with empty snippets.
+    """
+    s = search.search_summaries_deserialize(
+        b"<summaries><summary><uri>/documents/ewca_civ_2005_312.xml</uri>"
+        b"<citation>[2005] EWCA Civ 312</citation></summary></summaries>"
+    )
+    assert s.summaries[0].snippets == []
+    assert s.summaries[0].citation == "[2005] EWCA Civ 312"
@@ -0,0 +1,45 @@
+"""
+Test the suggest.Suggestions xml deserializer
+"""
+
+import pytest
+from ml_akn_client.models import suggest
+
+SUGGESTIONS_XML = b"""<?xml version="1.0"?>
+<suggestions>
+  <suggestion field="name">Norwich Union Life Insurance Society v Shopmoor Ltd</suggestion>
+  <suggestion field="court">EWCA-Civil</suggestion>
+  <suggestion field="citation">[2005] EWCA Civ 312</suggestion>
+</suggestions>
+"""
+
+
+def test_suggestions_empty():
+    """
+    Test to ensure suggest raises a SuggestionsException when fed empty xml.
+    """
+    with pytest.raises(suggest.SuggestionsException):
+        suggest.suggestions_deserialize(b"")
+
+
+def test_suggestions_invalid():
+    """
+    Test to ensure suggest raises a SuggestionsException when a suggestion has no
+    field attribute.
+    """
+    broken = SUGGESTIONS_XML.replace(b' field="court"', b"")
+    with pytest.raises(suggest.SuggestionsException):
+        suggest.suggestions_deserialize(broken)
+
+
+def test_suggestions_ok():
+    """
+    Test SUGGESTIONS_XML deserializes to three suggestions, and that no suggestions
+    is valid.
+    """
+    s = suggest.suggestions_deserialize(SUGGESTIONS_XML)
+    assert [x.field for x in s.suggestions] == ["name", "court", "citation"]
+    assert s.suggestions[2].value == "[2005] EWCA Civ 312"
+
+    none = suggest.suggestions_deserialize(b"<suggestions/>")
+    assert none.suggestions == []
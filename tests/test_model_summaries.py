@@ -52,3 +52,42 @@ def test_summaries_ok():
     s = summaries.summaries_deserialize(SUMMARIES_XML)
     assert len(s.summaries) == 2
     assert s.summaries[0].citation == "[2018] EWCA Civ 2414"
+
+
+def test_summaries_page():
+    """
+    Test a SummariesPage reads its next cursor and the version of each summary, and
+    that an empty last page is valid.
+    """
+    page_xml = SUMMARIES_XML.replace(
+        b"<summaries>", b'<summaries next="/documents/ewhc_qb_2020_1353.xml">', 1
+    ).replace(b"<summary>", b'<summary version="16977000000000000">', 1)
+    page = summaries.summaries_page_deserialize(page_xml)
+    assert page.next == "/documents/ewhc_qb_2020_1353.xml"
+    assert len(page.summaries) == 2
+    assert page.summaries[0].version == "16977000000000000"
+    assert page.summaries[1].version is None
+
+    last = summaries.summaries_page_deserialize(b"<summaries/>")
+    assert last.next is None
+    assert last.summaries == []
+
+
+def test_summaries_projected():
+    """
+    Test a projected payload with only uri and name deserializes, leaving the other
+    fields as None, and unknown elements are ignored.
+    """
+    projected = b"""<summaries>
+      <summary>
+        <uri>/documents/ewca_civ_2018_2414.xml</uri>
+        <name>Barrow &amp; Anoe v Kazim &amp; Ors</name>
+      </summary>
+    </summaries>"""
+    s = summaries.summaries_deserialize(projected)
+    assert s.summaries[0].name == "Barrow & Anoe v Kazim & Ors"
+    assert s.summaries[0].court is None
+    assert s.summaries[0].judgment_date is None
+
+    s = summaries.summaries_deserialize(projected.replace(b"<name>", b"<x>1</x><name>"))
+    assert s.summaries[0].name == "Barrow & Anoe v Kazim & Ors"
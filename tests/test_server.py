@@ -264,3 +264,25 @@ def test_post_to_module_tcp_fail(httpserver: HTTPServer, random_password, monkey
         match="Read timed out.",
     ):
         client._post_to_module(module_endpoint="test.xqy", vars={"key": "value"})
+
+
+@pytest.mark.parametrize(
+    "use_cache, expected", [(True, "true"), (False, "false")], ids=["on", "off"]
+)
+def test_search_cache_var(
+    requests_mock, random_password, valid_multipart_response, use_cache, expected
+):
+    """
+    Tests search passes the cache switch through to search.xqy.
+    """
+    client = ml.MarkLogicHTTPClient(username="admin", password=random_password)
+    response_body, content_type = valid_multipart_response
+    requests_mock.post(
+        "http://localhost:8000/LATEST/invoke",
+        content=response_body,
+        headers={"Content-Type": content_type},
+    )
+    client.search("norwich", "name", "desc", use_cache=use_cache)
+    body = requests_mock.request_history[0].text
+    assert "search.xqy" in body
+    assert f"%22cache%22%3A+%22{expected}%22" in body